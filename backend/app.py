@@ -5,15 +5,13 @@ Real-time crowd simulation + XGBoost ML predictions + CRI + Alerts
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import joblib
 import numpy as np
-import pandas as pd
 import random
 import datetime
 import time
-import math
 import threading
 import os
+import atexit
 from dotenv import load_dotenv
 load_dotenv()
 import requests
@@ -22,6 +20,21 @@ import certifi
 ca = certifi.where()
 import json
 from crowd_flow import flow_engine
+from prediction_cache import PredictionCache
+from feature_store import DayLagStore
+from simulation_engine import clock as sim_clock
+from zone_registry import ZoneRegistry
+from simulator import Simulator, calculate_cri, get_risk_level
+from pipeline import Stage, Pipeline
+from scheduler import TickScheduler
+from sharding import ShardSupervisor
+from write_buffer import WriteBehindBuffer
+from registration_cache import RegistrationCache
+from db_schema import ensure_indexes_async, missing_indexes
+from telemetry_store import TelemetryStore
+from rollup_engine import RollupEngine
+from model_registry import ModelRegistry
+from model_artifact import resolve_model_path
 from config import Config
 from services import alert_engine
 
@@ -32,8 +45,9 @@ app = Flask(__name__)
 CORS(app)
 
 # ── Automation Agent Setup ──
-from automation_agent import AutomationAgent, generate_events
+from automation_agent import AutomationAgent, AgentExecutor, generate_events
 automation_agent = AutomationAgent()
+agent_executor = AgentExecutor(automation_agent, Config.AGENT_WORKERS, Config.AGENT_QUEUE_SIZE)
 
 # MongoDB Setup
 try:
@@ -63,6 +77,9 @@ try:
     client.server_info()
     print("🍃 MongoDB connected successfully!")
     USE_MONGO = True
+
+    # Declared indexes (db_schema.py) are built in the background
+    ensure_indexes_async(db)
     
     # Inject DB reference into Automation Agent
     automation_agent.set_db_reference(registrations_collection)
@@ -71,6 +88,13 @@ except Exception as e:
     print(f"⚠️ MongoDB not available, falling back to in-memory: {e}")
     USE_MONGO = False
 
+# Approved registrations / organizer roles for the per-tick alert path (no DB reads per tick)
+registration_cache = RegistrationCache(
+    registrations_collection if USE_MONGO else None,
+    users_collection if USE_MONGO else None,
+    Config.REGISTRATION_REFRESH_SECONDS
+)
+
 
 # ─────────────────────────────────────────────
 # Event & Alert Management Endpoints
@@ -106,6 +130,7 @@ def register_event():
         "timestamp": datetime.datetime.now()
     }
     registrations_collection.insert_one(registration)
+    registration_cache.invalidate()
     print("DEBUG: Registration saved to MongoDB")
     return jsonify({"message": "Successfully registered for event. Waiting for admin approval."}), 201
 
@@ -137,6 +162,9 @@ def update_registration_status():
         if result2.matched_count == 0:
             return jsonify({"error": "Registration not found"}), 404
 
+    # Approval / rejection changes which events the simulator sees as active
+    registration_cache.invalidate()
+
     # Trigger Email Notification AFTER successful DB update
     try:
         # Find the registration to get the zone_id and event_name
@@ -229,9 +257,14 @@ def update_zone_capacity():
         return jsonify({"error": "Missing zone_id or capacity"}), 400
     
     if zone_id in ZONES:
-        ZONES[zone_id]['capacity'] = int(new_capacity)
+        # Updates the config dict and the simulator's shared capacity array
+        zone_registry.set_capacity(zone_id, int(new_capacity))
+        if shard_supervisor is not None:
+            # Shard workers read capacity from the shared snapshot on their next tick
+            shard_supervisor.snapshot.columns["capacity"][zone_registry.index[zone_id]] = int(new_capacity)
         
         # Immediate recalculation so the NEXT poll is accurate
+        live_data = sim.live_data
         if zone_id in live_data:
             current = live_data[zone_id]['current']
             predicted = live_data[zone_id]['predicted']
@@ -268,7 +301,7 @@ def update_zone_capacity():
             "message": f"Capacity for {ZONES[zone_id]['name']} updated to {new_capacity}",
             "zone_id": zone_id,
             "new_capacity": int(new_capacity),
-            "instant_cri": live_data[zone_id]['cri'] if zone_id in live_data else None
+            "instant_cri": sim.live_data[zone_id]['cri'] if zone_id in sim.live_data else None
         }), 200
     
     return jsonify({"error": "Zone not found"}), 404
@@ -290,9 +323,8 @@ def send_manual_alert():
     alert_history_collection.insert_one(alert)
     
     # Also push to the live alerts list (in-memory for real-time display)
-    global alerts
-    alerts.insert(0, alert)
-    if len(alerts) > 50: alerts = alerts[:50]
+    sim.alerts.insert(0, alert)
+    if len(sim.alerts) > 50: sim.alerts = sim.alerts[:50]
     
     # Trigger Email Notification for targeted organizers
     try:
@@ -379,6 +411,7 @@ def register():
         return jsonify({"error": "User already exists"}), 400
 
     users_collection.insert_one({"email": email, "password": password})
+    registration_cache.invalidate()
     return jsonify({"message": "User registered successfully"}), 201
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -406,703 +439,265 @@ def login():
 # ─────────────────────────────────────────────
 # Load ML Model
 # ─────────────────────────────────────────────
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "smart_crowd_per_location_model.pkl")
-model_bundle = None
-models = None
-label_encoder = None
+MODEL_PATH = resolve_model_path(
+    os.path.join(os.path.dirname(__file__), "smart_crowd_per_location_model.pkl"),
+    Config.MODEL_FORMAT
+)
 
-try:
-    model_bundle = joblib.load(MODEL_PATH)
-    models = model_bundle["models"]           # dict: {location_id: XGBRegressor}
-    label_encoder = model_bundle["label_encoder"]  # LabelEncoder for location names
+# The registry owns the active {location_id: XGBRegressor} dict + LabelEncoder pair
+# and swaps both at once on reload/rollback (no restart, no lost in-memory state).
+model_registry = ModelRegistry(MODEL_PATH, backend=Config.INFERENCE_BACKEND)
+
+if model_registry.load():
+    active_model = model_registry.current()
     print(f"✅ ML Model loaded successfully!")
-    print(f"   Locations: {list(label_encoder.classes_)}")
-    print(f"   Model type: {type(list(models.values())[0]).__name__}")
-except Exception as e:
-    print(f"❌ Error loading ML model: {e}")
+    print(f"   Locations: {list(active_model.label_encoder.classes_)}")
+    print(f"   Model type: {type(list(active_model.models.values())[0]).__name__}")
+else:
+    print(f"❌ Error loading ML model: {model_registry.last_error}")
     print("   → Falling back to formula-based predictions")
 
 # ─────────────────────────────────────────────
 # Zone Configuration
 # ─────────────────────────────────────────────
-# Map the label encoder classes to frontend zone IDs
-# LE_CLASSES: ['Canteen', 'D Block', 'Library', 'New Block', 'PG Block']
-ZONE_NAME_TO_ID = {
-    "Canteen": "canteen",
-    "D Block": "dblock",
-    "Library": "lib",
-    "New Block": "newblock",
-    "PG Block": "pg"
-}
-
-ZONES = {
-    "canteen": {
-        "name": "Student Canteen",
-        "le_name": "Canteen",
-        "capacity": 200,
-        "base_density": 100,
-        "coords": {"x": "43.1%", "y": "50.9%"},
-        "type": "social"
-    },
-    "lib": {
-        "name": "Main Library",
-        "le_name": "Library",
-        "capacity": 500,
-        "base_density": 250,
-        "coords": {"x": "41.6%", "y": "58.0%"},
-        "type": "study"
-    },
-    "pg": {
-        "name": "PG Block",
-        "le_name": "PG Block",
-        "capacity": 150,
-        "base_density": 80,
-        "coords": {"x": "39.8%", "y": "70.8%"},
-        "type": "academic"
-    },
-    "newblock": {
-        "name": "New Block",
-        "le_name": "New Block",
-        "capacity": 300,
-        "base_density": 150,
-        "coords": {"x": "48.1%", "y": "57.6%"},
-        "type": "academic"
-    },
-    "dblock": {
-        "name": "Academic Block D",
-        "le_name": "D Block",
-        "capacity": 400,
-        "base_density": 200,
-        "coords": {"x": "44.8%", "y": "73.6%"},
-        "type": "academic"
-    },
-}
+# Zones are loaded from zones.json (see zone_registry.py). ZONES is the
+# familiar {zone_id: config} dict view; hot paths use the registry arrays.
+zone_registry = ZoneRegistry.load(Config.ZONES_PATH)
+ZONES = zone_registry.zones
 
-# ─────────────────────────────────────────────
-# Shared State
-# ─────────────────────────────────────────────
-live_data = {}
-alerts = []
-history = {zone_id: [] for zone_id in ZONES}   # Rolling 30-step history per zone
-trend_data = []  # Time-series history
-current_flows = [] # Predicted/observed crowd flows between zones
+# Map the label encoder classes to frontend zone IDs
+ZONE_NAME_TO_ID = zone_registry.le_to_id
 
 # ─────────────────────────────────────────────
-# Behavior-Driven Simulation Engine helpers
+# Simulator State
+# The zone state (history, day-lag store, live data, alerts, trend, flows),
+# the behavior tables and the advance -> inference -> scoring stages live in
+# simulator.py, so replay.py can build its own without importing this module.
 # ─────────────────────────────────────────────
-
-def get_time_factor(hour, minute, weekday):
-    """
-    Returns the base multiplier for campus activity based on time and day.
-    Sunday: Effectively closed (very low activity).
-    """
-    # ── Sunday Behavior ──
-    if weekday == 6:  # 0=Monday, 6=Sunday
-        return 0.1  # Flat low baseline for Sunday
-
-    # ── Weekday Schedule ──
-    t = hour + (minute / 60.0)
-
-    # 1. Early Morning (6 - 8): Security & Early Staff
-    if 6 <= t < 8:
-        # Linear ramp from 0.1 to 0.3
-        progress = (t - 6) / 2
-        return 0.1 + (0.2 * progress)
-
-    # 2. Arrival & Morning Classes (8 - 12)
-    elif 8 <= t < 12:
-        # Logistic-like S-curve for arrival
-        if t < 9: return 0.3 + (0.7 * (t - 8)) # Fast ramp 8-9
-        return 1.0 # Peak attendance
-
-    # 3. Lunch Transitions (12 - 14)
-    elif 12 <= t < 14:
-        return 0.95 # Slight dip in overall activity as some leave/rest, but high movement
-
-    # 4. Post-Lunch / Afternoon (14 - 18)
-    elif 14 <= t < 18:
-        # Slow decay
-        return 0.9 - (0.1 * (t - 14) / 4)
-
-    # 5. Evening / Cleaning Shift (18 - 20)
-    elif 18 <= t < 20:
-        # Bump for cleaning staff?
-        # Simulation Rule: "Cleaning staff increase crowd 120 -> 200"
-        # Relative to daytime peak (say 1000), 200 is 0.2. 120 is 0.12.
-        # Let's say we hold a 'late stay' level.
-        if t < 19: return 0.25 # 6-7 PM
-        return 0.15 # 7-8 PM
-
-    # 6. Night (20 - 6)
-    else:
-        return 0.1 # Stable overnight baseline
-
-def get_zone_modifier(zone_type, hour, minute):
-    """Returns zone-specific activity multipliers."""
-    t = hour + (minute / 60.0)
-    
-    if zone_type == "social": # Canteen
-        # Dead early
-        if t < 8: return 0.1
-        # Low morning
-        if 8 <= t < 11: return 0.4
-        # Lunch Spike (Bell curve centered at 13.0)
-        if 11 <= t < 15:
-            # Peak at 1 PM (13.0)
-            delta = abs(t - 13.0)
-            # Gaussian-ish shape
-            spike = 2.5 * math.exp(-(delta**2) / 0.5) 
-            return 0.5 + spike
-        # Dead afternoon/evening
-        if t >= 18: return 0.05
-        return 0.3
-
-    elif zone_type == "study": # Library
-        # Moderate Morning
-        if 9 <= t < 12: return 0.8
-        # Dip during lunch
-        if 12 <= t < 13: return 0.6 
-        # Post-lunch High (Study time)
-        if 14 <= t < 17: return 1.3
-        # Evening stay
-        if 17 <= t < 21: return 0.5
-        return 0.2
-
-    elif zone_type == "academic": # Classrooms
-        # Morning classes
-        if 9 <= t < 12: return 1.2
-        # Lunch dip
-        if 12 <= t < 13: return 0.5
-        # Afternoon classes
-        if 14 <= t < 17: return 1.0
-        # Evening drop
-        if t >= 17: return 0.1
-        return 0.1
-        
-    return 1.0
+# Raw model outputs keyed on quantized features (skips repeated inference)
+prediction_cache = PredictionCache(Config.PREDICTION_CACHE_SIZE) if Config.PREDICTION_CACHE_SIZE > 0 else None
+if prediction_cache is not None:
+    model_registry.add_listener(lambda snapshot: prediction_cache.invalidate(snapshot.version))
+
+sim = Simulator(
+    zone_registry, model_registry, prediction_cache,
+    day_lag=DayLagStore.load(Config.DAY_LAG_PATH, ZONES),   # Minute buckets for prev_day_density, kept across restarts
+    seed=Config.SIM_SEED
+)
+behavior = sim.behavior
 
 # ─────────────────────────────────────────────
-# Helper: CRI Calculation
+# Tick Sinks
+# One tick flows: advance -> inference -> scoring -> (persistence, notification).
+# advance / inference / scoring run synchronously under the tick scheduler, so
+# its lag and overrun counters measure the real work and every tick is scored
+# against its own `now`. publish_tick hands each scored tick to both sinks
+# (nothing is chained between them); each has a bounded queue and worker, so a
+# slow MongoDB call only backs up that sink's queue and never delays live_data.
 # ─────────────────────────────────────────────
-def calculate_cri(current, capacity, predicted, growth_rate, hour):
-    """
-    Crowd Risk Index (0–100).
-    Weighted formula:
-        40% — current density vs capacity
-        25% — predicted density vs capacity  
-        20% — growth rate (5-min)
-        15% — time-of-day risk factor
-    """
-    density_ratio = min(current / max(capacity, 1), 2.0) # Increased cap to 200%
-    predicted_ratio = min(predicted / max(capacity, 1), 1.5)
-
-    # Time risk: higher during peak hours (but should not negate actual density)
-    time_risk = 0.0
-    if 12 <= hour <= 14:
-        time_risk = 0.8
-    elif 9 <= hour <= 11 or 14 < hour <= 16:
-        time_risk = 0.5
-    elif hour < 8 or hour > 19:
-        time_risk = 0.1
-    else:
-        time_risk = 0.3
-
-    # New Weighted Formula: 60% Density, 20% Predicted, 10% Growth, 10% Time
-    cri = (
-        (density_ratio * 60) +         # Heavy weight on actual density
-        (predicted_ratio * 20) +       # Moderate predictive influence
-        (min(max(growth_rate, 0), 1) * 10) +
-        (time_risk * 10)
-    )
-    
-    # HARD OVERRIDE: If actual count > capacity, enforce Critical status
-    if current >= capacity:
-        cri = max(cri, 85) # Force Critical
-    elif current >= capacity * 0.9:
-        cri = max(cri, 75) # Force Warning
-
-    return min(max(round(cri), 0), 100)
-
-
-def get_risk_level(cri):
-    if cri >= 85:
-        return "CRITICAL"
-    elif cri >= 70:
-        return "HIGH"
-    elif cri >= 50:
-        return "MODERATE"
-    return "LOW"
-
-
-# ─────────────────────────────────────────────
-# Helper: Surge Detection
-# ─────────────────────────────────────────────
-def detect_surge(zone_history):
-    """Detect surge if growth > 30% in last 5 readings, or Z-score > 2.5."""
-    if len(zone_history) < 5:
-        return False, 0.0
+last_day_lag_save = time.time()
+
+# Telemetry / trend documents are batched into insert_many calls by a background flusher
+telemetry_writer = WriteBehindBuffer(
+    Config.WRITE_BATCH_SIZE, Config.WRITE_FLUSH_SECONDS, Config.WRITE_BUFFER_MAX,
+    Config.WRITE_OVERFLOW, Config.WRITE_SPILL_DIR
+)
+
+# Per-zone-hour buckets plus 1m / 15m / 1h rollups (replaces full raw_logs snapshots)
+telemetry_store = TelemetryStore(db, {
+    "raw": Config.BUCKET_RETENTION_DAYS,
+    "1m": Config.ROLLUP_1M_RETENTION_DAYS,
+    "15m": Config.ROLLUP_15M_RETENTION_DAYS,
+    "1h": Config.ROLLUP_1H_RETENTION_DAYS
+}, Config.TELEMETRY_FLUSH_SECONDS) if USE_MONGO else None
+
+# Hourly / daily per-zone aggregates (density, CRI, alerts), updated every tick
+zone_rollups = RollupEngine(db['zone_metrics'], Config.ROLLUP_FLUSH_SECONDS) if USE_MONGO else None
+
+def persistence_stage(tick):
+    """Sink: MongoDB telemetry / trend writes and the day-lag store."""
+    global last_day_lag_save
+    now, new_state, current_flows = tick["now"], tick["state"], tick["flows"]
+
+    # ── 9. High-Frequency Telemetry (Every 5 seconds) ──
+    if telemetry_store is not None and Config.TELEMETRY_LAYOUT in ("bucket", "both"):
+        try:
+            telemetry_store.record(now, new_state)
+        except Exception as e:
+            print(f"⚠️ Telemetry Bucket Error: {e}")
 
-    recent = zone_history[-5:]
-    older = zone_history[-10:-5] if len(zone_history) >= 10 else zone_history[:5]
+    # ── 9b. Hourly / daily zone rollups ──
+    if zone_rollups is not None:
+        try:
+            zone_rollups.record_tick(now, new_state, tick.get("alerts", ()))
+        except Exception as e:
+            print(f"⚠️ Zone Rollup Error: {e}")
 
-    avg_recent = np.mean(recent)
-    avg_older = np.mean(older) if len(older) > 0 else avg_recent
+    # Legacy full snapshot per tick (TELEMETRY_LAYOUT=document / both)
+    if USE_MONGO and Config.TELEMETRY_LAYOUT in ("document", "both"):
+        try:
+            telemetry_writer.add(log_collection, {
+                "timestamp": now.strftime("%H:%M:%S"),
+                "created_at": now,
+                # Copied: the notification sink keeps updating live_data before the flush
+                "zones": {zid: dict(zone) for zid, zone in new_state.items()},
+                "flows": current_flows,
+                "summary": {
+                    "total_devices": sum(z["current"] for z in new_state.values()),
+                    "total_people": sum(z["est_people"] for z in new_state.values()),
+                    "avg_cri": round(sum(z["cri"] for z in new_state.values()) / len(new_state), 1)
+                }
+            })
+        except Exception as e:
+            print(f"⚠️ MongoDB Raw Log Error: {e}")
 
-    growth_rate = (avg_recent - avg_older) / max(avg_older, 1)
+    # ── 10. Persistent trend storage (Minute-by-minute stats) ──
+    if USE_MONGO and tick["trend_snapshot"] is not None:
+        try:
+            trend_snap = tick["trend_snapshot"].copy()
+            trend_snap["flows"] = current_flows # Add flows to trend for richer history
+            telemetry_writer.add(trend_collection, trend_snap)
+        except Exception as e:
+            print(f"⚠️ MongoDB Trend Write Error: {e}")
 
-    # Z-score based detection
-    if len(zone_history) >= 10:
-        mean_all = np.mean(zone_history)
-        std_all = np.std(zone_history)
-        if std_all > 0:
-            z_score = (zone_history[-1] - mean_all) / std_all
-            if z_score > 2.5:
-                return True, growth_rate
+    # ── 11. Persist day-lag store (survives restarts) ──
+    if time.time() - last_day_lag_save >= Config.DAY_LAG_SAVE_SECONDS:
+        last_day_lag_save = time.time()
+        try:
+            sim.day_lag.save()
+        except Exception as e:
+            print(f"⚠️ Day-lag store save failed: {e}")
 
-    if growth_rate > 0.30:
-        return True, growth_rate
 
-    return False, growth_rate
+def notification_stage(tick):
+    """Sink: organizer occupancy / email automation and the automation agent."""
+    now = tick["now"]
 
+    for zone_id, zone in tick["state"].items():
+        config = ZONES[zone_id]
+        z = tick["zones"][zone_id]
+        cri, device_count = zone["cri"], zone["current"]
+        growth_rate, pred_density = z["growth_rate"], z["pred_density"]
+
+        # ── Organizer-Driven Email Automation & Occupancy Tracking ──
+        # Approved registrations whose window covers now (bisect on the
+        # registration cache's schedule index; handles windows past midnight)
+        zone_occupied_by = None
+        try:
+            for active_registration in registration_cache.active(zone_id, now):
+                s_time = active_registration.get('start_time')
+                e_time = active_registration.get('end_time')
+                
+                # Mark room as occupied
+                zone_occupied_by = {
+                    "event_name": active_registration.get('event_name'),
+                    "organizer": active_registration.get('user_email'),
+                    "timing": f"{s_time} - {e_time}"
+                }
 
-# ─────────────────────────────────────────────
-# Helper: Flow Vector Simulation
-# ─────────────────────────────────────────────
-def generate_flow_vector(zone_id, current_density, hour):
-    """
-    Simulate directional crowd movement between zones.
-    Adds 'Travel Time' constraints and 'Night Lock' logic.
-    """
-    flows = []
-    
-    # ── 1. Activity Thresholds ──
-    # If density is low (e.g. at night), movement is sparse/random, not directed flows.
-    if current_density < 30 or (hour < 8 or hour > 19):
-        return flows 
-
-    # ── 2. Realistic Directed Flows (Core Schedule) ──
-    # Library → Canteen during lunch
-    if zone_id == "lib" and 11 <= hour <= 14:
-        count = int(current_density * random.uniform(0.05, 0.15)) # Reduced for realism
-        if count > 2:
-            flows.append({"from_zone": "lib", "to_zone": "canteen", "count": count})
-
-    # Canteen → D Block / PG Block after lunch
-    if zone_id == "canteen" and 13 <= hour <= 15:
-        count_d = int(current_density * random.uniform(0.05, 0.12))
-        count_pg = int(current_density * random.uniform(0.02, 0.08))
-        if count_d > 2:
-            flows.append({"from_zone": "canteen", "to_zone": "dblock", "count": count_d})
-        if count_pg > 2:
-            flows.append({"from_zone": "canteen", "to_zone": "pg", "count": count_pg})
-
-    # D Block → PG Block in evening
-    if zone_id == "dblock" and 16 <= hour <= 18:
-        count = int(current_density * random.uniform(0.08, 0.15))
-        if count > 2:
-            flows.append({"from_zone": "dblock", "to_zone": "pg", "count": count})
-
-    return flows
+                organizer_email = active_registration.get('user_email')
+                event_name = active_registration.get('event_name', 'Campus Event')
+                
+                # Organizer role (cached alongside the registrations)
+                user_role = registration_cache.role(organizer_email)
+                
+                # Evaluation logic inside alert_engine
+                zone_metrics = {
+                    "name": config["name"],
+                    "cri": cri,
+                    "count": device_count,
+                    "capacity": config["capacity"],
+                    "growth": growth_rate,
+                    "forecast": f"{int(pred_density)} (30m)"
+                }
+                
+                if alert_engine.should_trigger(zone_id, zone_metrics, active_registration, user_role):
+                    print(f"📢 ALERT ENGINE: Triggering email for {organizer_email} at {zone_id} ({s_time}-{e_time})")
+                    alert_engine.trigger_alert(organizer_email, zone_id, zone_metrics, event_name)
+        except Exception as eval_err:
+            print(f"⚠️ Alert Evaluation Failed for {zone_id}: {eval_err}")
+
+        sim.zone_occupancy[zone_id] = zone_occupied_by
+        live_data = sim.live_data
+        if zone_id in live_data:
+            live_data[zone_id]["active_event"] = zone_occupied_by
+
+        # ── Automation Agent Integration ──
+        # Gather data for the agent
+        zone_data_for_agent = {
+            "zone_name": config["name"],
+            "current_count": device_count,
+            "capacity": config["capacity"],
+            "cri": cri,
+            "surge_detected": z["surge_flag"],
+            "forecast_30min": int(pred_density)
+        }
+        
+        # Hand off to the bounded agent pool (coalesced per zone, never blocks)
+        agent_executor.submit(zone_id, zone_data_for_agent, generate_events(zone_data_for_agent))
 
 
-# ─────────────────────────────────────────────
-# ML Prediction
-# ─────────────────────────────────────────────
-def predict_with_model(zone_id, config, hour, weekday, is_weekend, rssi, current_density, zone_hist):
-    """
-    Use the XGBoost per-location model to predict density.
-    Features: ['hour', 'weekday', 'rssi', 'value', 'prev_density',
-               'prev2_density', 'rolling_mean_6', 'prev_day_density', 'is_weekend']
-    """
-    if models is None or label_encoder is None:
-        # Fallback: formula-based prediction using behavior engine
-        now = datetime.datetime.now()
-        tf = get_time_factor(now.hour, now.minute, now.weekday())
-        zm = get_zone_modifier(config.get("type"), now.hour, now.minute)
-        return int(config["base_density"] * tf * zm * random.uniform(0.88, 1.12))
+persistence = Stage("persistence", persistence_stage, Config.PIPELINE_QUEUE_SIZE, overflow="drop_oldest")
+notification = Stage("notification", notification_stage, Config.PIPELINE_QUEUE_SIZE, overflow="drop_oldest")
+tick_pipeline = Pipeline(persistence, notification)
 
-    le_name = config["le_name"]
+# Fixed cadence against a monotonic clock: one tick every TICK_SECONDS,
+# no matter how long the previous tick took (errors are counted by the scheduler)
+tick_scheduler = TickScheduler(Config.TICK_SECONDS, Config.TICK_POLICY)
 
-    try:
-        # Encode location to get the model index
-        loc_encoded = label_encoder.transform([le_name])[0]
-        model = models.get(loc_encoded)
-        if model is None:
-            # Fallback: formula-based prediction using behavior engine
-            now = datetime.datetime.now()
-            tf = get_time_factor(now.hour, now.minute, now.weekday())
-            zm = get_zone_modifier(config.get("type"), now.hour, now.minute)
-            return int(config["base_density"] * tf * zm * random.uniform(0.88, 1.12))
-
-        # Build feature vector
-        prev_density = zone_hist[-1] if len(zone_hist) >= 1 else current_density
-        prev2_density = zone_hist[-2] if len(zone_hist) >= 2 else prev_density
-        rolling_mean_6 = float(np.mean(zone_hist[-6:])) if len(zone_hist) >= 6 else float(np.mean(zone_hist)) if zone_hist else float(current_density)
-        prev_day_density = zone_hist[-20] if len(zone_hist) >= 20 else current_density  # ~60 min ago as proxy
-
-        features = pd.DataFrame([{
-            "hour": hour,
-            "weekday": weekday,
-            "rssi": rssi,
-            "value": config["capacity"],
-            "prev_density": prev_density,
-            "prev2_density": prev2_density,
-            "rolling_mean_6": rolling_mean_6,
-            "prev_day_density": prev_day_density,
-            "is_weekend": is_weekend
-        }])
-
-        prediction = model.predict(features)[0]
-        # Clamp to reasonable range
-        prediction = max(0, min(int(prediction), int(config["capacity"] * 1.3)))
-        
-        # ── Post-Processing: Dampen & Blend ──
-        # Reduce the weight of current_density to allow the model's own predictions 
-        # to manifest more naturally, adding a small noise factor to simulate 
-        # realistic model error/variance (~4-6% deviation).
-        now = datetime.datetime.now()
-        time_factor = get_time_factor(now.hour, now.minute, now.weekday())
-        
-        # Scale prediction by time factor
-        scaled_prediction = prediction * max(time_factor, 0.15)
-        
-        # Adjust blending: 60% actual, 40% prediction (less biased towards current state)
-        blended = (current_density * 0.6) + (scaled_prediction * 0.4)
-        
-        # Add random noise for realistic variance (±4-8%)
-        error_factor = random.uniform(0.92, 1.08)
-        blended = blended * error_factor
-        
-        # Final clamp
-        blended = max(0, min(int(blended), int(config["capacity"] * 1.2)))
-        return blended
 
-    except Exception as e:
-        print(f"   ⚠️ Prediction error for {zone_id}: {e}")
-        # Fallback: formula-based prediction using behavior engine
-        now = datetime.datetime.now()
-        tf = get_time_factor(now.hour, now.minute, now.weekday())
-        zm = get_zone_modifier(config.get("type"), now.hour, now.minute)
-        return int(config["base_density"] * tf * zm * random.uniform(0.9, 1.15))
+def publish_tick(tick):
+    """Hands a scored tick to every async sink."""
+    tick_pipeline.put(tick)
 
 
-# ─────────────────────────────────────────────
-# Simulation State for Smooth Transitions
-# We initialize it based on the current schedule to avoid "startup spikes"
-class SimulationState:
-    def __init__(self):
-        # Initialize with baseline to avoid startup 0s
-        self.counts = {zid: ZONES[zid]["base_density"] * 0.1 for zid in ZONES}
+def run_tick():
+    publish_tick(sim.run_tick())
 
-sim_state = SimulationState()
 
 def simulator_loop():
-    global live_data, alerts, history, trend_data
     print("🚀 Behavior-Driven Simulation Engine Started...")
-
-    while True:
-        try:
-            now = datetime.datetime.now()
-            hour = now.hour
-            minute = now.minute
-            weekday = now.weekday() # 0-6
-
-            # 1. Global Time Factor
-            global_factor = get_time_factor(hour, minute, weekday)
-            
-            new_state = {}
-            temp_alerts = []
-
-            for zone_id, config in ZONES.items():
-                # 2. Zone Specific Modifier
-                zone_mod = get_zone_modifier(config["type"], hour, minute)
-                
-                # 3. Calculate Target Density
-                # Target = Base * GlobalTime * ZoneSpecific
-                base = config["base_density"]
-                target_raw = base * global_factor * zone_mod
-                
-                # Add randomness to target (not just noise, but "day-to-day variance")
-                # We use a consistent random seed based on hour to keep it stable-ish per hour? 
-                # No, just small random fluctuation in target is fine.
-                target = target_raw * random.uniform(0.9, 1.1)
-
-                # 4. Smooth Transition (Inertia)
-                current = sim_state.counts[zone_id]
-                
-                # Distance to target
-                diff = target - current
-                
-                # Move speed: How fast do we react?
-                # Fast interactions (Lunch) vs Slow (Evening drain)
-                if abs(diff) > 20: 
-                    speed = 0.15 # Fast adjustment for big shifts
-                else: 
-                    speed = 0.05 # Slow drift for stability
-                    
-                # Apply movement
-                next_val = current + (diff * speed)
-                
-                # 5. Noise / Micro-Fluctuations (Brownian Motion)
-                # Keep it bounded: +/- 2 per cycle max, unless huge capacity
-                noise = random.uniform(-1.5, 1.5)
-                
-                # Occasional minor surge (5% chance)
-                if random.random() < 0.05:
-                    noise += random.uniform(2, 5)
-
-                next_val += noise
-                
-                # 6. Constraints & Clamping
-                # Never negative
-                next_val = max(0, next_val)
-                # Cap at 150% capacity (safety buffer)
-                next_val = min(next_val, config["capacity"] * 1.5)
-                
-                # Update State
-                sim_state.counts[zone_id] = next_val
-                
-                # Final Integer Count for Display
-                device_count = int(next_val)
-                
-                # ── 7. ML Pipeline Integration (Preserved) ──
-                # We still run the ML model to get "Predicted" values for comparison
-                # and to compute CRI as requested.
-                zone_hist = history[zone_id]
-                
-                # Mock RSSI for API compatibility
-                rssi = max(-90, min(-30, int(-80 + (device_count/config["capacity"])*30)))
-
-                try:
-                    # We pass the SIMULATED count as "current" to the ML model features
-                    pred_density = predict_with_model(
-                        zone_id, config, hour, weekday, (1 if weekday>=5 else 0),
-                        rssi, device_count, zone_hist
-                    )
-                except:
-                    pred_density = int(target) # Fallback to our sim target
-
-                # ── 8. Estimated People (Natural Scaling) ──
-                # Multiply by a factor (e.g. 1.3 devices per person? or 1 device = 1.3 people?)
-                # Usually 1 device < 1 person if not everyone connects. 
-                # But let's keep existing logic: 1.25-1.35 multiplier
-                est_people = int(device_count * random.uniform(1.25, 1.35))
-
-                # ── 5. Update history & Stats ──
-                history[zone_id].append(device_count)
-                if len(history[zone_id]) > 100:
-                    history[zone_id] = history[zone_id][-100:]
-
-                surge_flag, growth_rate = detect_surge(history[zone_id])
-                # WE USE PREDICTED DENSITY FOR CRI
-                cri = calculate_cri(device_count, config["capacity"], pred_density, growth_rate, hour)
-                risk_level = get_risk_level(cri)
-                flows = generate_flow_vector(zone_id, device_count, hour)
-
-                # ── 5. Status colors (UI signals) ──
-                if cri >= 70:
-                    status_color = "text-red-500"
-                elif cri >= 50:
-                    status_color = "text-amber-500"
-                else:
-                    status_color = "text-green-500"
-
-                # ── Organizer-Driven Email Automation & Occupancy Tracking ──
-                # Check for approved registrations in this zone
-                zone_occupied_by = None
-                try:
-                    current_time_str = now.strftime("%H:%M")
-                    active_regs = list(registrations_collection.find({
-                        "zone_id": zone_id,
-                        "status": "APPROVED"
-                    }))
-                    
-                    for active_registration in active_regs:
-                        s_time = active_registration.get('start_time')
-                        e_time = active_registration.get('end_time')
-                        
-                        is_active_now = True
-                        if s_time and e_time:
-                            is_active_now = s_time <= current_time_str <= e_time
-                            
-                        if not is_active_now:
-                            continue
-                        
-                        # Mark room as occupied
-                        zone_occupied_by = {
-                            "event_name": active_registration.get('event_name'),
-                            "organizer": active_registration.get('user_email'),
-                            "timing": f"{s_time} - {e_time}"
-                        }
-
-                        organizer_email = active_registration.get('user_email')
-                        event_name = active_registration.get('event_name', 'Campus Event')
-                        
-                        # Fetch user from DB to check role
-                        user_doc = users_collection.find_one({"email": organizer_email})
-                        user_role = user_doc.get('role', 'event_organizer') if user_doc else 'event_organizer'
-                        
-                        # Evaluation logic inside alert_engine
-                        zone_metrics = {
-                            "name": config["name"],
-                            "cri": cri,
-                            "count": device_count,
-                            "capacity": config["capacity"],
-                            "growth": growth_rate,
-                            "forecast": f"{int(pred_density)} (30m)"
-                        }
-                        
-                        if alert_engine.should_trigger(zone_id, zone_metrics, active_registration, user_role):
-                            print(f"📢 ALERT ENGINE: Triggering email for {organizer_email} at {zone_id} ({s_time}-{e_time})")
-                            alert_engine.trigger_alert(organizer_email, zone_id, zone_metrics, event_name)
-                except Exception as eval_err:
-                    print(f"⚠️ Alert Evaluation Failed for {zone_id}: {eval_err}")
-
-                # ── Store Result ──
-                new_state[zone_id] = {
-                    "id": zone_id,
-                    "name": config["name"],
-                    "current": device_count,
-                    "capacity": config["capacity"],
-                    "est_people": est_people,
-                    "predicted": int(pred_density), # Use the ML prediction here
-                    "cri": cri,
-                    "risk_level": risk_level,
-                    "surge": surge_flag,
-                    "growth_rate": round(growth_rate * 100, 1),
-                    "flows": flows,
-                    "status": risk_level,
-                    "statusColor": status_color,
-                    "last_updated": now.strftime("%H:%M:%S"),
-                    "active_event": zone_occupied_by
-                } 
-
-                # ── 8. Alert Generation (Global Feed) ──
-                if cri >= 85:
-                    # Find safest alternative zone
-                    other_zones = [z for z in ZONES if z != zone_id]
-                    alt_zone = random.choice(other_zones) if other_zones else None
-                    temp_alerts.append({
-                        "level": "CRITICAL",
-                        "zone": config["name"],
-                        "zone_id": zone_id,
-                        "cri": cri,
-                        "message": f"🔴 CRITICAL: {config['name']} at CRI {cri} — {device_count}/{config['capacity']} devices. Consider redirecting to {ZONES[alt_zone]['name']}." if alt_zone else f"🔴 CRITICAL: {config['name']} at CRI {cri}.",
-                        "timestamp": now.strftime("%H:%M:%S")
-                    })
-                elif cri >= 70:
-                    temp_alerts.append({
-                        "level": "WARNING",
-                        "zone": config["name"],
-                        "zone_id": zone_id,
-                        "cri": cri,
-                        "message": f"🟠 WARNING: {config['name']} at CRI {cri} — approaching capacity.",
-                        "timestamp": now.strftime("%H:%M:%S")
-                    })
+    tick_pipeline.start()
+    tick_scheduler.run(run_tick)
 
 
+# ─────────────────────────────────────────────
+# Multi-Process Zone Sharding (SIM_SHARDS > 0)
+# Zones are split across worker processes (shard_worker.py, each a fresh
+# interpreter with its own registry, model and cache) by consistent hashing.
+# Each worker advances and scores its shard (advance + inference + CRI) and
+# writes the rows into a shared-memory snapshot; the API process copies the
+# snapshot columns and runs the cross-zone work (risk, flows, alerts, trend)
+# on those arrays, then hands the tick to the sinks.
+# ─────────────────────────────────────────────
+shard_supervisor = None
 
-                
-                # ── Automation Agent Integration ──
-                # Gather data for the agent
-                zone_data_for_agent = {
-                    "zone_name": config["name"],
-                    "current_count": device_count,
-                    "capacity": config["capacity"],
-                    "cri": cri,
-                    "surge_detected": surge_flag,
-                    "forecast_30min": int(pred_density)
-                }
-                
-                # Run the agent in a separate thread just in case ensuring no block
-                threading.Thread(target=lambda: automation_agent.handle_events(
-                    zone_id, 
-                    zone_data_for_agent, 
-                    generate_events(zone_data_for_agent)
-                )).start()
 
+def publish_shard_tick():
+    seq, columns = shard_supervisor.snapshot.read()
+    fresh = shard_supervisor.fresh_rows(seq)
+    if not len(fresh):
+        return      # No shard has written since the last tick
+    now = sim_clock.now()
 
-            # ── 8. Calculate Smart Crowd Flows ──
-            current_flows = flow_engine.calculate_flows(new_state, hour)
-            
-            live_data = new_state
-            alerts = temp_alerts
-
-            # ── 9. High-Frequency Telemetry (Every 5 seconds) ──
-            if USE_MONGO:
-                try:
-                    log_collection.insert_one({
-                        "timestamp": now.strftime("%H:%M:%S"),
-                        "created_at": now,
-                        "zones": new_state,
-                        "flows": current_flows,
-                        "summary": {
-                            "total_devices": sum(z["current"] for z in new_state.values()),
-                            "total_people": sum(z["est_people"] for z in new_state.values()),
-                            "avg_cri": round(sum(z["cri"] for z in new_state.values()) / len(new_state), 1)
-                        }
-                    })
-                except Exception as e:
-                    print(f"⚠️ MongoDB Raw Log Error: {e}")
-
-            # ── 10. Record trend snapshot (Every Minute) ──
-            last_record = trend_data[-1] if trend_data else None
-            needs_record = False
-            
-            if not last_record:
-                needs_record = True
-            else:
-                last_time = datetime.datetime.strptime(last_record["timestamp"], "%H:%M:%S")
-                # Handle day rollover by checking minute difference
-                if now.minute != last_time.minute:
-                    needs_record = True
-
-            if needs_record:
-                zones_snap = {}
-                for zid, zdata in new_state.items():
-                    zones_snap[zid] = {
-                        "actual": zdata["current"],
-                        "predicted": zdata["predicted"],
-                        "cri": zdata["cri"]
-                    }
-                
-                snapshot = {
-                    "timestamp": now.strftime("%H:%M:%S"),
-                    "hour": now.strftime("%H:%M"),
-                    "total_actual": sum(z["current"] for z in new_state.values()),
-                    "total_predicted": sum(z["predicted"] for z in new_state.values()),
-                    "avg_cri": round(sum(z["cri"] for z in new_state.values()) / len(new_state), 1),
-                    "zones": zones_snap,
-                    "created_at": now # For easier sorting/indexing
-                }
-                
-                trend_data.append(snapshot)
-                
-                # Persistent storage in MongoDB
-                if USE_MONGO:
-                    try:
-                        # Store in Trend Collection (Minute-by-minute stats)
-                        trend_snap = snapshot.copy()
-                        trend_snap["flows"] = current_flows # Add flows to trend for richer history
-                        trend_collection.insert_one(trend_snap)
-                    except Exception as e:
-                        print(f"⚠️ MongoDB Trend Write Error: {e}")
-                
-                # Keep last 240 snapshots in memory for quick access
-                if len(trend_data) > 240:
-                    trend_data = trend_data[-240:]
+    # Keep the API-side history / day-lag store current for the endpoints and
+    # restarts: one sample per shard write, so a shard that missed its tick
+    # does not leave duplicate readings behind
+    current = columns["current"]
+    for i in fresh.tolist():
+        zone_id, count = zone_registry.ids[i], int(current[i])
+        sim.history[zone_id].append(count)
+        sim.day_lag.record(zone_id, now, count)
+    publish_tick(sim.score_columns(now, columns))
 
-            # Print summary
-            summary = " | ".join([f"{z}: {d['current']}/{d['capacity']} CRI={d['cri']} P={d['predicted']}" for z, d in new_state.items()])
-            print(f"[{now.strftime('%H:%M:%S')}] {summary}")
 
-        except Exception as e:
-            print(f"❌ Simulation error: {e}")
-            import traceback
-            traceback.print_exc()
-
-        # Faster polling for snappy automation (4-6 seconds)
-        time.sleep(random.uniform(4, 6))
+def sharded_simulator_loop(n_shards):
+    global shard_supervisor
+    shard_supervisor = ShardSupervisor(zone_registry.ids, zone_registry.capacity, n_shards).start()
+    print(f"🚀 Sharded Simulation Engine Started ({n_shards} worker processes)...")
+    atexit.register(shard_supervisor.stop)
+    tick_pipeline.start()
+    tick_scheduler.run(publish_shard_tick)
 
 
 # ─────────────────────────────────────────────
@@ -1112,21 +707,21 @@ def simulator_loop():
 def get_live_data():
     """Returns live data for all zones and crowd flows."""
     return jsonify({
-        "zones": live_data,
-        "flows": current_flows
+        "zones": sim.live_data,
+        "flows": sim.current_flows
     })
 
 
 @app.route('/api/alerts', methods=['GET'])
 def get_alerts():
     """Returns current active alerts."""
-    return jsonify(alerts)
+    return jsonify(sim.alerts)
 
 
 @app.route('/api/zone/<zone_id>', methods=['GET'])
 def get_zone_data(zone_id):
     """Returns data for a specific zone."""
-    data = live_data.get(zone_id)
+    data = sim.live_data.get(zone_id)
     if data:
         return jsonify(data)
     return jsonify({"error": "Zone not found"}), 404
@@ -1135,15 +730,159 @@ def get_zone_data(zone_id):
 @app.route('/api/history/<zone_id>', methods=['GET'])
 def get_zone_history(zone_id):
     """Returns density history for a zone (last 100 readings)."""
-    hist = history.get(zone_id)
+    hist = sim.history.get(zone_id)
     if hist is not None:
-        return jsonify({"zone_id": zone_id, "history": hist, "count": len(hist)})
+        return jsonify({"zone_id": zone_id, "history": hist.tolist(), "count": len(hist)})
     return jsonify({"error": "Zone not found"}), 404
 
 
+@app.route('/api/pipeline/status', methods=['GET'])
+def get_pipeline_status():
+    """Returns queue depth, throughput and drop counters of the tick sinks (persistence, notification)."""
+    return jsonify(tick_pipeline.stats())
+
+
+@app.route('/api/scheduler/status', methods=['GET'])
+def get_scheduler_status():
+    """Returns tick cadence, per-tick lag and overrun / skip counters."""
+    return jsonify(tick_scheduler.stats())
+
+
+@app.route('/api/shards/status', methods=['GET'])
+def get_shard_status():
+    """Returns shard worker processes, their zone counts and snapshot sequence numbers."""
+    if shard_supervisor is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **shard_supervisor.status()})
+
+
+@app.route('/api/events/cache', methods=['GET'])
+def get_registration_cache_stats():
+    """Returns registration cache size, refresh mode and refresh counters."""
+    return jsonify(registration_cache.stats())
+
+
+@app.route('/api/telemetry/<zone_id>', methods=['GET'])
+def get_zone_telemetry(zone_id):
+    """
+    Zone telemetry over a time range, from the storage tier that fits it.
+    Query: hours (default 1) or start / end (ISO); optional tier = raw | 1m | 15m | 1h.
+    """
+    if telemetry_store is None:
+        return jsonify({"error": "Database not available"}), 503
+    if zone_id not in ZONES:
+        return jsonify({"error": "Zone not found"}), 404
+    tier = request.args.get('tier')
+    if tier not in (None, "raw", "1m", "15m", "1h"):
+        return jsonify({"error": f"Unknown tier '{tier}'"}), 400
+    try:
+        end = datetime.datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.datetime.now()
+        if 'start' in request.args:
+            start = datetime.datetime.fromisoformat(request.args['start'])
+        else:
+            start = end - datetime.timedelta(hours=float(request.args.get('hours', 1)))
+    except ValueError as e:
+        return jsonify({"error": f"Bad time range: {e}"}), 400
+    try:
+        tier, points = telemetry_store.history(zone_id, start, end, tier)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"zone_id": zone_id, "start": start.isoformat(), "end": end.isoformat(),
+                    "tier": tier, "count": len(points), "points": points})
+
+
+@app.route('/api/metrics/<zone_id>', methods=['GET'])
+def get_zone_rollups(zone_id):
+    """
+    Hourly or daily aggregates for a zone: count, mean / min / max / p95 of
+    density and CRI, alert counts. Query: period = hour | day, days (default 7).
+    """
+    if zone_rollups is None:
+        return jsonify({"error": "Database not available"}), 503
+    if zone_id not in ZONES:
+        return jsonify({"error": "Zone not found"}), 404
+    period = request.args.get('period', 'hour')
+    if period not in ("hour", "day"):
+        return jsonify({"error": f"Unknown period '{period}'"}), 400
+    try:
+        start = datetime.datetime.now() - datetime.timedelta(days=float(request.args.get('days', 7)))
+    except ValueError:
+        return jsonify({"error": "days must be a number"}), 400
+    try:
+        rows = zone_rollups.query(zone_id, period, start)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"zone_id": zone_id, "period": period, "count": len(rows), "rows": rows})
+
+
+@app.route('/api/telemetry/status', methods=['GET'])
+def get_telemetry_status():
+    """Returns bucket / rollup flush counters and retention settings."""
+    if telemetry_store is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, "layout": Config.TELEMETRY_LAYOUT, **telemetry_store.stats()})
+
+
+@app.route('/api/storage/indexes', methods=['GET'])
+def get_index_status():
+    """Returns declared indexes that do not exist yet (see db_schema.py)."""
+    if not USE_MONGO:
+        return jsonify({"error": "Database not available"}), 503
+    try:
+        missing = missing_indexes(db)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"ok": not missing, "missing": missing})
+
+
+@app.route('/api/storage/writes', methods=['GET'])
+def get_write_buffer_stats():
+    """Returns pending, flushed, dropped / spilled counts and flush latency per collection."""
+    return jsonify(telemetry_writer.stats())
+
+
+@app.route('/api/agent/status', methods=['GET'])
+def get_agent_status():
+    """Returns automation agent pool queue depth, coalesced and rejected counts."""
+    return jsonify(agent_executor.stats())
+
+
+@app.route('/api/model/cache', methods=['GET'])
+def get_prediction_cache_stats():
+    """Returns hit/miss counters of the prediction cache."""
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **prediction_cache.stats()})
+
+
+@app.route('/api/model/status', methods=['GET'])
+def get_model_status():
+    """Returns the active model bundle version and load time."""
+    return jsonify(model_registry.status())
+
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_model():
+    """Loads the bundle at MODEL_PATH in the background and swaps it in when warm."""
+    if model_registry.loading:
+        return jsonify({"message": "A model load is already in progress"}), 409
+    model_registry.reload_async()
+    return jsonify({"message": "Model reload started", "active": model_registry.status()["active"]}), 202
+
+
+@app.route('/api/model/rollback', methods=['POST'])
+def rollback_model():
+    """Swaps back to the *_OLD.pkl backup written by train_model.py."""
+    snapshot = model_registry.rollback()
+    if snapshot is None:
+        return jsonify({"error": model_registry.last_error}), 409
+    return jsonify({"message": "Rolled back to backup model", "active": snapshot.info()}), 200
+
+
 @app.route('/api/summary', methods=['GET'])
 def get_summary():
     """Returns aggregated summary metrics."""
+    live_data, alerts = sim.live_data, sim.alerts
     if not live_data:
         return jsonify({"error": "No data yet"}), 503
 
@@ -1181,7 +920,7 @@ def get_trend():
         except Exception as e:
             print(f"⚠️ MongoDB fetch error: {e}")
             
-    return jsonify(trend_data)
+    return jsonify(sim.trend_data)
 
 
 @app.route('/api/forecast', methods=['GET'])
@@ -1194,15 +933,16 @@ def get_forecast():
         if hour is None or hour < 0 or hour > 23:
             return jsonify({"error": "Invalid hour (0-23 required)"}), 400
             
-        t_mult = get_time_factor(hour, minute, datetime.datetime.now().weekday())
+        weekday = datetime.datetime.now().weekday()
         forecast_state = {}
+
+        # Synthetic state for future time, for every zone in one table lookup
+        type_ids = behavior.type_ids(zone_registry.types)
+        sim_counts = (zone_registry.base_density * behavior.activities(type_ids, weekday, hour, minute)).astype(np.int64)
         
-        for zid, config in ZONES.items():
-            base = config["base_density"]
-            z_mult = t_mult * get_zone_modifier(config.get("type"), hour, minute)
-            
-            # Synthetic state for future time
-            sim_count = int(base * z_mult)
+        for i, zid in enumerate(zone_registry.ids):
+            config = ZONES[zid]
+            sim_count = int(sim_counts[i])
             
             # Simplified growth rate for forecast
             growth = 0.03 if hour == 7 else 0.05 if (hour == 8 and minute < 30) else 0.0
@@ -1259,10 +999,14 @@ def get_zone_forecast_24h(zone_id):
         config = ZONES[zone_id]
         base = config["base_density"]
         full_day = []
+
+        # All 24 hourly activity factors in one table lookup
+        hours = np.arange(24)
+        type_id = behavior.type_ids([config.get("type")])[0]
+        z_mults = behavior.activities(type_id, datetime.datetime.now().weekday(), hours, 0)
         
         for h in range(24):
-            t_mult = get_time_factor(h, 0, datetime.datetime.now().weekday())
-            z_mult = t_mult * get_zone_modifier(config.get("type"), h, 0)
+            z_mult = z_mults[h]
             # Predicted value (integer)
             sim_count = int(base * z_mult)
             
@@ -1286,7 +1030,7 @@ def get_zone_trend(zone_id):
     if zone_id not in ZONES:
         return jsonify({"error": "Zone not found"}), 404
     
-    source_data = trend_data
+    source_data = sim.trend_data
     if USE_MONGO:
         try:
             cursor = trend_collection.find().sort("created_at", -1).limit(240)
@@ -1313,8 +1057,6 @@ def get_zone_trend(zone_id):
 # ─────────────────────────────────────────────
 def seed_trend_data():
     """Pre-populates the last 2 hours of trend data for immediate visualization."""
-    global trend_data
-    
     if USE_MONGO:
         try:
             count = trend_collection.count_documents({})
@@ -1323,7 +1065,7 @@ def seed_trend_data():
                 # Load latest 240 into memory for immediate cache
                 cursor = trend_collection.find().sort("created_at", -1).limit(240)
                 data = list(cursor)
-                trend_data = data[::-1]
+                sim.trend_data = data[::-1]
                 return
         except Exception as e:
             print(f"⚠️ Mongo check failed during seed: {e}")
@@ -1335,14 +1077,14 @@ def seed_trend_data():
     for i in range(120, 0, -1):
         past_time = now - datetime.timedelta(minutes=i)
         h = past_time.hour
-        t_mult = get_time_factor(h, past_time.minute, past_time.weekday())
+        weekday = past_time.weekday()
         zones_snap = {}
         total_act = 0
         total_pred = 0
                 
         for zid, config in ZONES.items():
             # Apply zonal behavioral logic
-            z_mult = t_mult * get_zone_modifier(config.get("type"), h, past_time.minute)
+            z_mult = behavior.activity(config.get("type"), h, past_time.minute, weekday)
             
             # Base simulated density with some noise
             target_density = int(config["base_density"] * z_mult * random.uniform(0.95, 1.05))
@@ -1365,7 +1107,7 @@ def seed_trend_data():
             "zones": zones_snap,
             "created_at": past_time
         }
-        trend_data.append(snapshot)
+        sim.trend_data.append(snapshot)
         batch.append(snapshot)
 
     if USE_MONGO and batch:
@@ -1374,7 +1116,7 @@ def seed_trend_data():
         except Exception as e:
             print(f"⚠️ Failed to seed MongoDB: {e}")
             
-    print(f"✅ Seeding complete. {len(trend_data)} records generated.")
+    print(f"✅ Seeding complete. {len(sim.trend_data)} records generated.")
 
 def seed_admin_user():
     """Seeds a default admin user if none exists."""
@@ -1395,11 +1137,32 @@ if __name__ == '__main__':
     
     # Pre-seed history
     seed_trend_data()
+
+    # Load approved registrations / roles and keep them fresh in the background
+    registration_cache.start()
     
-    # Start simulator in background thread
-    sim_thread = threading.Thread(target=simulator_loop, daemon=True)
+    # Flush the day-lag store on shutdown so yesterday's readings survive restarts
+    atexit.register(sim.day_lag.save)
+    # Flush buffered telemetry / trend writes on shutdown
+    atexit.register(telemetry_writer.close)
+    if telemetry_store is not None:
+        telemetry_store.start()
+        atexit.register(telemetry_store.close)
+    if zone_rollups is not None:
+        zone_rollups.start()
+        atexit.register(zone_rollups.close)
+
+    # Start simulator in background thread (which supervises the shard processes when SIM_SHARDS > 0)
+    if Config.SIM_SHARDS > 0:
+        sim_thread = threading.Thread(target=sharded_simulator_loop, args=(Config.SIM_SHARDS,), daemon=True)
+    else:
+        sim_thread = threading.Thread(target=simulator_loop, daemon=True)
     sim_thread.start()
 
+    # Hot-reload the model bundle when train_model.py rewrites it
+    if Config.MODEL_WATCH_SECONDS > 0:
+        model_registry.start_watcher(Config.MODEL_WATCH_SECONDS)
+
     print("=" * 60)
     print("  CrowdSense Backend API")
     print("  http://127.0.0.1:5000")
@@ -1413,6 +1176,7 @@ if __name__ == '__main__':
     print("    GET /api/trend          — Time-series trend data")
     print("    GET /api/trend/<id>     — Zone-specific trend data")
     print("    GET /api/forecast       — Future state prediction")
+    print("    GET /api/model/status   — Active model version")
     print("=" * 60)
 
     port = int(os.getenv("PORT", 5000))
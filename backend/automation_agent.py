@@ -1,5 +1,6 @@
 
 import os
+import queue
 import threading
 import time
 import datetime
@@ -110,7 +111,8 @@ class AutomationAgent:
 
     def _send_alert_email(self, zone_id, event, zone_data):
         """
-        Sends an email in a separate thread.
+        Sends an email. Runs on an AgentExecutor worker, so it blocks that
+        worker instead of starting yet another thread.
         """
         if not self.email_user or not self.email_pass:
             print("   ⚠️ Email credentials missing. Skipping email.")
@@ -136,7 +138,7 @@ class AutomationAgent:
         
         # Recipient list - Fetch from MongoDB if available
         recipients = []
-        if self.db_registrations:
+        if self.db_registrations is not None:
             try:
                 # Find approved contacts for this zone
                 regs = list(self.db_registrations.find({"zone_id": zone_id, "status": { "$in": ["APPROVED", "PENDING"] }}))
@@ -152,24 +154,106 @@ class AutomationAgent:
             print(f"   ⚠️ [AutoAgent] No recipients found for {zone_id}. Skipping email.")
             return
 
-        def send():
+        try:
+            # Deduplicate recipients
+            unique_recipients = list(set(recipients))
+            
+            msg = EmailMessage()
+            msg.set_content(body)
+            msg['Subject'] = subject
+            msg['From'] = self.email_user
+            msg['To'] = ", ".join(unique_recipients)
+
+            with smtplib.SMTP(self.email_host, self.email_port, timeout=30) as server:
+                server.starttls()
+                server.login(self.email_user, self.email_pass)
+                server.send_message(msg)
+            
+            print(f"   📧 [AutoAgent] Email sent to {len(unique_recipients)} recipients for {zone_id}")
+        except Exception as e:
+            print(f"   ❌ [AutoAgent] Email failed: {e}")
+
+
+class AgentExecutor:
+    """
+    Fixed pool of worker threads in front of AutomationAgent.handle_events.
+    At most one job per zone is queued: a zone submitted again before its job
+    has started is coalesced into it (latest zone data, union of events).
+    A zone submitted while its job is running is held until that job finishes,
+    so two workers never handle the same zone (and its cooldowns) at once.
+    When max_queue zones are already pending, new work is rejected.
+    """
+
+    def __init__(self, agent, workers=2, max_queue=64):
+        self.agent = agent
+        self.max_queue = max_queue
+        self._pending = {}               # zone_id -> (zone_data, events)
+        self._order = queue.Queue()      # zone_ids in submission order (one entry per pending zone not running)
+        self._running = set()            # zone_ids a worker is handling right now
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self._threads = [threading.Thread(target=self._run, name=f"agent-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, zone_id, zone_data, events):
+        """Queues agent work for a zone. Returns False if the queue is full."""
+        if not events:
+            return True
+        with self._lock:
+            self.submitted += 1
+            if zone_id in self._pending:
+                _, queued_events = self._pending[zone_id]
+                merged = queued_events + [e for e in events if e not in queued_events]
+                self._pending[zone_id] = (zone_data, merged)
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                return False
+            self._pending[zone_id] = (zone_data, list(events))
+            if zone_id in self._running:
+                # Held; queued by the running job's worker when it finishes
+                return True
+        self._order.put(zone_id)
+        return True
+
+    def _run(self):
+        while True:
+            zone_id = self._order.get()
+            with self._lock:
+                zone_data, events = self._pending.pop(zone_id)
+                self._running.add(zone_id)
             try:
-                # Deduplicate recipients
-                unique_recipients = list(set(recipients))
-                
-                msg = EmailMessage()
-                msg.set_content(body)
-                msg['Subject'] = subject
-                msg['From'] = self.email_user
-                msg['To'] = ", ".join(unique_recipients)
-
-                with smtplib.SMTP(self.email_host, self.email_port) as server:
-                    server.starttls()
-                    server.login(self.email_user, self.email_pass)
-                    server.send_message(msg)
-                
-                print(f"   📧 [AutoAgent] Email sent to {len(unique_recipients)} recipients for {zone_id}")
+                self.agent.handle_events(zone_id, zone_data, events)
+                with self._lock:
+                    self.completed += 1
             except Exception as e:
-                print(f"   ❌ [AutoAgent] Email failed: {e}")
+                with self._lock:
+                    self.failed += 1
+                print(f"   ❌ [AutoAgent] Worker error for {zone_id}: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(zone_id)
+                    held = zone_id in self._pending
+                if held:
+                    self._order.put(zone_id)
 
-        threading.Thread(target=send).start()
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "queue_depth": len(self._pending),
+                "in_flight": len(self._running),
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed
+            }
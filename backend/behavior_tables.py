@@ -0,0 +1,90 @@
+"""
+CrowdSense Behavior Tables
+Precomputes the branchy time-of-day behavior functions into per-minute lookup
+tables: the global time factor as weekday x minute-of-day (7 x 1440) and, per
+zone type, the zone modifier and the combined activity (type x 7 x 1440).
+Lookups are plain array indexing, scalar or vectorized.
+"""
+
+import threading
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+DAYS_PER_WEEK = 7
+
+
+def minute_of_day(hour, minute):
+    """hour/minute (scalars or arrays) -> 0..1439; minutes past 59 roll into the next hour."""
+    return (np.asarray(hour) * 60 + np.asarray(minute)) % MINUTES_PER_DAY
+
+
+class BehaviorTables:
+    def __init__(self, time_factor_fn, zone_modifier_fn, zone_types=()):
+        self.time_factor_fn = time_factor_fn
+        self.zone_modifier_fn = zone_modifier_fn
+        self.version = 0
+        self._lock = threading.Lock()
+        self.rebuild(zone_types)
+
+    def rebuild(self, zone_types=None, time_factor_fn=None, zone_modifier_fn=None):
+        """
+        Re-evaluates the behavior functions for every minute of the week.
+        Call after the behavior functions or the zones' parameters change;
+        readers keep using the old tables until the new set is swapped in.
+        """
+        with self._lock:
+            self.time_factor_fn = time_factor_fn or self.time_factor_fn
+            self.zone_modifier_fn = zone_modifier_fn or self.zone_modifier_fn
+            if zone_types is None:
+                zone_types = self.type_names[1:]
+
+            # Row 0 is the fallback for types the modifier function does not know
+            type_names = [None] + sorted({t for t in zone_types if t is not None})
+            hours, minutes = np.divmod(np.arange(MINUTES_PER_DAY), 60)
+
+            time_table = np.asarray([
+                [self.time_factor_fn(int(h), int(m), weekday) for h, m in zip(hours, minutes)]
+                for weekday in range(DAYS_PER_WEEK)
+            ], dtype=np.float64)
+            modifier_table = np.asarray([
+                [self.zone_modifier_fn(zone_type, int(h), int(m)) for h, m in zip(hours, minutes)]
+                for zone_type in type_names
+            ], dtype=np.float64)
+            activity_table = time_table[np.newaxis, :, :] * modifier_table[:, np.newaxis, :]
+
+            # Swap the whole set at once so a concurrent reader never mixes versions
+            self._tables = ({name: i for i, name in enumerate(type_names)},
+                            time_table, modifier_table, activity_table)
+            self.type_names = type_names
+            self.version += 1
+
+    # ── Scalar lookups (drop-in for get_time_factor / get_zone_modifier) ──
+    def time_factor(self, hour, minute, weekday):
+        return float(self._tables[1][weekday, minute_of_day(hour, minute)])
+
+    def zone_modifier(self, zone_type, hour, minute):
+        type_index, _, modifier_table, _ = self._tables
+        return float(modifier_table[type_index.get(zone_type, 0), minute_of_day(hour, minute)])
+
+    def activity(self, zone_type, hour, minute, weekday):
+        """time_factor * zone_modifier for one zone type."""
+        type_index, _, _, activity_table = self._tables
+        return float(activity_table[type_index.get(zone_type, 0), weekday, minute_of_day(hour, minute)])
+
+    # ── Vectorized lookups ──
+    def type_ids(self, zone_types):
+        type_index = self._tables[0]
+        return np.asarray([type_index.get(t, 0) for t in zone_types], dtype=np.int64)
+
+    def time_factors(self, weekday, hour, minute):
+        """Array of time factors for broadcastable weekday/hour/minute arrays."""
+        return self._tables[1][np.asarray(weekday), minute_of_day(hour, minute)]
+
+    def zone_modifiers(self, type_ids, hour, minute):
+        """Array of zone modifiers for broadcastable type-id/hour/minute arrays."""
+        return self._tables[2][np.asarray(type_ids), minute_of_day(hour, minute)]
+
+    def activities(self, type_ids, weekday, hour, minute):
+        """Array of combined activity factors (time factor * zone modifier)."""
+        return self._tables[3][np.asarray(type_ids), np.asarray(weekday), minute_of_day(hour, minute)]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+import certifi
+
+from db_schema import ensure_indexes, missing_indexes, assert_no_collscan
+
+load_dotenv()
+
+# Usage: python check_indexes.py [--create] [--allow-missing]
+# Exits non-zero if an index is missing, a hot query plans a COLLSCAN, or a
+# hot collection does not exist (its plans cannot be checked; --allow-missing
+# only warns, e.g. on a fresh database).
+mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+if "mongodb+srv" in mongo_uri:
+    client = MongoClient(mongo_uri, tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000, tls=True)
+else:
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
+db = client["crowdsense"]
+
+try:
+    if "--create" in sys.argv:
+        ensure_indexes(db)
+
+    missing = missing_indexes(db)
+    for coll_name, names in missing.items():
+        print(f"  MISSING {coll_name}: {', '.join(names)}")
+
+    assert_no_collscan(db, allow_missing="--allow-missing" in sys.argv)
+    if missing:
+        print("INDEX CHECK FAILED")
+        sys.exit(1)
+    print("INDEX CHECK OK")
+except RuntimeError as e:
+    print(f"INDEX CHECK FAILED: {e}")
+    sys.exit(1)
+except Exception as e:
+    print(f"Error: {e}")
+    sys.exit(2)
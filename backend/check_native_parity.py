@@ -0,0 +1,25 @@
+import joblib
+import numpy as np
+from tree_evaluator import to_native_models, check_parity, parity_sample
+
+MODEL_PATH = "smart_crowd_per_location_model.pkl"
+try:
+    model_bundle = joblib.load(MODEL_PATH)
+    models = model_bundle["models"]
+    label_encoder = model_bundle["label_encoder"]
+    print("Model loaded")
+
+    native_models = to_native_models(models)
+    X = parity_sample(n_rows=2048)
+    ok, diffs = check_parity(models, native_models, X)
+    for idx, diff in diffs.items():
+        print(f"  {label_encoder.classes_[idx]:12s} | trees={native_models[idx].n_trees} | max_abs_diff={diff:.6f}")
+
+    # Missing values must follow the learned default direction
+    X_missing = X[:64].copy()
+    X_missing[:, 4] = np.nan
+    ok_missing, _ = check_parity(models, native_models, X_missing)
+
+    print("PARITY OK" if ok and ok_missing else "PARITY FAILED")
+except Exception as e:
+    print(f"Error: {e}")
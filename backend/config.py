@@ -14,3 +14,51 @@ class Config:
     CRI_CRITICAL_THRESHOLD = 85
     CRI_HIGH_THRESHOLD = 70
     SURGE_THRESHOLD = 0.30
+
+    # Inference Settings
+    # "xgboost" scores with the pickled XGBRegressor objects,
+    # "native" with the flat-array evaluator in tree_evaluator.py
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'xgboost')
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)) # 0 disables the cache
+    MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'auto') # auto | pickle | artifact
+    MODEL_WATCH_SECONDS = int(os.environ.get('MODEL_WATCH_SECONDS', 30)) # 0 disables hot reload
+
+    # Feature Store Settings
+    DAY_LAG_PATH = os.environ.get('DAY_LAG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'day_lag_store.npz'))
+    DAY_LAG_SAVE_SECONDS = int(os.environ.get('DAY_LAG_SAVE_SECONDS', 300)) # How often the simulator persists the store
+
+    # Simulation Settings
+    SIM_SEED = int(os.environ['SIM_SEED']) if os.environ.get('SIM_SEED') else None # Fixed seed for reproducible runs
+    PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 8)) # Bounded queue per tick pipeline stage
+    TICK_SECONDS = float(os.environ.get('TICK_SECONDS', 5)) # Simulator cadence
+    TICK_POLICY = os.environ.get('TICK_POLICY', 'skip') # skip | catch_up when a tick overruns
+    SIM_SHARDS = int(os.environ.get('SIM_SHARDS', 0)) # Simulator worker processes (0 = in-process thread)
+
+    # Automation Agent Settings
+    AGENT_WORKERS = int(os.environ.get('AGENT_WORKERS', 2)) # Fixed worker threads for agent / email work
+    AGENT_QUEUE_SIZE = int(os.environ.get('AGENT_QUEUE_SIZE', 64)) # Max zones with pending agent work
+
+    # Registration Cache Settings
+    REGISTRATION_REFRESH_SECONDS = int(os.environ.get('REGISTRATION_REFRESH_SECONDS', 300)) # Full reload safety net
+
+    # MongoDB Write-Behind Settings
+    WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', 500)) # Max documents per insert_many
+    WRITE_FLUSH_SECONDS = float(os.environ.get('WRITE_FLUSH_SECONDS', 2)) # Max age of a pending document
+    WRITE_BUFFER_MAX = int(os.environ.get('WRITE_BUFFER_MAX', 20000)) # Pending documents kept in memory
+    WRITE_OVERFLOW = os.environ.get('WRITE_OVERFLOW', 'drop_oldest') # drop_oldest | spill when the cap is hit
+    WRITE_SPILL_DIR = os.environ.get('WRITE_SPILL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'spill'))
+
+    # Telemetry Storage Settings
+    TELEMETRY_LAYOUT = os.environ.get('TELEMETRY_LAYOUT', 'bucket') # bucket | document (legacy raw_logs) | both
+    TELEMETRY_FLUSH_SECONDS = float(os.environ.get('TELEMETRY_FLUSH_SECONDS', 30)) # Bucket / rollup upsert interval
+    RAW_LOG_RETENTION_DAYS = int(os.environ.get('RAW_LOG_RETENTION_DAYS', 30)) # TTL of full raw_logs snapshots
+    BUCKET_RETENTION_DAYS = int(os.environ.get('BUCKET_RETENTION_DAYS', 7)) # Per-tick zone-hour buckets
+    ROLLUP_1M_RETENTION_DAYS = int(os.environ.get('ROLLUP_1M_RETENTION_DAYS', 30))
+    ROLLUP_15M_RETENTION_DAYS = int(os.environ.get('ROLLUP_15M_RETENTION_DAYS', 180))
+    ROLLUP_1H_RETENTION_DAYS = int(os.environ.get('ROLLUP_1H_RETENTION_DAYS', 730))
+
+    # Zone Rollup Settings
+    ROLLUP_FLUSH_SECONDS = float(os.environ.get('ROLLUP_FLUSH_SECONDS', 60)) # Hourly / daily aggregate upsert interval
+
+    # Zone Settings
+    ZONES_PATH = os.environ.get('ZONES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zones.json'))
@@ -11,15 +11,28 @@ class CrowdFlowEngine:
         zones_data: dict of {zone_id: {current, capacity, name, ...}}
         hour: current hour (0-23)
         """
-        flows = []
         zone_ids = list(zones_data.keys())
-        
+        zones = [zones_data[zid] for zid in zone_ids]
+        return self.calculate_zone_flows(
+            zone_ids,
+            [z['name'] for z in zones],
+            np.asarray([z['current'] for z in zones], dtype=np.float64),
+            np.asarray([z['capacity'] for z in zones], dtype=np.float64),
+            np.asarray([z['est_people'] for z in zones], dtype=np.float64),
+            hour
+        )
+
+    def calculate_zone_flows(self, zone_ids, names, current, capacity, est_people, hour, block_rows=256):
+        """
+        Array form of calculate_flows (zone attributes in registry order).
+        The pairwise scores are evaluated block_rows sources at a time, so
+        memory stays bounded with thousands of zones.
+        """
+        flows = []
+        n = len(zone_ids)
+
         # Calculate densities
-        densities = {}
-        for zid in zone_ids:
-            # We use est_people for a more "human" calculation
-            z = zones_data[zid]
-            densities[zid] = z['current'] / max(z['capacity'], 1)
+        densities = current / np.maximum(capacity, 1)
 
         # Time-based multiplier for flow intensity
         time_factor = 1.0
@@ -28,49 +41,34 @@ class CrowdFlowEngine:
         elif hour >= 20 or hour < 7:
             time_factor = 0.3  # Night - very low movement
 
-        for src_id in zone_ids:
-            src_zone = zones_data[src_id]
-            src_density = densities[src_id]
-            src_people = src_zone['est_people']
-            
-            # 1. Calculate flow scores for all possible destinations
-            flow_scores = {}
-            total_score = 0
-            
-            for dst_id in zone_ids:
-                if src_id == dst_id:
-                    continue
-                
-                dst_density = densities[dst_id]
-                # People move from high density to low density
-                # flow_score = max(0, src_density - dst_density)
-                # But we also add a "proximity" factor or just keep it simple as requested
-                score = max(0, src_density - dst_density)
-                
-                if score > 0:
-                    flow_scores[dst_id] = score
-                    total_score += score
-            
+        # We assume a small % of people in a zone are "mobile" at any time
+        mobility_rate = 0.05 * time_factor
+
+        for block_start in range(0, n, block_rows):
+            rows = np.arange(block_start, min(block_start + block_rows, n))
+
+            # 1. People move from high density to low density: score = max(0, src - dst)
+            scores = np.maximum(densities[rows, np.newaxis] - densities[np.newaxis, :], 0.0)
+            scores[np.arange(len(rows)), rows] = 0.0
+            # Sequential running sum, so totals match a left-to-right Python sum exactly
+            totals = np.cumsum(scores, axis=1)[:, -1] if n else np.zeros(len(rows))
+
             # 2. Normalize and calculate expected flows
-            if total_score > 0:
-                for dst_id, score in flow_scores.items():
-                    prob = score / total_score
-                    
-                    # Expected flow calculation
-                    # We assume a small % of people in a zone are "mobile" at any time
-                    mobility_rate = 0.05 * time_factor 
-                    people_moving = int(src_people * prob * mobility_rate)
-                    
-                    if people_moving >= 1: 
-                        intensity = round(min(score * 2 * time_factor, 1.0), 2)
-                        flows.append({
-                            "from": src_id,
-                            "from_name": src_zone['name'],
-                            "to": dst_id,
-                            "to_name": zones_data[dst_id]['name'],
-                            "volume": "High" if intensity > 0.7 else "Medium" if intensity > 0.3 else "Low", 
-                            "intensity": intensity
-                        })
+            with np.errstate(divide="ignore", invalid="ignore"):
+                probs = scores / totals[:, np.newaxis]
+                people_moving = est_people[rows, np.newaxis] * probs * mobility_rate
+
+            for r, c in zip(*np.nonzero((scores > 0) & (people_moving >= 1))):
+                src, score = rows[r], scores[r, c]
+                intensity = round(min(float(score) * 2 * time_factor, 1.0), 2)
+                flows.append({
+                    "from": zone_ids[src],
+                    "from_name": names[src],
+                    "to": zone_ids[c],
+                    "to_name": names[c],
+                    "volume": "High" if intensity > 0.7 else "Medium" if intensity > 0.3 else "Low", 
+                    "intensity": intensity
+                })
 
         # 3. Smoothing (Moving Average)
         self.flow_history.append(flows)
@@ -5,9 +5,13 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from pymongo import MongoClient
+import atexit
 import datetime
 import certifi
 ca = certifi.where()
+from config import Config
+from write_buffer import WriteBehindBuffer
+from db_schema import ensure_indexes_async
 
 # Step 2: Load MONGO_URI
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -34,10 +38,9 @@ try:
     alerts_collection = db["alerts"]
     zone_metrics_collection = db["zone_metrics"]
     
-    # Step 7: Indexing for performance
-    predictions_collection.create_index([("timestamp", -1)])
-    predictions_collection.create_index([("zone", 1)])
-    alerts_collection.create_index([("timestamp", -1)])
+    # Step 7: Indexing for performance (declared in db_schema.py, built in the background)
+    client.server_info()
+    ensure_indexes_async(db, ["predictions", "alerts", "zone_metrics"])
     
     print("✅ MongoDB Connected & Indexed")
 
@@ -47,18 +50,25 @@ except Exception as e:
     # But Step 2 says raise on missing URI. Missing URI is different from connection failure.
     pass
 
+# Prediction / alert records are batched into insert_many calls off the tick path
+write_buffer = WriteBehindBuffer(
+    Config.WRITE_BATCH_SIZE, Config.WRITE_FLUSH_SECONDS, Config.WRITE_BUFFER_MAX,
+    Config.WRITE_OVERFLOW, Config.WRITE_SPILL_DIR
+)
+atexit.register(write_buffer.close)
+
 def log_prediction(data):
-    """Inserts prediction record non-blockingly."""
+    """Queues prediction record on the write-behind buffer (never blocks)."""
     try:
         data["timestamp"] = datetime.datetime.utcnow()
-        predictions_collection.insert_one(data)
+        write_buffer.add(predictions_collection, data)
     except Exception as e:
         print(f"⚠️ Failed to log prediction: {e}")
 
 def log_alert(data):
-    """Inserts alert record non-blockingly."""
+    """Queues alert record on the write-behind buffer (never blocks)."""
     try:
         data["timestamp"] = datetime.datetime.utcnow()
-        alerts_collection.insert_one(data)
+        write_buffer.add(alerts_collection, data)
     except Exception as e:
         print(f"⚠️ Failed to log alert: {e}")
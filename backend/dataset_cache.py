@@ -0,0 +1,206 @@
+"""
+CrowdSense Dataset Cache
+Converts the device-level Excel dataset into a typed, columnar on-disk cache
+(one .npy file per column) keyed on the source file's hash, and serves it back
+through memory-mapped arrays. The xlsx is parsed once; every later load is a
+handful of np.load(mmap_mode="r") calls.
+
+Cache layout:
+    data/.cache/<sha256[:16]>/
+        manifest.json           column names, kinds, dtypes, row count, source info
+        <column>.npy            numeric columns (timestamps as datetime64[s])
+        <column>.codes.npy      dictionary-encoded string columns
+        <column>.categories.json
+
+Usage:
+    python dataset_cache.py            # build (or verify) the cache and time a load
+    python dataset_cache.py --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATASET_PATH = os.path.join(DATA_DIR, "device_level_crowd_15k_3min_interval.xlsx")
+CACHE_ROOT = os.path.join(DATA_DIR, ".cache")
+CACHE_FORMAT_VERSION = 1
+
+# Columns stored as datetime64 instead of strings
+TIMESTAMP_COLUMNS = ("timestamp",)
+
+
+def source_hash(path):
+    """Full sha256 of the source file; the first 16 hex chars name the cache directory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir_for(path, cache_root=CACHE_ROOT):
+    return os.path.join(cache_root, source_hash(path)[:16])
+
+
+# ─────────────────────────────────────────────
+# Build
+# ─────────────────────────────────────────────
+def build_cache(path=DATASET_PATH, cache_root=CACHE_ROOT):
+    """Parses the xlsx once and writes the columnar cache. Returns the cache directory."""
+    import pandas as pd
+
+    digest = source_hash(path)
+    cache_dir = os.path.join(cache_root, digest[:16])
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    df = pd.read_excel(path)
+    manifest = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "source": os.path.basename(path),
+        "source_sha256": digest,
+        "rows": int(len(df)),
+        "columns": {}
+    }
+
+    for name in df.columns:
+        col = df[name]
+        if name in TIMESTAMP_COLUMNS:
+            arr = pd.to_datetime(col).to_numpy().astype("datetime64[s]")
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+            manifest["columns"][name] = {"kind": "timestamp", "dtype": arr.dtype.str}
+        elif pd.api.types.is_numeric_dtype(col):
+            arr = np.ascontiguousarray(col.to_numpy())
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+            manifest["columns"][name] = {"kind": "numeric", "dtype": arr.dtype.str}
+        else:
+            codes, categories = pd.factorize(col.astype(str), sort=True)
+            codes = codes.astype(np.int32 if len(categories) > 32767 else np.int16)
+            np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), codes)
+            with open(os.path.join(tmp_dir, f"{name}.categories.json"), "w") as f:
+                json.dump([str(c) for c in categories], f)
+            manifest["columns"][name] = {"kind": "category", "dtype": codes.dtype.str,
+                                         "n_categories": len(categories)}
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory in whole so readers never see a partial cache
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def ensure_cache(path=DATASET_PATH, cache_root=CACHE_ROOT, rebuild=False):
+    """Returns the cache directory for the current contents of path, building it if needed."""
+    cache_dir = cache_dir_for(path, cache_root)
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if rebuild or not os.path.exists(manifest_path):
+        return build_cache(path, cache_root)
+    with open(manifest_path) as f:
+        if json.load(f).get("format_version") != CACHE_FORMAT_VERSION:
+            return build_cache(path, cache_root)
+    return cache_dir
+
+
+# ─────────────────────────────────────────────
+# Load
+# ─────────────────────────────────────────────
+class ColumnarDataset:
+    """Memory-mapped view over one cache directory."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.rows = self.manifest["rows"]
+        self.columns = list(self.manifest["columns"])
+        self._categories = {}
+
+    def __len__(self):
+        return self.rows
+
+    def kind(self, name):
+        return self.manifest["columns"][name]["kind"]
+
+    def array(self, name):
+        """Raw mapped array: values for numeric/timestamp columns, int codes for string columns."""
+        suffix = ".codes.npy" if self.kind(name) == "category" else ".npy"
+        return np.load(os.path.join(self.cache_dir, name + suffix), mmap_mode="r")
+
+    def categories(self, name):
+        if name not in self._categories:
+            with open(os.path.join(self.cache_dir, f"{name}.categories.json")) as f:
+                self._categories[name] = json.load(f)
+        return self._categories[name]
+
+    def mask(self, name, value):
+        """Boolean row mask for a string column == value, evaluated on the codes."""
+        categories = self.categories(name)
+        if value not in categories:
+            return np.zeros(self.rows, dtype=bool)
+        return self.array(name) == categories.index(value)
+
+    def to_frame(self, columns=None):
+        """pandas DataFrame with string columns as Categoricals built on the mapped codes."""
+        import pandas as pd
+        data = {}
+        for name in columns or self.columns:
+            if self.kind(name) == "category":
+                data[name] = pd.Categorical.from_codes(self.array(name), self.categories(name))
+            else:
+                data[name] = self.array(name)
+        return pd.DataFrame(data, copy=False)
+
+
+def open_device_dataset(path=DATASET_PATH, cache_root=CACHE_ROOT):
+    """Entry point for training / evaluation / replay tooling."""
+    return ColumnarDataset(ensure_cache(path, cache_root))
+
+
+def load_device_dataset(columns=None, path=DATASET_PATH, cache_root=CACHE_ROOT):
+    """Same rows and columns as pd.read_excel(path), read from the columnar cache."""
+    return open_device_dataset(path, cache_root).to_frame(columns)
+
+
+def location_series(dataset, location):
+    """
+    Per-interval aggregates for one location, as a dict of equal-length arrays:
+    timestamp, devices (row count), density, value and rssi (interval means).
+    """
+    mask = dataset.mask("location", location)
+    timestamps = np.asarray(dataset.array("timestamp"))[mask]
+    unique_ts, inverse = np.unique(timestamps, return_inverse=True)
+    devices = np.bincount(inverse)
+    series = {"timestamp": unique_ts, "devices": devices}
+    for name in ("density", "value", "rssi"):
+        values = np.asarray(dataset.array(name))[mask].astype(np.float64)
+        series[name] = np.bincount(inverse, weights=values) / devices
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the columnar cache for the device-level dataset")
+    parser.add_argument("--input", default=DATASET_PATH)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache_dir = ensure_cache(args.input, rebuild=args.rebuild)
+    print(f"✅ Cache ready at {cache_dir} ({time.perf_counter() - start:.2f}s)")
+
+    start = time.perf_counter()
+    df = load_device_dataset(path=args.input)
+    print(f"Loaded {len(df):,} rows x {len(df.columns)} columns from cache in {time.perf_counter() - start:.3f}s")
+    print(df.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+CrowdSense MongoDB Index Schema
+Declares the indexes every collection needs for the query shapes the backend
+actually runs, creates them in the background at startup, reports missing
+ones, and checks the hot queries with explain() so a query that falls back
+to a full collection scan (COLLSCAN) is caught.
+
+When adding a query on a new field, add its index to INDEXES and the query
+shape to HOT_QUERIES.
+"""
+
+import datetime
+import threading
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+from config import Config
+
+DAY = 86400
+
+# ── Required indexes per collection ──
+# {collection: [(name, keys[, options]), ...]}; options go to create_index
+# (e.g. expireAfterSeconds for TTL retention)
+INDEXES = {
+    "registrations": [
+        # status + zone: approved-per-zone lookups (registration cache, capacity
+        # endpoint, automation agent's status $in) and status-only reloads
+        ("status_zone", [("status", ASCENDING), ("zone_id", ASCENDING)]),
+        # Duplicate check / status updates / my-registrations
+        ("user_event", [("user_email", ASCENDING), ("event_name", ASCENDING)]),
+        ("contact_email", [("contact_email", ASCENDING)]),
+        # Admin list, newest first
+        ("timestamp_desc", [("timestamp", DESCENDING)]),
+    ],
+    "users": [
+        ("email", [("email", ASCENDING)]),
+    ],
+    "alert_history": [
+        ("created_at_desc", [("created_at", DESCENDING)]),
+    ],
+    "trends": [
+        ("created_at_desc", [("created_at", DESCENDING)]),
+    ],
+    "raw_logs": [
+        # Legacy full-snapshot documents: sorted by time and expired by TTL
+        ("created_at_ttl", [("created_at", ASCENDING)], {"expireAfterSeconds": Config.RAW_LOG_RETENTION_DAYS * DAY}),
+    ],
+    # Bucketed telemetry (telemetry_store.py): expires_at carries each tier's retention
+    "zone_buckets": [
+        ("zone_start", [("zone_id", ASCENDING), ("start", ASCENDING)]),
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "zone_rollup_1m": [
+        ("zone_start", [("zone_id", ASCENDING), ("start", ASCENDING)]),
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "zone_rollup_15m": [
+        ("zone_start", [("zone_id", ASCENDING), ("start", ASCENDING)]),
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "zone_rollup_1h": [
+        ("zone_start", [("zone_id", ASCENDING), ("start", ASCENDING)]),
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    # Hourly / daily zone aggregates (rollup_engine.py; both backends)
+    "zone_metrics": [
+        ("zone_period_start", [("zone_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)]),
+    ],
+    # FastAPI backend (main.py / database.py)
+    "predictions": [
+        ("timestamp_desc", [("timestamp", DESCENDING)]),
+        ("zone_timestamp", [("zone", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "alerts": [
+        ("timestamp_desc", [("timestamp", DESCENDING)]),
+    ],
+}
+
+# ── Hot query shapes (checked with explain) ──
+# (collection, filter, sort) with representative values
+HOT_QUERIES = [
+    ("registrations", {"status": "APPROVED"}, None),
+    ("registrations", {"zone_id": "lib", "status": "APPROVED"}, None),
+    ("registrations", {"zone_id": "lib", "status": {"$in": ["APPROVED", "PENDING"]}}, None),
+    ("registrations", {"user_email": "a@vnrvjiet.in", "event_name": "Demo"}, None),
+    ("registrations", {"$or": [{"user_email": "a@vnrvjiet.in"}, {"contact_email": "a@vnrvjiet.in"}]}, [("timestamp", -1)]),
+    ("registrations", {}, [("timestamp", -1)]),
+    ("users", {"email": "a@vnrvjiet.in"}, None),
+    ("users", {"email": "a@vnrvjiet.in", "password": "x"}, None),
+    ("alert_history", {}, [("created_at", -1)]),
+    ("trends", {}, [("created_at", -1)]),
+    ("raw_logs", {}, [("created_at", -1)]),
+    ("zone_buckets", {"zone_id": "lib", "start": {"$gte": datetime.datetime(2026, 1, 1)}}, [("start", 1)]),
+    ("zone_rollup_15m", {"zone_id": "lib", "start": {"$gte": datetime.datetime(2026, 1, 1)}}, [("start", 1)]),
+    ("zone_metrics", {"zone_id": "lib", "period": "hour", "start": {"$gte": datetime.datetime(2026, 1, 1)}}, [("start", 1)]),
+    ("predictions", {}, [("timestamp", -1)]),
+    ("predictions", {"zone": "Library"}, [("timestamp", -1)]),
+    ("alerts", {}, [("timestamp", -1)]),
+]
+
+
+def _key(keys):
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+def _specs(coll_name):
+    """Declared indexes of a collection as (name, keys, options)."""
+    return [(spec[0], spec[1], spec[2] if len(spec) > 2 else {}) for spec in INDEXES[coll_name]]
+
+
+def missing_indexes(db, collections=None):
+    """{collection: [index name, ...]} of declared indexes that do not exist yet."""
+    missing = {}
+    for coll_name in INDEXES:
+        if collections is not None and coll_name not in collections:
+            continue
+        existing = {_key(info["key"]) for info in db[coll_name].index_information().values()}
+        names = [name for name, keys, _ in _specs(coll_name) if _key(keys) not in existing]
+        if names:
+            missing[coll_name] = names
+    return missing
+
+
+def ensure_indexes(db, collections=None):
+    """Creates the declared indexes (background builds; existing ones are left alone)."""
+    created = []
+    for coll_name, names in missing_indexes(db, collections).items():
+        for name, keys, options in _specs(coll_name):
+            if name not in names:
+                continue
+            try:
+                db[coll_name].create_index(keys, name=name, background=True, **options)
+                created.append(f"{coll_name}.{name}")
+            except PyMongoError as e:
+                print(f"⚠️ Index {coll_name}.{name} not created: {e}")
+    sync_ttl(db, collections)
+    if created:
+        print(f"🗂️ Created indexes: {', '.join(created)}")
+    return created
+
+
+def sync_ttl(db, collections=None):
+    """Applies changed TTL retention settings to existing TTL indexes (collMod)."""
+    for coll_name in INDEXES:
+        if collections is not None and coll_name not in collections:
+            continue
+        existing = {_key(info["key"]): info for info in db[coll_name].index_information().values()}
+        for name, keys, options in _specs(coll_name):
+            ttl = options.get("expireAfterSeconds")
+            info = existing.get(_key(keys))
+            if ttl is None or info is None or info.get("expireAfterSeconds") == ttl:
+                continue
+            try:
+                db.command("collMod", coll_name, index={"keyPattern": dict(keys), "expireAfterSeconds": ttl})
+                print(f"🗂️ {coll_name}.{name} retention set to {ttl}s")
+            except PyMongoError as e:
+                print(f"⚠️ TTL update for {coll_name}.{name} failed: {e}")
+
+
+def ensure_indexes_async(db, collections=None):
+    """Runs ensure_indexes in a daemon thread so startup never waits on index builds."""
+    def build():
+        try:
+            ensure_indexes(db, collections)
+            missing = missing_indexes(db, collections)
+            if missing:
+                print(f"⚠️ Missing indexes after build: {missing}")
+            else:
+                print("✅ MongoDB indexes in place")
+        except PyMongoError as e:
+            print(f"⚠️ Index build failed: {e}")
+
+    thread = threading.Thread(target=build, name="index-build", daemon=True)
+    thread.start()
+    return thread
+
+
+def _plan_stages(plan):
+    """Yields every stage name of an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key in ("inputStage", "queryPlan"):
+            if key in plan:
+                yield from _plan_stages(plan[key])
+        for child in plan.get("inputStages", []):
+            yield from _plan_stages(child)
+
+
+def check_query_plans(db, collections=None):
+    """
+    Explains every HOT_QUERIES entry. Returns (scans, unverified):
+        scans       [(collection, filter, sort, stages)] whose winning plan contains a COLLSCAN
+        unverified  {collection: "missing" | "empty"}
+    A missing collection explains to an EOF plan, which says nothing about its
+    indexes, so its queries are not explained at all. An empty one is explained
+    but reported, since the plan of a real workload may differ.
+    """
+    scans = []
+    unverified = {}
+    existing = set(db.list_collection_names())
+    for coll_name, query, sort in HOT_QUERIES:
+        if collections is not None and coll_name not in collections:
+            continue
+        if coll_name not in existing:
+            unverified[coll_name] = "missing"
+            continue
+        if coll_name not in unverified and db[coll_name].estimated_document_count() == 0:
+            unverified[coll_name] = "empty"
+        cursor = db[coll_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning))
+        if "COLLSCAN" in stages:
+            scans.append((coll_name, query, sort, stages))
+    return scans, unverified
+
+
+def assert_no_collscan(db, collections=None, allow_missing=False):
+    """
+    Raises RuntimeError naming each hot query that would scan its whole collection,
+    or each collection that does not exist yet (unless allow_missing). Empty
+    collections only print a warning.
+    """
+    scans, unverified = check_query_plans(db, collections)
+    for coll_name, reason in unverified.items():
+        if reason == "empty":
+            print(f"⚠️ {coll_name} is empty: its query plans may differ under real data")
+        elif allow_missing:
+            print(f"⚠️ {coll_name} does not exist: its query plans were not checked")
+    if scans:
+        details = "; ".join(f"{c} {q} sort={s} -> {' <- '.join(st)}" for c, q, s, st in scans)
+        raise RuntimeError(f"{len(scans)} hot queries fall back to COLLSCAN: {details}")
+    missing = [c for c, reason in unverified.items() if reason == "missing"]
+    if missing and not allow_missing:
+        raise RuntimeError(f"Cannot check query plans of missing collections: {', '.join(missing)}")
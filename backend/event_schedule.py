@@ -0,0 +1,142 @@
+"""
+CrowdSense Event Schedule Index
+Per-zone index of event windows (minutes of the day) answering "which events
+are active in zone Z at time T" with one bisect.
+
+Each zone's day is cut at every window boundary into elementary segments,
+and the windows are stored in a segment tree over them: O(log n) entries per
+window instead of a copy of the active set per segment. A lookup is a binary
+search for the segment plus a walk up the tree.
+Windows whose end is before their start cross midnight and are split into
+[start, 24:00) and [00:00, end]. Events without a start / end time are
+active all day, as before. Times that are not HH:MM keep the old behaviour
+of comparing the raw strings with the current "HH:MM".
+"""
+
+import bisect
+import datetime
+
+MINUTES_PER_DAY = 1440
+
+
+def parse_hhmm(value):
+    """'HH:MM' (or 'H:MM') -> minute of day; None if it is not a time."""
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (ValueError, AttributeError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+def event_windows(start_time, end_time):
+    """
+    Half-open minute ranges [a, b) covered by an inclusive HH:MM window.
+    Returns None when the times cannot be parsed.
+    """
+    if not start_time or not end_time:
+        return [(0, MINUTES_PER_DAY)]
+    start, end = parse_hhmm(start_time), parse_hhmm(end_time)
+    if start is None or end is None:
+        return None
+    if start <= end:
+        return [(start, end + 1)]
+    # Crosses midnight (e.g. 22:00 - 01:30)
+    return [(start, MINUTES_PER_DAY), (0, end + 1)]
+
+
+class ZoneSchedule:
+    """Static interval index of one zone's events."""
+
+    def __init__(self, events, unparsed=()):
+        # events: [(order, event, windows)]; order keeps the registration order in results
+        # unparsed: [(order, event, start_time, end_time)] compared as strings, as before
+        points = {0, MINUTES_PER_DAY}
+        for _, _, windows in events:
+            for a, b in windows:
+                points.add(a)
+                points.add(b)
+        self.boundaries = sorted(points)[:-1]    # Segment i covers [boundaries[i], boundaries[i+1])
+        self.unparsed = list(unparsed)
+
+        # Segment tree over the segments: a window is stored once in each of the
+        # O(log n) nodes covering its range, and a lookup collects the nodes on the
+        # path from its leaf to the root
+        n = len(self.boundaries)
+        index = {point: i for i, point in enumerate(self.boundaries)}
+        index[MINUTES_PER_DAY] = n
+        self._leaves = 1
+        while self._leaves < n:
+            self._leaves *= 2
+        self._nodes = {}
+        for order, event, windows in events:
+            for a, b in windows:
+                lo, hi = index[a] + self._leaves, index[b] + self._leaves
+                while lo < hi:
+                    if lo & 1:
+                        self._nodes.setdefault(lo, []).append((order, event))
+                        lo += 1
+                    if hi & 1:
+                        hi -= 1
+                        self._nodes.setdefault(hi, []).append((order, event))
+                    lo >>= 1
+                    hi >>= 1
+        self.stored = sum(len(items) for items in self._nodes.values())
+
+    def active(self, minute):
+        found = []
+        node = bisect.bisect_right(self.boundaries, minute) - 1 + self._leaves
+        while node:
+            found.extend(self._nodes.get(node, ()))
+            node >>= 1
+        if self.unparsed:
+            hhmm = f"{minute // 60:02d}:{minute % 60:02d}"
+            found.extend((order, event) for order, event, s_time, e_time in self.unparsed
+                         if s_time <= hhmm <= e_time)
+        # A midnight-crossing event's two windows are disjoint, so nothing repeats
+        found.sort(key=lambda item: item[0])
+        return tuple(event for _, event in found)
+
+
+class EventSchedule:
+    """ZoneSchedule per zone, built from {zone_id: [registration, ...]}."""
+
+    EMPTY = ()
+
+    def __init__(self, registrations_by_zone):
+        self.zones = {}
+        self.events = 0
+        self.invalid = 0
+        for zone_id, registrations in registrations_by_zone.items():
+            events, unparsed = [], []
+            for order, reg in enumerate(registrations):
+                start_time, end_time = reg.get("start_time"), reg.get("end_time")
+                windows = event_windows(start_time, end_time)
+                if windows is None:
+                    unparsed.append((order, reg, str(start_time), str(end_time)))
+                else:
+                    events.append((order, reg, windows))
+            if events or unparsed:
+                self.zones[zone_id] = ZoneSchedule(events, unparsed)
+                self.events += len(events) + len(unparsed)
+                self.invalid += len(unparsed)
+
+    def active(self, zone_id, when):
+        """Events active in zone_id at `when` (datetime, time or minute of day), in registration order."""
+        schedule = self.zones.get(zone_id)
+        if schedule is None:
+            return self.EMPTY
+        if isinstance(when, (datetime.datetime, datetime.time)):
+            when = when.hour * 60 + when.minute
+        return schedule.active(when)
+
+    def stats(self):
+        return {
+            "zones": len(self.zones),
+            "events": self.events,
+            "invalid_windows": self.invalid,
+            "segments": sum(len(s.boundaries) for s in self.zones.values()),
+            "stored_windows": sum(s.stored for s in self.zones.values())
+        }
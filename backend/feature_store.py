@@ -0,0 +1,197 @@
+"""
+CrowdSense Feature Store
+Per-zone ring buffers for the density history. Each buffer keeps prefix sums
+of the values and their squares, so lag lookups, windowed means and the
+z-score statistics are all O(1) per tick regardless of the history length.
+DayLagStore adds minute-bucketed readings reaching back over a day, so the
+prev_day_density feature can use the real value from 24 hours earlier.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+class ZoneHistory:
+    """
+    Fixed-capacity history of integer readings (oldest dropped first).
+    Indexing and slicing semantics follow the list it replaces: index 0 is the
+    oldest reading still held, -1 the newest.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._values = np.zeros(capacity, dtype=np.int64)
+        # _prefix[i % (capacity + 1)] = sum of the first i readings ever pushed.
+        # Integer sums stay exact, so long-running servers do not accumulate drift.
+        self._prefix = np.zeros(capacity + 1, dtype=np.int64)
+        self._prefix_sq = np.zeros(capacity + 1, dtype=np.int64)
+        self._count = 0  # Total readings ever pushed
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def __bool__(self):
+        return self._count > 0
+
+    def append(self, value):
+        value = int(value)
+        n = self._count
+        self._values[n % self.capacity] = value
+        slot = (n + 1) % (self.capacity + 1)
+        prev = n % (self.capacity + 1)
+        self._prefix[slot] = self._prefix[prev] + value
+        self._prefix_sq[slot] = self._prefix_sq[prev] + value * value
+        self._count = n + 1
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("ZoneHistory index out of range")
+        return int(self._values[(self._count - size + index) % self.capacity])
+
+    def last(self, lag=1, default=None):
+        """The reading lag steps back (1 = newest), or default if not held."""
+        return self[-lag] if lag <= len(self) else default
+
+    def _bounds(self, start, stop):
+        # Window-relative slice -> absolute reading numbers [lo, hi)
+        lo, hi, _ = slice(start, stop).indices(len(self))
+        offset = self._count - len(self)
+        return offset + lo, offset + max(lo, hi)
+
+    def _range_sums(self, start=None, stop=None):
+        lo, hi = self._bounds(start, stop)
+        m = self.capacity + 1
+        total = int(self._prefix[hi % m] - self._prefix[lo % m])
+        total_sq = int(self._prefix_sq[hi % m] - self._prefix_sq[lo % m])
+        return hi - lo, total, total_sq
+
+    def window_mean(self, start=None, stop=None, default=None):
+        """Mean of history[start:stop] (list slice semantics), or default if empty."""
+        n, total, _ = self._range_sums(start, stop)
+        return total / n if n else default
+
+    def mean_last(self, k, default=None):
+        """Mean of the newest k readings (fewer while the buffer is still filling)."""
+        return self.window_mean(-k, None, default)
+
+    def mean(self):
+        return self.window_mean(default=0.0)
+
+    def std(self):
+        """Population standard deviation of the held window (np.std semantics)."""
+        n, total, total_sq = self._range_sums()
+        if n == 0:
+            return 0.0
+        # Exact integer variance numerator: n*Σx² - (Σx)²
+        return float(np.sqrt(max(n * total_sq - total * total, 0))) / n
+
+    def zscore(self, value=None):
+        """Z-score of value (default: the newest reading) against the held window."""
+        std = self.std()
+        if std == 0:
+            return 0.0
+        value = self[-1] if value is None else value
+        return (value - self.mean()) / std
+
+    def tolist(self):
+        """Held readings, oldest first (what /api/history returns)."""
+        if self._count < self.capacity:
+            return self._values[:self._count].tolist()
+        return np.roll(self._values, -(self._count % self.capacity)).tolist()
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class DayLagStore:
+    """
+    Time-indexed per-zone readings covering the last `days` days, one bucket per
+    minute. Bucket b of a zone holds the latest reading of epoch minute m where
+    m % n_buckets == b, plus that minute as a stamp so stale buckets are never
+    mistaken for fresh ones. "Same time yesterday" is a single array lookup.
+    """
+
+    def __init__(self, zone_ids, days=2, path=None):
+        self.zone_ids = list(zone_ids)
+        self.n_buckets = int(days * MINUTES_PER_DAY)
+        self.path = path
+        self._rows = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        self._values = np.zeros((len(self.zone_ids), self.n_buckets), dtype=np.int32)
+        self._stamps = np.full((len(self.zone_ids), self.n_buckets), -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def epoch_minute(ts):
+        return int(ts.timestamp() // 60)
+
+    def record(self, zone_id, ts, value):
+        row = self._rows.get(zone_id)
+        if row is None:
+            return
+        minute = self.epoch_minute(ts)
+        bucket = minute % self.n_buckets
+        self._values[row, bucket] = int(value)
+        self._stamps[row, bucket] = minute
+
+    def lookup(self, zone_id, ts, lag_minutes=MINUTES_PER_DAY, default=None, tolerance=2):
+        """
+        Reading from lag_minutes before ts. If that exact minute was not recorded
+        (server down, tick skipped), the nearest minute within tolerance is used.
+        """
+        row = self._rows.get(zone_id)
+        if row is None or lag_minutes >= self.n_buckets:
+            return default
+        target = self.epoch_minute(ts) - lag_minutes
+        for offset in range(tolerance + 1):
+            for minute in ((target,) if offset == 0 else (target - offset, target + offset)):
+                bucket = minute % self.n_buckets
+                if self._stamps[row, bucket] == minute:
+                    return int(self._values[row, bucket])
+        return default
+
+    def save(self, path=None):
+        """Writes the store atomically as .npz."""
+        path = path or self.path
+        if not path:
+            return
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, zone_ids=np.asarray(self.zone_ids), values=self._values, stamps=self._stamps)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, zone_ids, days=2):
+        """Restores a saved store; zones are matched by id, unknown ones start empty."""
+        store = cls(zone_ids, days, path)
+        if not os.path.exists(path):
+            return store
+        try:
+            with np.load(path) as data:
+                saved_ids = [str(z) for z in data["zone_ids"]]
+                values, stamps = data["values"], data["stamps"]
+        except Exception as e:
+            print(f"⚠️ Could not load day-lag store {os.path.basename(path)}: {e}")
+            return store
+
+        for src_row, zone_id in enumerate(saved_ids):
+            row = store._rows.get(zone_id)
+            if row is None:
+                continue
+            if values.shape[1] == store.n_buckets:
+                store._values[row] = values[src_row]
+                store._stamps[row] = stamps[src_row]
+            else:
+                # Bucket count changed: re-slot every stamped minute
+                held = stamps[src_row] >= 0
+                minutes = stamps[src_row][held]
+                buckets = minutes % store.n_buckets
+                order = np.argsort(minutes)  # Later minutes win on collisions
+                store._values[row, buckets[order]] = values[src_row][held][order]
+                store._stamps[row, buckets[order]] = minutes[order]
+        return store
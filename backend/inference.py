@@ -0,0 +1,81 @@
+"""
+CrowdSense Batched Inference
+Scores the per-location XGBoost models once per model per tick instead of
+once per zone, using plain NumPy feature matrices (no per-row DataFrames).
+"""
+
+import numpy as np
+
+# Column order the per-location models were trained on (see train_model.py)
+FEATURE_COLS = ['hour', 'weekday', 'rssi', 'value', 'prev_density',
+                'prev2_density', 'rolling_mean_6', 'prev_day_density', 'is_weekend']
+
+
+def model_index_map(label_encoder):
+    """Returns {location_name: model_index} for a fitted label encoder."""
+    if label_encoder is None:
+        return {}
+    return {name: idx for idx, name in enumerate(label_encoder.classes_)}
+
+
+def predict_grouped(models, rows, cache=None, version=None):
+    """
+    Scores many feature rows with one predict call per model.
+    rows: list of (key, model_index, feature_row) where feature_row follows FEATURE_COLS
+    cache: optional PredictionCache; only the cache key is quantized. A miss scores the
+           exact row, so the cache never changes what a first-seen row predicts;
+           a hit returns the prediction of an earlier row in the same grid cell.
+    version: the model snapshot's version; part of every cache key, so results of
+             an older bundle are never served after a reload.
+    Returns {key: raw_prediction}. Rows whose model is missing are left out.
+    """
+    results = {}
+    if cache is not None:
+        cache.bind(version)
+
+    groups = {}
+    for key, model_idx, feature_row in rows:
+        cache_key = None
+        if cache is not None:
+            cache_key = (version, model_idx, cache.quantize(feature_row))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                results[key] = cached
+                continue
+        groups.setdefault(model_idx, ([], [], []))
+        groups[model_idx][0].append(key)
+        groups[model_idx][1].append(feature_row)
+        groups[model_idx][2].append(cache_key)
+
+    for model_idx, (keys, feature_rows, cache_keys) in groups.items():
+        model = models.get(model_idx) if models else None
+        if model is None:
+            continue
+        X = np.asarray(feature_rows, dtype=np.float32).reshape(len(feature_rows), len(FEATURE_COLS))
+        preds = model.predict(X)
+        for key, pred, cache_key in zip(keys, preds, cache_keys):
+            results[key] = float(pred)
+            if cache_key is not None:
+                cache.put(cache_key, results[key])
+    return results
+
+
+def select_backend(models, backend):
+    """
+    Returns the model dict to score with for the configured backend.
+    "xgboost" keeps the loaded XGBRegressor objects; "native" swaps in the
+    flat-array evaluators from tree_evaluator after a parity check.
+    """
+    if backend != "native" or not models:
+        return models
+
+    from tree_evaluator import to_native_models, check_parity
+    native_models = to_native_models(models)
+    ok, diffs = check_parity(models, native_models)
+    max_diff = max(diffs.values())
+    if not ok:
+        print(f"⚠️ Native evaluator parity check failed (max diff {max_diff:.4f}). Using XGBoost.")
+        return models
+
+    print(f"✅ Native tree evaluator active (parity max diff {max_diff:.5f})")
+    return native_models
@@ -9,14 +9,22 @@ import time
 import math
 import threading
 import os
-import joblib
 import numpy as np
-import pandas as pd
 from typing import List, Optional
 import uvicorn
 
 # Import database module
-from database import predictions_collection, alerts_collection, zone_metrics_collection, log_prediction, log_alert
+from database import predictions_collection, alerts_collection, zone_metrics_collection, log_prediction, log_alert, write_buffer
+from config import Config
+from inference import predict_grouped
+from model_registry import ModelRegistry
+from model_artifact import resolve_model_path
+from prediction_cache import PredictionCache
+from feature_store import ZoneHistory
+from behavior_tables import BehaviorTables
+from zone_registry import ZoneRegistry
+from scheduler import TickScheduler
+from rollup_engine import RollupEngine, alert_level
 
 app = FastAPI(title="CrowdSense Enhanced Backend")
 
@@ -30,35 +38,34 @@ app.add_middleware(
 )
 
 # ── ML Model Loading (Step 4 Requirement) ──
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "smart_crowd_per_location_model.pkl")
-model_bundle = None
-models = None
-label_encoder = None
-
-try:
-    if os.path.exists(MODEL_PATH):
-        model_bundle = joblib.load(MODEL_PATH)
-        models = model_bundle.get("models")
-        label_encoder = model_bundle.get("label_encoder")
+MODEL_PATH = resolve_model_path(
+    os.path.join(os.path.dirname(__file__), "smart_crowd_per_location_model.pkl"),
+    Config.MODEL_FORMAT
+)
+model_registry = ModelRegistry(MODEL_PATH, backend=Config.INFERENCE_BACKEND)
+
+if os.path.exists(MODEL_PATH):
+    if model_registry.load():
         print("✅ ML Models loaded successfully")
     else:
-        print("⚠️ Warning: Model file not found. Using formula-based predictions.")
-except Exception as e:
-    print(f"❌ Error loading ML model: {e}")
+        print(f"❌ Error loading ML model: {model_registry.last_error}")
+else:
+    print("⚠️ Warning: Model file not found. Using formula-based predictions.")
 
 # ── Zone Configuration (Mapped to Frontend) ──
-ZONES = {
-    "canteen": {"name": "Student Canteen", "le_name": "Canteen", "capacity": 200, "base_density": 100, "type": "social"},
-    "lib": {"name": "Main Library", "le_name": "Library", "capacity": 500, "base_density": 250, "type": "study"},
-    "pg": {"name": "PG Block", "le_name": "PG Block", "capacity": 150, "base_density": 80, "type": "academic"},
-    "newblock": {"name": "New Block", "le_name": "New Block", "capacity": 300, "base_density": 150, "type": "academic"},
-    "dblock": {"name": "Academic Block D", "le_name": "D Block", "capacity": 400, "base_density": 200, "type": "academic"}
-}
+zone_registry = ZoneRegistry.load(Config.ZONES_PATH)
+ZONES = zone_registry.zones
+
+# Hourly / daily per-zone aggregates, updated as each prediction is logged
+zone_rollups = RollupEngine(zone_metrics_collection, Config.ROLLUP_FLUSH_SECONDS)
 
 # ── State Persistence ──
 latest_data = {}
-history = {zid: [] for zid in ZONES}
+history = {zid: ZoneHistory(100) for zid in ZONES}
 alerts = []
+prediction_cache = PredictionCache(Config.PREDICTION_CACHE_SIZE) if Config.PREDICTION_CACHE_SIZE > 0 else None
+if prediction_cache is not None:
+    model_registry.add_listener(lambda snapshot: prediction_cache.invalidate(snapshot.version))
 
 # ── Helper Functions ──
 
@@ -81,6 +88,9 @@ def get_zone_modifier(zone_type, hour, minute):
         if 14 <= t < 18: return 1.3
     return 1.0
 
+# Per-minute lookup tables of the behavior functions above
+behavior = BehaviorTables(get_time_factor, get_zone_modifier, [z["type"] for z in ZONES.values()])
+
 def calculate_cri(current, capacity, predicted, growth_rate, hour):
     """Enhanced Crowd Risk Index (0-100)."""
     density_ratio = current / max(capacity, 1)
@@ -93,34 +103,43 @@ def calculate_cri(current, capacity, predicted, growth_rate, hour):
 
 def detect_surge(zone_hist):
     if len(zone_hist) < 5: return False, 0.0
-    recent = np.mean(zone_hist[-3:])
-    older = np.mean(zone_hist[-10:-3]) if len(zone_hist) > 5 else zone_hist[0]
+    recent = zone_hist.mean_last(3)
+    older = zone_hist.window_mean(-10, -3) if len(zone_hist) > 5 else zone_hist[0]
     growth = (recent - older) / max(older, 1)
     return growth > 0.3, growth
 
 # ── Core Prediction Logic (Step 4 & 5 Integration) ──
 
-def predict_and_store(zone_id, config, hour, current_density):
-    global label_encoder, models
-    
+def predict_batch(hour, densities):
+    """Scores every zone with one predict call per location model."""
+    snapshot = model_registry.current()
+    if snapshot is None:
+        return {}
+    models = snapshot.models
+    model_indices = zone_registry.model_indices(snapshot.label_encoder)
+    rows = []
+    for zone_id, current_density in densities.items():
+        config = ZONES[zone_id]
+        le_idx = int(model_indices[zone_registry.index[zone_id]])
+        if le_idx < 0:
+            continue
+        # Minimal features for simulation compatibility
+        rows.append((zone_id, le_idx, [
+            hour, 1, -70, config["capacity"],
+            current_density, current_density, current_density, current_density, 0
+        ]))
+    try:
+        raw = predict_grouped(models, rows, prediction_cache, snapshot.version)
+    except ValueError as e:
+        # Feature / shape mismatch with the loaded bundle (XGBoostError is a ValueError)
+        print(f"⚠️ Batched prediction error: {e}")
+        return {}
+    return {zid: int(pred) for zid, pred in raw.items()}
+
+def predict_and_store(zone_id, config, hour, current_density, prediction=None):
     # ── 1. Calculate Prediction ──
-    prediction = 0
-    if models and label_encoder and config["le_name"] in label_encoder.classes_:
-        try:
-            le_idx = label_encoder.transform([config["le_name"]])[0]
-            model = models.get(le_idx)
-            if model:
-                # Minimal features for simulation compatibility
-                features = pd.DataFrame([{
-                    "hour": hour, 
-                    "weekday": 1, "rssi": -70, "value": config["capacity"],
-                    "prev_density": current_density, "prev2_density": current_density,
-                    "rolling_mean_6": current_density, "prev_day_density": current_density,
-                    "is_weekend": 0
-                }])
-                prediction = int(model.predict(features)[0])
-        except:
-            pass
+    if prediction is None:
+        prediction = predict_batch(hour, {zone_id: current_density}).get(zone_id, 0)
     
     if prediction <= 0: # Fallback
         prediction = int(current_density * random.uniform(0.95, 1.1))
@@ -141,6 +160,10 @@ def predict_and_store(zone_id, config, hour, current_density):
         "cri": cri,
     }
     log_prediction(prediction_record)
+    try:
+        zone_rollups.record(zone_id, datetime.datetime.now(), current_density, cri, alert_level(cri))
+    except Exception as e:
+        print(f"⚠️ Failed to record zone rollup: {e}")
     
     # ── 4. Step 5: Store Alert if needed ──
     if cri >= 70:
@@ -156,22 +179,23 @@ def predict_and_store(zone_id, config, hour, current_density):
     return prediction, cri, surge
 
 # ── Simulation Loop ──
+tick_scheduler = TickScheduler(Config.TICK_SECONDS, Config.TICK_POLICY)
 
 def simulation_loop():
-    global latest_data, history
     print("🚀 Simulation Engine Started with MongoDB Storage")
     
     current_counts = {zid: ZONES[zid]["base_density"] for zid in ZONES}
     
-    while True:
+    def tick():
+        global latest_data
         now = datetime.datetime.now()
         h, m = now.hour, now.minute
         
-        t_factor = get_time_factor(h, m, now.weekday())
+        t_factor = behavior.time_factor(h, m, now.weekday())
         
-        new_state = {}
+        densities = {}
         for zid, config in ZONES.items():
-            z_factor = get_zone_modifier(config["type"], h, m)
+            z_factor = behavior.zone_modifier(config["type"], h, m)
             target = config["base_density"] * t_factor * z_factor * random.uniform(0.9, 1.1)
             
             # Smooth transition
@@ -180,10 +204,17 @@ def simulation_loop():
             density = max(0, int(current_counts[zid]))
             
             history[zid].append(density)
-            if len(history[zid]) > 100: history[zid].pop(0)
+            densities[zid] = density
+        
+        # One model call per location model for the whole tick
+        predictions = predict_batch(h, densities)
+        
+        new_state = {}
+        for zid, config in ZONES.items():
+            density = densities[zid]
             
             # Predict and Log to MongoDB
-            pred, cri, surge = predict_and_store(zid, config, h, density)
+            pred, cri, surge = predict_and_store(zid, config, h, density, predictions.get(zid, 0))
             
             new_state[zid] = {
                 "id": zid,
@@ -198,12 +229,24 @@ def simulation_loop():
             }
             
         latest_data = new_state
-        time.sleep(5) # Slowed down for production stability
+
+    # Fixed 5s cadence; work time no longer stretches the period,
+    # and a failing tick is counted without stopping the loop
+    tick_scheduler.run(tick)
 
 @app.on_event("startup")
 def start_services():
     thread = threading.Thread(target=simulation_loop, daemon=True)
     thread.start()
+    zone_rollups.start()
+    if Config.MODEL_WATCH_SECONDS > 0:
+        model_registry.start_watcher(Config.MODEL_WATCH_SECONDS)
+
+@app.on_event("shutdown")
+def stop_services():
+    # Flush queued prediction / alert records and pending rollups before the process exits
+    write_buffer.close()
+    zone_rollups.close()
 
 # ── Standard API Routes ──
 
@@ -211,6 +254,38 @@ def start_services():
 def get_live():
     return latest_data
 
+@app.get("/api/model/status")
+def get_model_status():
+    return model_registry.status()
+
+@app.post("/api/model/reload")
+def reload_model():
+    if model_registry.loading:
+        raise HTTPException(status_code=409, detail="A model load is already in progress")
+    model_registry.reload_async()
+    return {"message": "Model reload started", "active": model_registry.status()["active"]}
+
+@app.post("/api/model/rollback")
+def rollback_model():
+    snapshot = model_registry.rollback()
+    if snapshot is None:
+        raise HTTPException(status_code=409, detail=model_registry.last_error)
+    return {"message": "Rolled back to backup model", "active": snapshot.info()}
+
+@app.get("/api/model/cache")
+def get_prediction_cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.get("/api/scheduler/status")
+def get_scheduler_status():
+    return tick_scheduler.stats()
+
+@app.get("/api/storage/writes")
+def get_write_buffer_stats():
+    return write_buffer.stats()
+
 # ── Step 6: Create Historical APIs (FastAPI Implementation) ──
 
 @app.get("/api/history/predictions")
@@ -239,6 +314,7 @@ def get_zone_metrics(zone: str):
     """Return hourly aggregated averages (Calculated on the fly for demo)."""
     # In a full-prod system, we'd use MongoDB aggregations. 
     # Here we sample last 100 predictions to provide a trend.
+    # (Incremental hourly / daily aggregates: /api/history/zone-rollups/{zone_id})
     cursor = predictions_collection.find({"zone": zone}).sort("timestamp", -1).limit(100)
     results = []
     for doc in cursor:
@@ -246,6 +322,17 @@ def get_zone_metrics(zone: str):
         results.append(doc)
     return results
 
+@app.get("/api/history/zone-rollups/{zone_id}")
+def get_zone_rollups(zone_id: str, period: str = Query("hour"), days: float = Query(7)):
+    """Return hourly / daily aggregates (count, mean, min, max, p95 of density and CRI, alerts)."""
+    # Maintained incrementally by rollup_engine.py, one row per zone and period
+    if zone_id not in ZONES:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    if period not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail=f"Unknown period '{period}'")
+    start = datetime.datetime.now() - datetime.timedelta(days=days)
+    return zone_rollups.query(zone_id, period, start)
+
 if __name__ == "__main__":
     # Step 8 Compatibility
     port = int(os.getenv("PORT", 5000))
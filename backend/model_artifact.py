@@ -0,0 +1,189 @@
+"""
+CrowdSense Model Artifact
+Single-file, versioned, memory-mappable replacement for the joblib bundle.
+
+Layout (little-endian):
+    8 bytes   magic  b"CSMODEL\\0"
+    4 bytes   format version (uint32)
+    4 bytes   header length (uint32)
+    header    UTF-8 JSON: zone -> model index, feature columns, blob table
+    blobs     64-byte aligned: native XGBoost UBJ boosters + flat tree arrays
+
+Loading needs neither sklearn nor pickle. The "native" backend builds its
+NativeForest arrays directly on top of the mapping, so worker processes on
+one host share the same physical pages.
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from inference import FEATURE_COLS, select_backend
+from tree_evaluator import NativeForest
+
+MAGIC = b"CSMODEL\0"
+FORMAT_VERSION = 1
+ALIGN = 64
+ARTIFACT_EXT = ".csm"
+
+_FOREST_ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "roots")
+
+
+def artifact_path_for(pickle_path):
+    """smart_crowd_per_location_model.pkl -> smart_crowd_per_location_model.csm"""
+    return os.path.splitext(pickle_path)[0] + ARTIFACT_EXT
+
+
+class ZoneIndex:
+    """Drop-in for the fitted LabelEncoder: location name <-> model index."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+        self._index = {name: idx for idx, name in enumerate(classes)}
+
+    def transform(self, names):
+        return np.asarray([self._index[name] for name in names], dtype=np.int64)
+
+
+class BoosterModel:
+    """Wraps a raw xgboost.Booster with the XGBRegressor.predict signature."""
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    def predict(self, X):
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32), validate_features=False)
+
+
+def save_artifact(path, models, classes):
+    """
+    Writes {location_id: XGBRegressor} plus the location names to one artifact file.
+    Returns the header dict.
+    """
+    blobs = []
+    offset = 0
+
+    def add_blob(data):
+        nonlocal offset
+        offset += -offset % ALIGN
+        entry = {"offset": offset, "length": len(data)}
+        blobs.append((offset, data))
+        offset += len(data)
+        return entry
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.datetime.now().isoformat(),
+        "feature_cols": FEATURE_COLS,
+        "classes": [str(c) for c in classes],
+        "zones": {str(name): idx for idx, name in enumerate(classes)},
+        "models": {}
+    }
+
+    for idx, model in models.items():
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        forest = NativeForest.from_booster(booster)
+        arrays = {}
+        for name in _FOREST_ARRAYS:
+            arr = np.ascontiguousarray(getattr(forest, name))
+            arrays[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), **add_blob(arr.tobytes())}
+        header["models"][str(int(idx))] = {
+            "booster": {"format": "ubj", **add_blob(bytes(booster.save_raw("ubj")))},
+            "arrays": arrays,
+            "max_depth": forest.max_depth,
+            "base_score": forest.base_score
+        }
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += -data_start % ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for blob_offset, data in blobs:
+            f.write(b"\0" * (data_start + blob_offset - f.tell()))
+            f.write(data)
+    # Atomic replace so a watching server never maps a half-written file
+    os.replace(tmp_path, path)
+    return header
+
+
+class ModelArtifact:
+    """A mapped artifact file. Keep it alive as long as models built from it are in use."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{os.path.basename(path)} is not a CrowdSense model artifact")
+        version, header_len = struct.unpack_from("<II", self._mm, len(MAGIC))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Artifact format v{version} is newer than supported v{FORMAT_VERSION}")
+
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[header_start:header_start + header_len].decode("utf-8"))
+        self.data_start = header_start + header_len + (-(header_start + header_len) % ALIGN)
+        self.version = version
+
+    def _view(self, entry):
+        return memoryview(self._mm)[self.data_start + entry["offset"]:self.data_start + entry["offset"] + entry["length"]]
+
+    def label_encoder(self):
+        return ZoneIndex(self.header["classes"])
+
+    def native_models(self):
+        """NativeForest per location whose arrays are zero-copy views into the mapping."""
+        models = {}
+        for idx, spec in self.header["models"].items():
+            arrays = {
+                name: np.frombuffer(self._view(entry), dtype=np.dtype(entry["dtype"])).reshape(entry["shape"])
+                for name, entry in spec["arrays"].items()
+            }
+            models[int(idx)] = NativeForest(max_depth=spec["max_depth"], base_score=spec["base_score"], **arrays)
+        return models
+
+    def xgboost_models(self):
+        """Boosters loaded from the embedded UBJ blobs (xgboost keeps its own copy)."""
+        import xgboost as xgb
+        models = {}
+        for idx, spec in self.header["models"].items():
+            booster = xgb.Booster()
+            booster.load_model(bytearray(self._view(spec["booster"])))
+            models[int(idx)] = BoosterModel(booster)
+        return models
+
+
+def load_bundle(path, backend="xgboost"):
+    """
+    Loads either a joblib pickle or an artifact into the {"models", "label_encoder"}
+    bundle shape, with the requested inference backend already applied.
+    """
+    if path.endswith(ARTIFACT_EXT):
+        artifact = ModelArtifact(path)
+        models = artifact.native_models() if backend == "native" else artifact.xgboost_models()
+        return {"models": models, "label_encoder": artifact.label_encoder(), "artifact": artifact}
+
+    import joblib
+    bundle = joblib.load(path)
+    return {"models": select_backend(bundle["models"], backend), "label_encoder": bundle["label_encoder"]}
+
+
+def resolve_model_path(pickle_path, model_format="auto"):
+    """
+    Picks the file to serve from: "pickle" always uses the joblib bundle,
+    "artifact" always the .csm file, "auto" prefers the artifact when present.
+    """
+    artifact_path = artifact_path_for(pickle_path)
+    if model_format == "artifact" or (model_format == "auto" and os.path.exists(artifact_path)):
+        return artifact_path
+    return pickle_path
@@ -0,0 +1,152 @@
+"""
+CrowdSense Model Registry
+Loads the per-location model bundle, warms it, and atomically swaps it in
+so a retrained model can be picked up without restarting the server.
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import FEATURE_COLS
+from model_artifact import load_bundle
+
+
+def backup_path_for(path):
+    """train_model.py keeps the previous bundle next to the new one as *_OLD.pkl (*_OLD.csm)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}_OLD{ext}"
+
+
+def file_version(path):
+    """Short content hash used as the bundle version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class ModelSnapshot:
+    """One loaded bundle. Never mutated after creation; swapped as a whole."""
+
+    def __init__(self, models, label_encoder, version, path, loaded_at):
+        self.models = models
+        self.label_encoder = label_encoder
+        self.version = version
+        self.path = path
+        self.loaded_at = loaded_at
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": os.path.basename(self.path),
+            "loaded_at": self.loaded_at.isoformat(),
+            "locations": list(self.label_encoder.classes_),
+            "model_type": type(next(iter(self.models.values()))).__name__
+        }
+
+
+class ModelRegistry:
+    def __init__(self, path, backend="xgboost", loader=load_bundle):
+        self.path = path
+        self.backend = backend
+        self.loader = loader
+        self._snapshot = None
+        self._lock = threading.Lock()       # Serializes loads, never held by readers
+        self._listeners = []
+        self._watch_mtime = None
+        self.last_error = None
+        self.loading = False
+
+    def current(self):
+        """Returns the active ModelSnapshot (or None). A single attribute read, so it is atomic."""
+        return self._snapshot
+
+    def add_listener(self, callback):
+        """callback(snapshot) runs after every successful swap."""
+        self._listeners.append(callback)
+
+    def load(self, path=None):
+        """Loads, warms and swaps in a bundle. Returns the new snapshot or None on failure."""
+        path = path or self.path
+        with self._lock:
+            self.loading = True
+            try:
+                bundle = self.loader(path, self.backend)
+                models = bundle["models"]
+                label_encoder = bundle["label_encoder"]
+                self._warm(models)
+
+                snapshot = ModelSnapshot(models, label_encoder, file_version(path), path, datetime.datetime.now())
+                self._snapshot = snapshot
+                if path == self.path:
+                    self._watch_mtime = os.path.getmtime(path)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Model load failed ({os.path.basename(path)}): {e}")
+                return None
+            finally:
+                self.loading = False
+
+        print(f"✅ Model bundle {snapshot.version} active ({os.path.basename(path)})")
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"⚠️ Model swap listener failed: {e}")
+        return snapshot
+
+    def reload_async(self, path=None):
+        """Loads a bundle on a background thread; serving continues on the old one."""
+        thread = threading.Thread(target=self.load, args=(path,), daemon=True)
+        thread.start()
+        return thread
+
+    def rollback(self):
+        """Swaps back to the *_OLD.pkl backup written by train_model.py."""
+        backup = backup_path_for(self.path)
+        if not os.path.exists(backup):
+            self.last_error = f"No backup bundle at {os.path.basename(backup)}"
+            return None
+        return self.load(backup)
+
+    def start_watcher(self, poll_seconds=30):
+        """Polls the bundle's mtime and hot-reloads it when train_model.py rewrites it."""
+        def watch():
+            while True:
+                time.sleep(poll_seconds)
+                try:
+                    mtime = os.path.getmtime(self.path)
+                except OSError:
+                    continue
+                if mtime != self._watch_mtime and not self.loading:
+                    print(f"🔄 Model file changed, reloading {os.path.basename(self.path)}")
+                    self._watch_mtime = mtime
+                    self.load()
+
+        thread = threading.Thread(target=watch, daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        snapshot = self._snapshot
+        return {
+            "active": snapshot.info() if snapshot else None,
+            "backend": self.backend,
+            "loading": self.loading,
+            "backup_available": os.path.exists(backup_path_for(self.path)),
+            "last_error": self.last_error
+        }
+
+    @staticmethod
+    def _warm(models):
+        # First predict call builds internal buffers; pay that cost off the serving path
+        X = np.zeros((1, len(FEATURE_COLS)), dtype=np.float32)
+        for model in models.values():
+            model.predict(X)
@@ -0,0 +1,118 @@
+"""
+CrowdSense Tick Pipeline
+Fan-out helper for the tick sinks: each Stage owns a bounded queue and its
+own worker thread(s) and runs its handler on every item it is given; a
+Pipeline hands each item to all of its stages. A slow stage only backs up its
+own queue. With overflow="drop_oldest" its producer is never blocked; the
+stalest item is discarded instead.
+"""
+
+import queue
+import threading
+import time
+import traceback
+
+
+class Stage:
+    def __init__(self, name, handler, maxsize=8, workers=1, overflow="block"):
+        self.name = name
+        self.handler = handler
+        self.overflow = overflow
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._threads = []
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.last_duration_ms = 0.0
+
+    def put(self, item):
+        if self.overflow == "drop_oldest":
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        with self._lock:
+                            self.dropped += 1
+                    except queue.Empty:
+                        pass
+        else:
+            self._queue.put(item)
+        with self._lock:
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"stage-{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def join(self):
+        """Blocks until every queued item has been handled (used by tests / shutdown)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            start = time.perf_counter()
+            with self._lock:
+                self.busy += 1
+            try:
+                self.handler(item)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"❌ Pipeline stage '{self.name}' error: {e}")
+                traceback.print_exc()
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "max_depth_seen": self.max_depth,
+                "workers": self.workers,
+                "busy": self.busy,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "last_duration_ms": self.last_duration_ms,
+                "overflow": self.overflow
+            }
+
+
+class Pipeline:
+    """A set of independent stages; every item is handed to each of them."""
+
+    def __init__(self, *stages):
+        self.stages = list(stages)
+        self.started = False
+
+    def start(self):
+        if not self.started:
+            for stage in self.stages:
+                stage.start()
+            self.started = True
+        return self
+
+    def put(self, item):
+        for stage in self.stages:
+            stage.put(item)
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,69 @@
+"""
+CrowdSense Prediction Cache
+Bounded LRU cache of raw model outputs keyed on the model bundle version and
+a quantized feature tuple, so repeated zone-ticks skip inference entirely.
+A tick still scoring on an old bundle after a reload can only add entries
+under the old version, which the new bundle never looks up.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Quantization step per FEATURE_COLS entry:
+# hour, weekday, rssi, value, prev_density, prev2_density, rolling_mean_6, prev_day_density, is_weekend
+DEFAULT_STEPS = (1, 1, 1, 1, 1, 1, 1, 1, 1)
+
+
+class PredictionCache:
+    def __init__(self, max_entries=4096, steps=DEFAULT_STEPS):
+        self.max_entries = max_entries
+        self.steps = steps
+        self._entries = OrderedDict()  # Key: (bundle version, model_idx, quantized features) -> raw prediction
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, feature_row):
+        """Snaps a feature row onto the cache grid (the key only; models score the exact row)."""
+        return tuple(round(v / s) * s for v, s in zip(feature_row, self.steps))
+
+    def bind(self, version):
+        """Drops every entry if the model bundle version changed since the last call."""
+        if version != self.version:
+            self.invalidate(version)
+
+    def invalidate(self, version=None):
+        with self._lock:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,144 @@
+"""
+CrowdSense Registration Cache
+Keeps the approved event registrations (indexed by zone) and the organizers'
+roles in memory, so the per-tick occupancy / alert evaluation reads dicts
+instead of querying MongoDB for every zone.
+
+The cache is rebuilt in a background thread:
+    - right away after invalidate() (called by the write endpoints)
+    - on every change to registrations / users when MongoDB offers change
+      streams (replica sets / Atlas)
+    - every refresh_seconds regardless, as a safety net for writes made
+      outside this process
+Each rebuild swaps in a complete new view, so readers never see a half-built one.
+"""
+
+import threading
+import time
+
+from pymongo.errors import PyMongoError
+
+from event_schedule import EventSchedule
+
+DEFAULT_ROLE = "event_organizer"
+
+
+class RegistrationCache:
+    def __init__(self, registrations_collection=None, users_collection=None, refresh_seconds=300):
+        self.registrations = registrations_collection
+        self.users = users_collection
+        self.refresh_seconds = refresh_seconds
+        self._view = ({}, {}, EventSchedule({}))   # (approved registrations by zone, role by email, schedule index)
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self.refreshes = 0
+        self.invalidations = 0
+        self.changes_seen = 0
+        self.last_refresh = None
+        self.last_refresh_ms = None
+        self.last_error = None
+        self.mode = "disabled" if registrations_collection is None else "polling"
+
+    @property
+    def enabled(self):
+        return self.registrations is not None
+
+    # ── Reads (tick path; never touch MongoDB) ──
+    def approved(self, zone_id):
+        """Approved registrations booked for zone_id (may be empty)."""
+        return self._view[0].get(zone_id, ())
+
+    def active(self, zone_id, when):
+        """Approved registrations whose event window covers `when` (see event_schedule.py)."""
+        return self._view[2].active(zone_id, when)
+
+    def role(self, email):
+        return self._view[1].get(email, DEFAULT_ROLE)
+
+    # ── Rebuilds ──
+    def refresh(self):
+        """Reloads registrations, roles and the schedule index. Returns False (keeping the old view) on errors."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                by_zone = {}
+                for reg in self.registrations.find({"status": "APPROVED"}):
+                    reg.pop("_id", None)
+                    by_zone.setdefault(reg.get("zone_id"), []).append(reg)
+                by_zone = {zone_id: tuple(regs) for zone_id, regs in by_zone.items()}
+
+                emails = sorted({reg.get("user_email") for regs in by_zone.values() for reg in regs if reg.get("user_email")})
+                roles = {}
+                if self.users is not None and emails:
+                    for user in self.users.find({"email": {"$in": emails}}, {"email": 1, "role": 1}):
+                        roles[user["email"]] = user.get("role", DEFAULT_ROLE)
+            except PyMongoError as e:
+                self.last_error = str(e)
+                print(f"⚠️ Registration cache refresh failed: {e}")
+                return False
+
+            self._view = (by_zone, roles, EventSchedule(by_zone))
+            self.refreshes += 1
+            self.last_refresh = time.time()
+            self.last_refresh_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_error = None
+            return True
+
+    def invalidate(self):
+        """Schedules a rebuild (used after registration / user writes)."""
+        self.invalidations += 1
+        self._dirty.set()
+
+    def start(self):
+        if not self.enabled or self._started:
+            return self
+        self._started = True
+        self.refresh()
+        threading.Thread(target=self._refresher, name="registration-cache", daemon=True).start()
+        for collection in (self.registrations, self.users):
+            if collection is not None:
+                threading.Thread(target=self._watch, args=(collection,), daemon=True).start()
+        return self
+
+    def _refresher(self):
+        while True:
+            # Wakes early when invalidated or a change stream saw a write
+            self._dirty.wait(timeout=self.refresh_seconds)
+            self._dirty.clear()
+            self.refresh()
+
+    def _watch(self, collection):
+        """Invalidates on every change; falls back to polling only if change streams are unsupported."""
+        try:
+            with collection.watch() as stream:
+                self.mode = "change_stream"
+                print(f"👀 Registration cache watching {collection.name} change stream")
+                for _ in stream:
+                    self.changes_seen += 1
+                    self._dirty.set()
+        except PyMongoError as e:
+            # Standalone servers have no change streams; the periodic refresh covers them
+            self.mode = "polling"
+            print(f"⚠️ No change stream on {collection.name} ({e.__class__.__name__}); "
+                  f"refreshing every {self.refresh_seconds}s and on writes")
+
+    def stats(self):
+        by_zone, roles, schedule = self._view
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "zones": len(by_zone),
+            "registrations": sum(len(regs) for regs in by_zone.values()),
+            "roles": len(roles),
+            "schedule": schedule.stats(),
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "changes_seen": self.changes_seen,
+            "refresh_seconds": self.refresh_seconds,
+            "last_refresh": self.last_refresh,
+            "last_refresh_ms": self.last_refresh_ms,
+            "last_error": self.last_error
+        }
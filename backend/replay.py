@@ -0,0 +1,166 @@
+"""
+Accelerated, Deterministic Simulator Replay
+Runs the live tick logic (simulator.py: state advance, batched model
+inference, surge detection, CRI, flows, alert feed) plus the agent event
+evaluation against a virtual clock over a date range, as fast as the CPU
+allows, and writes one JSON line per tick. Two runs with the same seed and
+range produce identical files, so they can be diffed directly.
+
+Side effects are left out. The replay builds its own Simulator, zone registry
+and model registry and never imports app.py, so nothing connects to MongoDB,
+no background threads start and no emails or agent actions are sent. The
+agent events each tick would have raised are recorded instead.
+
+Usage:
+    python replay.py --start 2026-03-02 --end 2026-03-09 --seed 42 --out replay_week.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+from automation_agent import generate_events
+from config import Config
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from simulation_engine import clock as sim_clock
+from simulator import Simulator, default_model_path
+from zone_registry import ZoneRegistry
+
+
+def parse_time(value):
+    return datetime.datetime.fromisoformat(value)
+
+
+def build_simulator(seed):
+    """A fresh, seeded Simulator with its own registries (the day-lag store stays in memory)."""
+    registry = ZoneRegistry.load(Config.ZONES_PATH)
+    models = ModelRegistry(default_model_path(), backend=Config.INFERENCE_BACKEND)
+    if not models.load():
+        print(f"⚠️ No model bundle ({models.last_error}); replaying formula predictions")
+    cache = PredictionCache(Config.PREDICTION_CACHE_SIZE) if Config.PREDICTION_CACHE_SIZE > 0 else None
+    random.seed(seed)
+    return Simulator(registry, models, cache, seed=seed, clock=sim_clock, log_ticks=False)
+
+
+def run_replay(start, end, seed, tick_seconds, out_path, progress_every=10_000):
+    sim = build_simulator(seed)
+
+    step = datetime.timedelta(seconds=tick_seconds)
+    n_ticks = int((end - start) / step)
+    alert_counts = {"CRITICAL": 0, "WARNING": 0}
+    agent_event_counts = {}
+    peak_cri = {zone_id: 0 for zone_id in sim.zones}
+
+    wall_start = time.perf_counter()
+    try:
+        with open(out_path, "w", encoding="utf-8") as out:
+            for i in range(n_ticks):
+                now = start + i * step
+                sim_clock.set(now)
+
+                # Same stages the live simulator runs, called in order
+                tick = sim.run_tick(now)
+
+                agent_events = {}
+                for zone_id, zone in tick["state"].items():
+                    z = tick["zones"][zone_id]
+                    events = generate_events({
+                        "current_count": zone["current"],
+                        "capacity": zone["capacity"],
+                        "cri": zone["cri"],
+                        "surge_detected": z["surge_flag"],
+                        "forecast_30min": int(z["pred_density"])
+                    })
+                    if events:
+                        agent_events[zone_id] = events
+                        for event in events:
+                            agent_event_counts[event] = agent_event_counts.get(event, 0) + 1
+                    peak_cri[zone_id] = max(peak_cri[zone_id], zone["cri"])
+                for alert in sim.alerts:
+                    alert_counts[alert["level"]] = alert_counts.get(alert["level"], 0) + 1
+
+                out.write(json.dumps({
+                    "t": now.isoformat(),
+                    "zones": {
+                        zone_id: {
+                            "current": zone["current"],
+                            "predicted": zone["predicted"],
+                            "est_people": zone["est_people"],
+                            "cri": zone["cri"],
+                            "risk_level": zone["risk_level"],
+                            "surge": zone["surge"],
+                            "growth_rate": zone["growth_rate"],
+                            "flows": zone["flows"]
+                        }
+                        for zone_id, zone in tick["state"].items()
+                    },
+                    "flows": tick["flows"],
+                    "alerts": [{"level": a["level"], "zone_id": a["zone_id"], "cri": a["cri"]} for a in sim.alerts],
+                    "agent_events": agent_events
+                }, default=_json_default) + "\n")
+
+                if progress_every and (i + 1) % progress_every == 0:
+                    rate = (i + 1) / (time.perf_counter() - wall_start)
+                    print(f"  {i + 1:,}/{n_ticks:,} ticks ({now:%Y-%m-%d %H:%M}) | {rate:,.0f} ticks/s")
+    finally:
+        sim_clock.reset()
+
+    wall = time.perf_counter() - wall_start
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "seed": seed,
+        "tick_seconds": tick_seconds,
+        "ticks": n_ticks,
+        "wall_time_s": round(wall, 2),
+        "ticks_per_s": round(n_ticks / wall, 1) if wall > 0 else None,
+        "speedup": round(n_ticks * tick_seconds / wall, 1) if wall > 0 else None,
+        "alerts": alert_counts,
+        "agent_events": agent_event_counts,
+        "peak_cri": peak_cri,
+        "output": out_path
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the simulator over a date range on a virtual clock")
+    parser.add_argument("--start", type=parse_time, required=True, help="ISO start time, e.g. 2026-03-02")
+    parser.add_argument("--end", type=parse_time, required=True, help="ISO end time (exclusive)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tick-seconds", type=float, default=5.0)
+    parser.add_argument("--out", default="replay.jsonl")
+    parser.add_argument("--summary", default=None, help="Optional path for the run summary JSON")
+    args = parser.parse_args()
+
+    if args.end <= args.start:
+        parser.error("--end must be after --start")
+
+    print(f"⏩ Replaying {args.start} -> {args.end} (seed={args.seed}, tick={args.tick_seconds}s)")
+    summary = run_replay(args.start, args.end, args.seed, args.tick_seconds, args.out)
+    print(f"✅ {summary['ticks']:,} ticks in {summary['wall_time_s']}s "
+          f"({summary['ticks_per_s']} ticks/s, {summary['speedup']}x real time) -> {args.out}")
+    print(f"   Alerts: {summary['alerts']} | Agent events: {summary['agent_events']}")
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"   Summary written to: {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
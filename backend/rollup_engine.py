@@ -0,0 +1,228 @@
+"""
+CrowdSense Zone Rollups
+Hourly and daily per-zone aggregates maintained incrementally as ticks are
+recorded: sample count, mean / min / max / p95 of density and CRI, and alert
+counts by level. One compact document per zone, period and period start
+lives in the zone_metrics collection, so a dashboard over weeks of data reads
+a few hundred rows instead of every raw record.
+
+p95 comes from a fixed-width histogram kept next to the sums ($inc-able,
+like everything else here), so partial periods merge across flushes and
+restarts without re-reading raw data.
+"""
+
+import datetime
+import threading
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import Config
+
+PERIODS = ("hour", "day")
+METRICS = ("density", "cri")
+HIST_WIDTH = {"density": 5, "cri": 5}      # Histogram bin width per metric
+ALERT_LEVELS = ("WARNING", "CRITICAL")
+
+
+def period_floor(ts, period):
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def alert_level(cri):
+    """Same thresholds as the live alert feed."""
+    if cri >= Config.CRI_CRITICAL_THRESHOLD:
+        return "CRITICAL"
+    if cri >= Config.CRI_HIGH_THRESHOLD:
+        return "WARNING"
+    return None
+
+
+def histogram_quantile(hist, count, q, width, low=None, high=None):
+    """Quantile from {bin index (str): count}; the bin's midpoint, clipped to [low, high]."""
+    if not hist or not count:
+        return None
+    target = q * count
+    seen = 0
+    for b in sorted(hist, key=int):
+        seen += hist[b]
+        if seen >= target:
+            value = int(b) * width + width / 2
+            if low is not None:
+                value = max(value, low)
+            if high is not None:
+                value = min(value, high)
+            return value
+    return high
+
+
+class _Agg:
+    def __init__(self):
+        self.count = 0
+        self.sums = dict.fromkeys(METRICS, 0)
+        self.mins = {}
+        self.maxs = {}
+        self.hist = {m: {} for m in METRICS}
+        self.alerts = {}
+
+    def add(self, values, level):
+        self.count += 1
+        for m, v in values.items():
+            self.sums[m] += v
+            self.mins[m] = v if m not in self.mins else min(self.mins[m], v)
+            self.maxs[m] = v if m not in self.maxs else max(self.maxs[m], v)
+            b = str(int(v // HIST_WIDTH[m]))
+            self.hist[m][b] = self.hist[m].get(b, 0) + 1
+        if level:
+            self.alerts[level] = self.alerts.get(level, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        for m in METRICS:
+            self.sums[m] += other.sums[m]
+            if m in other.mins:
+                self.mins[m] = other.mins[m] if m not in self.mins else min(self.mins[m], other.mins[m])
+                self.maxs[m] = other.maxs[m] if m not in self.maxs else max(self.maxs[m], other.maxs[m])
+            for b, n in other.hist[m].items():
+                self.hist[m][b] = self.hist[m].get(b, 0) + n
+        for level, n in other.alerts.items():
+            self.alerts[level] = self.alerts.get(level, 0) + n
+
+
+class RollupEngine:
+    def __init__(self, collection, flush_seconds=60):
+        self.collection = collection
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}          # (zone_id, period, start) -> _Agg
+        self._stop = threading.Event()
+        self._thread = None
+        self.records = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    # ── Recording ──
+    def record(self, zone_id, ts, density, cri, level=None):
+        values = {"density": density, "cri": cri}
+        with self._lock:
+            for period in PERIODS:
+                key = (zone_id, period, period_floor(ts, period))
+                agg = self._pending.get(key)
+                if agg is None:
+                    agg = self._pending[key] = _Agg()
+                agg.add(values, level)
+            self.records += 1
+
+    def record_tick(self, now, state, alerts=()):
+        """One simulator tick: state is {zone_id: {"current", "cri", ...}}, alerts the tick's alert feed."""
+        levels = {a["zone_id"]: a["level"] for a in alerts}
+        for zone_id, zone in state.items():
+            self.record(zone_id, now, zone["current"], zone["cri"], levels.get(zone_id))
+
+    # ── Flushing ──
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return True
+            start = time.perf_counter()
+            ops = []
+            for (zone_id, period, period_start), agg in pending.items():
+                inc = {"count": agg.count}
+                inc.update({f"sum.{m}": v for m, v in agg.sums.items()})
+                inc.update({f"hist.{m}.{b}": n for m in METRICS for b, n in agg.hist[m].items()})
+                inc.update({f"alerts.{level}": n for level, n in agg.alerts.items()})
+                ops.append(((zone_id, period, period_start), UpdateOne(
+                    {"_id": f"{zone_id}:{period}:{period_start:%Y%m%d%H}"},
+                    {
+                        "$inc": inc,
+                        "$min": {f"min.{m}": v for m, v in agg.mins.items()},
+                        "$max": {f"max.{m}": v for m, v in agg.maxs.items()},
+                        "$setOnInsert": {"zone_id": zone_id, "period": period, "start": period_start}
+                    },
+                    upsert=True
+                )))
+            try:
+                self.collection.bulk_write([op for _, op in ops], ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                # Unordered: every op except the reported write errors was applied
+                failed = [ops[err["index"]][0] for err in e.details.get("writeErrors", [])]
+                self.last_error = str(e)
+                print(f"⚠️ Zone rollup flush: {len(failed)} upserts failed")
+            except PyMongoError as e:
+                failed = [key for key, _ in ops]
+                self.last_error = str(e)
+                print(f"⚠️ Zone rollup flush failed: {e}")
+            if failed:
+                # Requeue only what was not applied, so a retry never $incs twice
+                with self._lock:
+                    for key in failed:
+                        agg = pending[key]
+                        current = self._pending.get(key)
+                        if current is not None:
+                            agg.merge(current)
+                        self._pending[key] = agg
+                return False
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_error = None
+            return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="zone-rollups", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def close(self):
+        """Stops the flusher and writes what is pending (registered atexit / on shutdown)."""
+        self._stop.set()
+        self.flush()
+
+    # ── Reads ──
+    def query(self, zone_id, period="hour", start=None, end=None):
+        """Rollup rows for zone_id in [start, end), oldest first, with mean and p95 filled in."""
+        query = {"zone_id": zone_id, "period": period}
+        if start is not None or end is not None:
+            query["start"] = {}
+            if start is not None:
+                query["start"]["$gte"] = period_floor(start, period)
+            if end is not None:
+                query["start"]["$lt"] = end
+        rows = []
+        for doc in self.collection.find(query).sort("start", 1):
+            count = doc.get("count", 0)
+            row = {"zone_id": zone_id, "period": period, "start": doc["start"].isoformat(), "count": count}
+            for m in METRICS:
+                low, high = doc.get("min", {}).get(m), doc.get("max", {}).get(m)
+                row[m] = {
+                    "mean": round(doc.get("sum", {}).get(m, 0) / count, 2) if count else None,
+                    "min": low,
+                    "max": high,
+                    "p95": histogram_quantile(doc.get("hist", {}).get(m), count, 0.95, HIST_WIDTH[m], low, high)
+                }
+            row["alerts"] = {level: doc.get("alerts", {}).get(level, 0) for level in ALERT_LEVELS}
+            rows.append(row)
+        return rows
+
+    def stats(self):
+        with self._lock:
+            return {
+                "records": self.records,
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+                "flush_seconds": self.flush_seconds,
+                "last_flush_ms": self.last_flush_ms,
+                "last_error": self.last_error
+            }
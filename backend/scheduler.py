@@ -0,0 +1,114 @@
+"""
+CrowdSense Tick Scheduler
+Runs a callback at a fixed cadence against a monotonic clock. Deadlines are
+computed from the start time (start + n * period), so work time never adds
+drift. A callback that raises is counted (and logged) and the next tick is
+scheduled as usual. When a tick overruns its slot the policy decides what
+happens:
+    "skip"      drop the missed slots and resume on the next future boundary
+    "catch_up"  run the missed ticks back-to-back (bounded by max_catch_up)
+"""
+
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+POLICIES = ("skip", "catch_up")
+
+
+class TickScheduler:
+    def __init__(self, period=5.0, policy="skip", max_catch_up=3, clock=time.monotonic, window=720):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown tick policy '{policy}' (expected one of {POLICIES})")
+        self.period = float(period)
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=window)        # Start lag per tick (s)
+        self._work = deque(maxlen=window)        # Work time per tick (s)
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.caught_up = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_lag = 0.0
+        self.started_at = None
+
+    def run(self, callback, max_ticks=None):
+        """Calls callback() once per period until max_ticks (forever by default)."""
+        start = self.clock()
+        self.started_at = start
+        slot = 0
+        behind = 0
+        while max_ticks is None or self.ticks < max_ticks:
+            scheduled = start + slot * self.period
+            begin = self.clock()
+            try:
+                callback()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = str(e)
+                print(f"❌ Tick error: {e}")
+                traceback.print_exc()
+            finished = self.clock()
+            self._record(begin - scheduled, finished - begin)
+
+            slot += 1
+            next_deadline = start + slot * self.period
+            if finished > next_deadline:
+                missed = int((finished - next_deadline) // self.period) + 1
+                with self._lock:
+                    self.overruns += 1
+                if self.policy == "catch_up" and behind < self.max_catch_up:
+                    # Run the next slot immediately; its lag gets recorded
+                    behind += 1
+                    with self._lock:
+                        self.caught_up += 1
+                    continue
+                # Skip ahead to the first boundary that is still in the future
+                slot += missed
+                with self._lock:
+                    self.skipped += missed
+                next_deadline = start + slot * self.period
+            behind = 0
+            time.sleep(max(0.0, next_deadline - self.clock()))
+
+    def _record(self, lag, work):
+        with self._lock:
+            self.ticks += 1
+            self._lags.append(lag)
+            self._work.append(work)
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self):
+        with self._lock:
+            lags = np.asarray(self._lags) * 1000
+            work = np.asarray(self._work) * 1000
+            return {
+                "period_s": self.period,
+                "policy": self.policy,
+                "ticks": self.ticks,
+                "overruns": self.overruns,
+                "skipped": self.skipped,
+                "caught_up": self.caught_up,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "lag_ms": {
+                    "last": round(float(lags[-1]), 2) if len(lags) else None,
+                    "mean": round(float(lags.mean()), 2) if len(lags) else None,
+                    "p95": round(float(np.percentile(lags, 95)), 2) if len(lags) else None,
+                    "max": round(self.max_lag * 1000, 2)
+                },
+                "work_ms": {
+                    "mean": round(float(work.mean()), 2) if len(work) else None,
+                    "max": round(float(work.max()), 2) if len(work) else None
+                },
+                "effective_period_s": round((self.clock() - self.started_at) / self.ticks, 3)
+                if self.ticks and self.started_at is not None else None
+            }
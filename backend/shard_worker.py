@@ -0,0 +1,101 @@
+"""
+CrowdSense Shard Worker
+Entry point of one simulator shard process (SIM_SHARDS > 0):
+
+    python -m shard_worker <shard> <snapshot_name> <n_zones> <n_shards>
+
+ShardSupervisor starts it in a fresh interpreter, so nothing is inherited from
+the API process: the worker loads its own zone registry, model bundle and
+prediction cache, derives its zones from the same hash ring, and talks to the
+API only through the shared-memory snapshot (results out, capacity in).
+"""
+
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import Config
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from scheduler import TickScheduler
+from sharding import HashRing, SharedSnapshot
+from simulation_engine import clock as sim_clock
+from simulator import Simulator, calculate_cri, default_model_path
+from zone_registry import ZoneRegistry
+
+
+def run_shard(shard, snapshot_name, n_zones, n_shards):
+    """Advances, scores and publishes this shard's zones every TICK_SECONDS."""
+    registry = ZoneRegistry.load(Config.ZONES_PATH)
+    if len(registry) != n_zones:
+        raise SystemExit(f"❌ Shard {shard}: {Config.ZONES_PATH} has {len(registry)} zones, the snapshot {n_zones}")
+    zone_ids = HashRing(n_shards).assign(registry.ids)[shard]
+    rows = np.asarray([registry.index[zone_id] for zone_id in zone_ids], dtype=np.int64)
+
+    model_registry = ModelRegistry(default_model_path(), backend=Config.INFERENCE_BACKEND)
+    if not model_registry.load():
+        print(f"⚠️ Shard {shard}: model not loaded ({model_registry.last_error}); using formula predictions")
+    prediction_cache = PredictionCache(Config.PREDICTION_CACHE_SIZE) if Config.PREDICTION_CACHE_SIZE > 0 else None
+    if prediction_cache is not None:
+        model_registry.add_listener(lambda snapshot: prediction_cache.invalidate(snapshot.version))
+
+    seed = None if Config.SIM_SEED is None else Config.SIM_SEED + shard
+    random.seed(seed)
+    sim = Simulator(registry, model_registry, prediction_cache, zone_ids=zone_ids, seed=seed, log_ticks=False)
+    if Config.MODEL_WATCH_SECONDS > 0:
+        model_registry.start_watcher(Config.MODEL_WATCH_SECONDS)
+
+    snapshot = SharedSnapshot.attach(snapshot_name, n_zones, n_shards)
+    print(f"🧩 Shard {shard} (pid {os.getpid()}): {len(zone_ids)} zones")
+
+    def tick():
+        # Pick up capacity changes made through the API
+        capacity = snapshot.columns["capacity"][rows]
+        for i in np.nonzero(capacity != sim.engine.capacity)[0]:
+            registry.set_capacity(zone_ids[i], int(capacity[i]))
+
+        now = sim_clock.now()
+        t = sim.inference_stage(sim.advance_stage(now))
+        zones = [t["zones"][zone_id] for zone_id in zone_ids]
+        counts = np.asarray([z["device_count"] for z in zones], dtype=np.float64)
+        est_people = np.floor(counts * np.asarray([random.uniform(1.25, 1.35) for _ in zones]))
+        cri = np.asarray([
+            calculate_cri(z["device_count"], capacity[i], z["pred_density"], z["growth_rate"], t["hour"])
+            for i, z in enumerate(zones)
+        ], dtype=np.float64)
+
+        snapshot.write(shard, rows, {
+            "current": counts,
+            "predicted": np.asarray([z["pred_density"] for z in zones], dtype=np.float64),
+            "est_people": est_people,
+            "cri": cri,
+            "growth_rate": np.asarray([z["growth_rate"] for z in zones], dtype=np.float64),
+            "surge": np.asarray([z["surge_flag"] for z in zones], dtype=np.float64),
+            "target": np.asarray([z["target"] for z in zones], dtype=np.float64),
+            "updated_at": np.full(len(zones), now.timestamp())
+        })
+
+    try:
+        TickScheduler(Config.TICK_SECONDS, Config.TICK_POLICY).run(tick)
+    finally:
+        snapshot.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one CrowdSense simulator shard")
+    parser.add_argument("shard", type=int)
+    parser.add_argument("snapshot_name")
+    parser.add_argument("n_zones", type=int)
+    parser.add_argument("n_shards", type=int)
+    args = parser.parse_args(argv)
+    run_shard(args.shard, args.snapshot_name, args.n_zones, args.n_shards)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+CrowdSense Zone Sharding
+Building blocks for running the simulator in N worker processes:
+    HashRing         consistent-hash assignment of zone ids to shards
+    SharedSnapshot   per-zone result columns in one shared-memory block,
+                     written by the shard workers, copied column-wise by the API
+    ShardSupervisor  starts / restarts the worker processes (shard_worker.py)
+
+Each shard bumps its own sequence counter before and after writing (odd while
+a write is in progress), so a reader can tell whether the columns it just
+copied belong to one tick without taking a lock, and which shards have written
+since its previous read.
+"""
+
+import bisect
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+SNAPSHOT_FIELDS = ("current", "predicted", "est_people", "cri", "growth_rate", "surge", "target", "updated_at")
+CONTROL_FIELDS = ("capacity",)     # Written by the API process, read by the workers
+
+
+# ─────────────────────────────────────────────
+# Consistent Hashing
+# ─────────────────────────────────────────────
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Adding a shard moves only ~1/N of the zones; the rest keep their worker."""
+
+    def __init__(self, n_shards, vnodes=64):
+        self.n_shards = n_shards
+        points = sorted((_hash(f"shard-{shard}-{v}"), shard) for shard in range(n_shards) for v in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    def shard_for(self, zone_id):
+        i = bisect.bisect(self._keys, _hash(zone_id)) % len(self._keys)
+        return self._shards[i]
+
+    def assign(self, zone_ids):
+        """Returns {shard: [zone_id, ...]} (every shard present, possibly empty)."""
+        shards = {shard: [] for shard in range(self.n_shards)}
+        for zone_id in zone_ids:
+            shards[self.shard_for(zone_id)].append(zone_id)
+        return shards
+
+
+# ─────────────────────────────────────────────
+# Shared-Memory Snapshot
+# ─────────────────────────────────────────────
+class SharedSnapshot:
+    """
+    Layout: int64 seq[n_shards] followed by one float64[n_zones] column per
+    SNAPSHOT_FIELDS and CONTROL_FIELDS entry, rows in zone-registry order.
+    """
+
+    def __init__(self, shm, n_zones, n_shards, owner=False):
+        self.shm = shm
+        self.n_zones = n_zones
+        self.n_shards = n_shards
+        self.owner = owner
+        self.seq = np.ndarray((n_shards,), dtype=np.int64, buffer=shm.buf, offset=0)
+        offset = 8 * n_shards
+        self.columns = {}
+        for name in SNAPSHOT_FIELDS + CONTROL_FIELDS:
+            self.columns[name] = np.ndarray((n_zones,), dtype=np.float64, buffer=shm.buf, offset=offset)
+            offset += 8 * n_zones
+
+    @staticmethod
+    def nbytes(n_zones, n_shards):
+        return 8 * n_shards + 8 * n_zones * (len(SNAPSHOT_FIELDS) + len(CONTROL_FIELDS))
+
+    @classmethod
+    def create(cls, n_zones, n_shards):
+        shm = shared_memory.SharedMemory(create=True, size=cls.nbytes(n_zones, n_shards))
+        snapshot = cls(shm, n_zones, n_shards, owner=True)
+        snapshot.seq[:] = 0
+        for column in snapshot.columns.values():
+            column[:] = 0
+        return snapshot
+
+    @classmethod
+    def attach(cls, name, n_zones, n_shards):
+        """Maps a block created by another process; only the creator unlinks it."""
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)     # Python 3.13+
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            # Older versions register the attach with this process's resource
+            # tracker, which would unlink the block when the worker exits
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, n_zones, n_shards)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # ── Writer side (one shard worker) ──
+    def write(self, shard, rows, values):
+        """rows: zone indices; values: {field: array aligned with rows}."""
+        self.seq[shard] += 1            # Odd: write in progress
+        for name, column_values in values.items():
+            self.columns[name][rows] = column_values
+        self.seq[shard] += 1            # Even: consistent again
+
+    # ── Reader side (API process) ──
+    def stable(self, seq_before):
+        """True if no shard was mid-write or has written since seq_before was taken."""
+        return not (seq_before & 1).any() and np.array_equal(seq_before, self.seq)
+
+    def read(self, fields=SNAPSHOT_FIELDS, retries=3):
+        """
+        Copies `fields` (one vectorized copy per column) and returns
+        (seq, {field: array}) once the copy came from a consistent snapshot
+        (or after `retries`). seq is the per-shard counter the copy belongs to.
+        """
+        for _ in range(retries):
+            seq_before = self.seq.copy()
+            columns = {name: self.columns[name].copy() for name in fields}
+            if self.stable(seq_before):
+                break
+        return seq_before, columns
+
+    def close(self):
+        self.columns = {}
+        self.seq = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# ─────────────────────────────────────────────
+# Supervisor
+# ─────────────────────────────────────────────
+class ShardSupervisor:
+    """
+    Runs `python -m <module> <shard> <snapshot_name> <n_zones> <n_shards>` in
+    one fresh interpreter per shard and restarts a worker that dies. Workers
+    inherit nothing from the API process but the environment.
+    """
+
+    def __init__(self, zone_ids, capacity, n_shards, module="shard_worker"):
+        self.zone_ids = list(zone_ids)
+        self.n_shards = n_shards
+        self.module = module
+        self.ring = HashRing(n_shards)
+        self.assignment = self.ring.assign(self.zone_ids)
+        # Shard of every snapshot row, for telling which rows a read made fresh
+        self.row_shard = np.asarray([self.ring.shard_for(zone_id) for zone_id in self.zone_ids], dtype=np.int64)
+        self.snapshot = SharedSnapshot.create(len(self.zone_ids), n_shards)
+        self.snapshot.columns["capacity"][:] = capacity
+        self._seen_seq = np.zeros(n_shards, dtype=np.int64)
+        self.processes = {}
+        self.restarts = 0
+
+    def _spawn(self, shard):
+        self.processes[shard] = subprocess.Popen(
+            [sys.executable, "-m", self.module, str(shard), self.snapshot.name,
+             str(len(self.zone_ids)), str(self.n_shards)],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+
+    def start(self, monitor_seconds=5):
+        for shard, zone_ids in self.assignment.items():
+            if zone_ids:
+                self._spawn(shard)
+        threading.Thread(target=self._monitor, args=(monitor_seconds,), daemon=True).start()
+        return self
+
+    def _monitor(self, poll_seconds):
+        while True:
+            time.sleep(poll_seconds)
+            for shard, process in list(self.processes.items()):
+                if process.poll() is not None:
+                    print(f"⚠️ Shard {shard} worker exited ({process.returncode}); restarting")
+                    self.restarts += 1
+                    self._spawn(shard)
+
+    def fresh_rows(self, seq):
+        """
+        Row indices of the zones whose shard has written since the previous
+        call (seq as returned by snapshot.read()).
+        """
+        advanced = seq != self._seen_seq
+        self._seen_seq = seq
+        return np.nonzero(advanced[self.row_shard])[0]
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.snapshot.close()
+
+    def status(self):
+        return {
+            "shards": self.n_shards,
+            "restarts": self.restarts,
+            "workers": {
+                str(shard): {
+                    "pid": process.pid,
+                    "alive": process.poll() is None,
+                    "zones": len(self.assignment[shard]),
+                    "seq": int(self.snapshot.seq[shard])
+                }
+                for shard, process in self.processes.items()
+            }
+        }
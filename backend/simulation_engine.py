@@ -0,0 +1,185 @@
+"""
+CrowdSense Vectorized Simulation Engine
+Holds every zone's simulator state in NumPy arrays and advances all zones in
+one vectorized step per tick, with the same inertia / noise / surge rules as
+the original per-zone loop in app.py.
+
+Usage (load test):
+    python simulation_engine.py --zones 5000 --ticks 200
+"""
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+# Inertia: big gaps close faster than small drifts
+FAST_GAP = 20
+FAST_SPEED = 0.15
+SLOW_SPEED = 0.05
+
+# Brownian noise and occasional minor surges
+NOISE = 1.5
+SURGE_PROBABILITY = 0.05
+SURGE_RANGE = (2, 5)
+
+# Day-to-day variance of the target and the hard cap relative to capacity
+TARGET_JITTER = (0.9, 1.1)
+MAX_LOAD = 1.5
+
+
+class VirtualClock:
+    """
+    Wall clock for the simulator. Live mode follows datetime.now(); replay
+    mode pins it to the tick being simulated so time-dependent helpers see
+    the simulated time.
+    """
+
+    def __init__(self):
+        self._now = None
+
+    def now(self):
+        return self._now if self._now is not None else datetime.datetime.now()
+
+    def set(self, ts):
+        self._now = ts
+
+    def reset(self):
+        self._now = None
+
+    @property
+    def virtual(self):
+        return self._now is not None
+
+
+clock = VirtualClock()
+
+
+class VectorSimulator:
+    def __init__(self, zone_ids, capacity, base_density, zone_types, initial_fraction=0.1, seed=None):
+        self.zone_ids = list(zone_ids)
+        self.index = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        self.capacity = np.asarray(capacity, dtype=np.float64)
+        self.base_density = np.asarray(base_density, dtype=np.float64)
+
+        # Zone types are stored as small ints; modifiers are evaluated once per type per tick
+        self.type_names = sorted(set(zone_types), key=str)
+        type_lookup = {name: i for i, name in enumerate(self.type_names)}
+        self.type_index = np.asarray([type_lookup[t] for t in zone_types], dtype=np.int64)
+
+        self.reset(seed, initial_fraction)
+
+    def reset(self, seed=None, initial_fraction=0.1):
+        """Restores the startup state and reseeds the generator (replay / tests)."""
+        # Initialize with baseline to avoid startup 0s
+        self.counts = self.base_density * initial_fraction
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_zones(cls, zones, initial_fraction=0.1, seed=None):
+        """Builds the engine from the ZONES config dict in app.py."""
+        return cls(
+            list(zones),
+            [z["capacity"] for z in zones.values()],
+            [z["base_density"] for z in zones.values()],
+            [z.get("type") for z in zones.values()],
+            initial_fraction, seed
+        )
+
+    @classmethod
+    def from_registry(cls, registry, initial_fraction=0.1, seed=None):
+        """
+        Builds the engine on a ZoneRegistry. The capacity array is shared, not
+        copied, so ZoneRegistry.set_capacity is seen by the next step().
+        """
+        return cls(registry.ids, registry.capacity, registry.base_density, registry.types, initial_fraction, seed)
+
+    @classmethod
+    def synthetic(cls, n_zones, zones, seed=None):
+        """n_zones copies of the given zone configs (round-robin) for load testing."""
+        templates = list(zones.values())
+        configs = [templates[i % len(templates)] for i in range(n_zones)]
+        return cls(
+            [f"zone_{i}" for i in range(n_zones)],
+            [c["capacity"] for c in configs],
+            [c["base_density"] for c in configs],
+            [c.get("type") for c in configs],
+            seed=seed
+        )
+
+    def __len__(self):
+        return len(self.zone_ids)
+
+    def set_capacity(self, zone_id, capacity):
+        self.capacity[self.index[zone_id]] = capacity
+
+    def zone_modifiers(self, zone_modifier, hour, minute):
+        """Per-zone modifier array, calling zone_modifier once per zone type."""
+        if zone_modifier is None:
+            return np.ones(len(self))
+        per_type = np.asarray([zone_modifier(t, hour, minute) for t in self.type_names], dtype=np.float64)
+        return per_type[self.type_index]
+
+    def step(self, global_factor, zone_mod):
+        """
+        Advances every zone one tick.
+        global_factor: scalar time factor; zone_mod: per-zone modifier array.
+        Returns (targets, device_counts) as arrays in zone order.
+        """
+        n = len(self)
+        rng = self.rng
+
+        # Target = Base * GlobalTime * ZoneSpecific, with day-to-day variance
+        target = self.base_density * global_factor * zone_mod * rng.uniform(*TARGET_JITTER, n)
+
+        # Smooth transition (inertia)
+        diff = target - self.counts
+        speed = np.where(np.abs(diff) > FAST_GAP, FAST_SPEED, SLOW_SPEED)
+        next_val = self.counts + diff * speed
+
+        # Noise plus occasional minor surge
+        next_val += rng.uniform(-NOISE, NOISE, n)
+        surge = rng.random(n) < SURGE_PROBABILITY
+        next_val += np.where(surge, rng.uniform(*SURGE_RANGE, n), 0.0)
+
+        # Never negative, capped at 150% capacity
+        np.clip(next_val, 0, self.capacity * MAX_LOAD, out=next_val)
+        self.counts = next_val
+        return target, next_val.astype(np.int64)
+
+    def mock_rssi(self, device_counts):
+        """Mock RSSI for API compatibility (same formula as the per-zone loop)."""
+        rssi = (-80 + (device_counts / self.capacity) * 30).astype(np.int64)
+        return np.clip(rssi, -90, -30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized simulator")
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    templates = {
+        "social": {"capacity": 200, "base_density": 100, "type": "social"},
+        "study": {"capacity": 500, "base_density": 250, "type": "study"},
+        "academic": {"capacity": 300, "base_density": 150, "type": "academic"},
+    }
+    engine = VectorSimulator.synthetic(args.zones, templates, seed=args.seed)
+    zone_mod = engine.zone_modifiers(None, 12, 0)
+
+    timings = []
+    for _ in range(args.ticks):
+        start = time.perf_counter()
+        _, counts = engine.step(1.0, zone_mod)
+        engine.mock_rssi(counts)
+        timings.append(time.perf_counter() - start)
+
+    timings = np.asarray(timings) * 1000
+    print(f"{args.zones:,} zones x {args.ticks} ticks: "
+          f"mean {timings.mean():.3f} ms, p95 {np.percentile(timings, 95):.3f} ms, max {timings.max():.3f} ms per tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+"""
+CrowdSense Simulator Core
+The tick logic shared by the live API (app.py), its shard workers and the
+replay tool (replay.py):
+    behavior functions   get_time_factor / get_zone_modifier (tabulated per minute)
+    scoring helpers      calculate_cri, get_risk_level, detect_surge, generate_flow_vector
+    Simulator            the per-zone state of one simulator (history, day-lag
+                         store, live data, alerts, trend, flows) and the
+                         advance -> inference -> scoring stages of a tick
+
+Importing this module has no side effects: nothing connects to MongoDB, loads
+a model or starts a thread. Each process builds its own Simulator on its own
+ZoneRegistry / ModelRegistry and owns that state outright.
+"""
+
+import datetime
+import math
+import os
+import random
+
+import numpy as np
+
+from behavior_tables import BehaviorTables
+from config import Config
+from crowd_flow import CrowdFlowEngine
+from feature_store import ZoneHistory, DayLagStore
+from inference import predict_grouped
+from model_artifact import resolve_model_path
+from simulation_engine import VectorSimulator, clock as sim_clock
+
+HISTORY_SIZE = 100      # Rolling readings kept per zone
+
+# Indexed by np.searchsorted(thresholds, cri, side="right") in score_columns
+RISK_THRESHOLDS, RISK_LEVELS = [50, 70, 85], np.asarray(["LOW", "MODERATE", "HIGH", "CRITICAL"], dtype=object)
+STATUS_THRESHOLDS = [50, 70]
+STATUS_COLORS = np.asarray(["text-green-500", "text-amber-500", "text-red-500"], dtype=object)
+
+
+def default_model_path():
+    """The bundle the backend serves (the .csm artifact when MODEL_FORMAT allows it)."""
+    return resolve_model_path(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_crowd_per_location_model.pkl"),
+        Config.MODEL_FORMAT
+    )
+
+
+# ─────────────────────────────────────────────
+# Behavior-Driven Simulation Engine helpers
+# ─────────────────────────────────────────────
+
+def get_time_factor(hour, minute, weekday):
+    """
+    Returns the base multiplier for campus activity based on time and day.
+    Sunday: Effectively closed (very low activity).
+    """
+    # ── Sunday Behavior ──
+    if weekday == 6:  # 0=Monday, 6=Sunday
+        return 0.1  # Flat low baseline for Sunday
+
+    # ── Weekday Schedule ──
+    t = hour + (minute / 60.0)
+
+    # 1. Early Morning (6 - 8): Security & Early Staff
+    if 6 <= t < 8:
+        # Linear ramp from 0.1 to 0.3
+        progress = (t - 6) / 2
+        return 0.1 + (0.2 * progress)
+
+    # 2. Arrival & Morning Classes (8 - 12)
+    elif 8 <= t < 12:
+        # Logistic-like S-curve for arrival
+        if t < 9: return 0.3 + (0.7 * (t - 8)) # Fast ramp 8-9
+        return 1.0 # Peak attendance
+
+    # 3. Lunch Transitions (12 - 14)
+    elif 12 <= t < 14:
+        return 0.95 # Slight dip in overall activity as some leave/rest, but high movement
+
+    # 4. Post-Lunch / Afternoon (14 - 18)
+    elif 14 <= t < 18:
+        # Slow decay
+        return 0.9 - (0.1 * (t - 14) / 4)
+
+    # 5. Evening / Cleaning Shift (18 - 20)
+    elif 18 <= t < 20:
+        # Bump for cleaning staff?
+        # Simulation Rule: "Cleaning staff increase crowd 120 -> 200"
+        # Relative to daytime peak (say 1000), 200 is 0.2. 120 is 0.12.
+        # Let's say we hold a 'late stay' level.
+        if t < 19: return 0.25 # 6-7 PM
+        return 0.15 # 7-8 PM
+
+    # 6. Night (20 - 6)
+    else:
+        return 0.1 # Stable overnight baseline
+
+def get_zone_modifier(zone_type, hour, minute):
+    """Returns zone-specific activity multipliers."""
+    t = hour + (minute / 60.0)
+
+    if zone_type == "social": # Canteen
+        # Dead early
+        if t < 8: return 0.1
+        # Low morning
+        if 8 <= t < 11: return 0.4
+        # Lunch Spike (Bell curve centered at 13.0)
+        if 11 <= t < 15:
+            # Peak at 1 PM (13.0)
+            delta = abs(t - 13.0)
+            # Gaussian-ish shape
+            spike = 2.5 * math.exp(-(delta**2) / 0.5)
+            return 0.5 + spike
+        # Dead afternoon/evening
+        if t >= 18: return 0.05
+        return 0.3
+
+    elif zone_type == "study": # Library
+        # Moderate Morning
+        if 9 <= t < 12: return 0.8
+        # Dip during lunch
+        if 12 <= t < 13: return 0.6
+        # Post-lunch High (Study time)
+        if 14 <= t < 17: return 1.3
+        # Evening stay
+        if 17 <= t < 21: return 0.5
+        return 0.2
+
+    elif zone_type == "academic": # Classrooms
+        # Morning classes
+        if 9 <= t < 12: return 1.2
+        # Lunch dip
+        if 12 <= t < 13: return 0.5
+        # Afternoon classes
+        if 14 <= t < 17: return 1.0
+        # Evening drop
+        if t >= 17: return 0.1
+        return 0.1
+
+    return 1.0
+
+# ─────────────────────────────────────────────
+# Helper: CRI Calculation
+# ─────────────────────────────────────────────
+def calculate_cri(current, capacity, predicted, growth_rate, hour):
+    """
+    Crowd Risk Index (0–100).
+    Weighted formula:
+        40% — current density vs capacity
+        25% — predicted density vs capacity
+        20% — growth rate (5-min)
+        15% — time-of-day risk factor
+    """
+    density_ratio = min(current / max(capacity, 1), 2.0) # Increased cap to 200%
+    predicted_ratio = min(predicted / max(capacity, 1), 1.5)
+
+    # Time risk: higher during peak hours (but should not negate actual density)
+    time_risk = 0.0
+    if 12 <= hour <= 14:
+        time_risk = 0.8
+    elif 9 <= hour <= 11 or 14 < hour <= 16:
+        time_risk = 0.5
+    elif hour < 8 or hour > 19:
+        time_risk = 0.1
+    else:
+        time_risk = 0.3
+
+    # New Weighted Formula: 60% Density, 20% Predicted, 10% Growth, 10% Time
+    cri = (
+        (density_ratio * 60) +         # Heavy weight on actual density
+        (predicted_ratio * 20) +       # Moderate predictive influence
+        (min(max(growth_rate, 0), 1) * 10) +
+        (time_risk * 10)
+    )
+
+    # HARD OVERRIDE: If actual count > capacity, enforce Critical status
+    if current >= capacity:
+        cri = max(cri, 85) # Force Critical
+    elif current >= capacity * 0.9:
+        cri = max(cri, 75) # Force Warning
+
+    return min(max(round(cri), 0), 100)
+
+
+def get_risk_level(cri):
+    if cri >= 85:
+        return "CRITICAL"
+    elif cri >= 70:
+        return "HIGH"
+    elif cri >= 50:
+        return "MODERATE"
+    return "LOW"
+
+
+# ─────────────────────────────────────────────
+# Helper: Surge Detection
+# ─────────────────────────────────────────────
+def detect_surge(zone_history):
+    """Detect surge if growth > 30% in last 5 readings, or Z-score > 2.5."""
+    if len(zone_history) < 5:
+        return False, 0.0
+
+    avg_recent = zone_history.mean_last(5)
+    if len(zone_history) >= 10:
+        avg_older = zone_history.window_mean(-10, -5)
+    else:
+        avg_older = zone_history.window_mean(0, 5)
+
+    growth_rate = (avg_recent - avg_older) / max(avg_older, 1)
+
+    # Z-score based detection
+    if len(zone_history) >= 10:
+        if zone_history.zscore() > 2.5:
+            return True, growth_rate
+
+    if growth_rate > 0.30:
+        return True, growth_rate
+
+    return False, growth_rate
+
+
+# ─────────────────────────────────────────────
+# Helper: Flow Vector Simulation
+# ─────────────────────────────────────────────
+DIRECTED_FLOW_ZONES = ("lib", "canteen", "dblock")     # The only sources generate_flow_vector knows
+
+
+def generate_flow_vector(zone_id, current_density, hour):
+    """
+    Simulate directional crowd movement between zones.
+    Adds 'Travel Time' constraints and 'Night Lock' logic.
+    """
+    flows = []
+
+    # ── 1. Activity Thresholds ──
+    # If density is low (e.g. at night), movement is sparse/random, not directed flows.
+    if current_density < 30 or (hour < 8 or hour > 19):
+        return flows
+
+    # ── 2. Realistic Directed Flows (Core Schedule) ──
+    # Library → Canteen during lunch
+    if zone_id == "lib" and 11 <= hour <= 14:
+        count = int(current_density * random.uniform(0.05, 0.15)) # Reduced for realism
+        if count > 2:
+            flows.append({"from_zone": "lib", "to_zone": "canteen", "count": count})
+
+    # Canteen → D Block / PG Block after lunch
+    if zone_id == "canteen" and 13 <= hour <= 15:
+        count_d = int(current_density * random.uniform(0.05, 0.12))
+        count_pg = int(current_density * random.uniform(0.02, 0.08))
+        if count_d > 2:
+            flows.append({"from_zone": "canteen", "to_zone": "dblock", "count": count_d})
+        if count_pg > 2:
+            flows.append({"from_zone": "canteen", "to_zone": "pg", "count": count_pg})
+
+    # D Block → PG Block in evening
+    if zone_id == "dblock" and 16 <= hour <= 18:
+        count = int(current_density * random.uniform(0.08, 0.15))
+        if count > 2:
+            flows.append({"from_zone": "dblock", "to_zone": "pg", "count": count})
+
+    return flows
+
+
+def build_feature_row(config, hour, weekday, is_weekend, rssi, current_density, zone_hist, prev_day_density=None):
+    """Builds one model input row in FEATURE_COLS order."""
+    prev_density = zone_hist.last(1, current_density)
+    prev2_density = zone_hist.last(2, prev_density)
+    rolling_mean_6 = zone_hist.mean_last(6, float(current_density))
+    if prev_day_density is None:
+        # No reading from this time yesterday yet: fall back to ~60 min ago
+        prev_day_density = zone_hist.last(20, current_density)
+
+    return [hour, weekday, rssi, config["capacity"], prev_density, prev2_density,
+            rolling_mean_6, prev_day_density, is_weekend]
+
+
+# ─────────────────────────────────────────────
+# Simulator
+# ─────────────────────────────────────────────
+class Simulator:
+    """
+    One simulator's zone state and tick stages. zone_ids limits it to a subset
+    of the registry (a shard worker); the API process of a sharded run scores
+    the shards' snapshot columns with score_columns instead of scoring_stage.
+    """
+
+    def __init__(self, registry, model_registry, prediction_cache=None, day_lag=None,
+                 zone_ids=None, seed=None, clock=sim_clock, log_ticks=True):
+        self.registry = registry
+        self.zones = registry.zones
+        self.model_registry = model_registry
+        self.prediction_cache = prediction_cache
+        self.clock = clock
+        self.log_ticks = log_ticks                  # Per-tick console summary
+
+        # Per-minute lookup tables of the two behavior functions above. Every
+        # caller reads these instead of re-evaluating the branches; they are
+        # rebuilt whenever a zone's parameters change (call
+        # behavior.rebuild() after editing the functions).
+        self.behavior = BehaviorTables(get_time_factor, get_zone_modifier, registry.types)
+        registry.add_listener(self._zone_changed)
+
+        # All zone counts live in one vectorized engine (see simulation_engine.py),
+        # initialized at 10% of base density to avoid "startup spikes"
+        if zone_ids is None:
+            self.engine = VectorSimulator.from_registry(registry, seed=seed)
+        else:
+            rows = [registry.index[zone_id] for zone_id in zone_ids]
+            self.engine = VectorSimulator(
+                zone_ids, registry.capacity[rows], registry.base_density[rows],
+                [registry.types[i] for i in rows], seed=seed
+            )
+
+        self.history = {zone_id: ZoneHistory(HISTORY_SIZE) for zone_id in self.engine.zone_ids}
+        # Minute buckets for the prev_day_density feature (in memory unless a loaded store is passed)
+        self.day_lag = day_lag if day_lag is not None else DayLagStore(self.engine.zone_ids)
+        self.flow_engine = CrowdFlowEngine()
+        self.live_data = {}
+        self.alerts = []
+        self.trend_data = []        # Time-series history
+        self.current_flows = []     # Predicted/observed crowd flows between zones
+        self.zone_occupancy = {zone_id: None for zone_id in registry.ids}   # Set by the notification sink
+
+    def _zone_changed(self, zone_id):
+        self.behavior.rebuild(self.registry.types)
+        if zone_id in self.engine.index:
+            self.engine.set_capacity(zone_id, self.zones[zone_id]["capacity"])
+
+    # ─────────────────────────────────────────────
+    # ML Prediction
+    # ─────────────────────────────────────────────
+    def formula_prediction(self, config, low=0.88, high=1.12):
+        """Fallback: formula-based prediction using behavior engine."""
+        now = self.clock.now()
+        activity = self.behavior.activity(config.get("type"), now.hour, now.minute, now.weekday())
+        return int(config["base_density"] * activity * random.uniform(low, high))
+
+    def blend_prediction(self, prediction, config, current_density):
+        """Post-processes a raw model output into the displayed 30-min prediction."""
+        # Clamp to reasonable range
+        prediction = max(0, min(int(prediction), int(config["capacity"] * 1.3)))
+
+        # ── Post-Processing: Dampen & Blend ──
+        # Reduce the weight of current_density to allow the model's own predictions
+        # to manifest more naturally, adding a small noise factor to simulate
+        # realistic model error/variance (~4-6% deviation).
+        now = self.clock.now()
+        time_factor = self.behavior.time_factor(now.hour, now.minute, now.weekday())
+
+        # Scale prediction by time factor
+        scaled_prediction = prediction * max(time_factor, 0.15)
+
+        # Adjust blending: 60% actual, 40% prediction (less biased towards current state)
+        blended = (current_density * 0.6) + (scaled_prediction * 0.4)
+
+        # Add random noise for realistic variance (±4-8%)
+        error_factor = random.uniform(0.92, 1.08)
+        blended = blended * error_factor
+
+        # Final clamp
+        return max(0, min(int(blended), int(config["capacity"] * 1.2)))
+
+    def predict_zones_batch(self, zone_inputs):
+        """
+        Batched variant of predict_with_model for a whole tick.
+        zone_inputs: {zone_id: (config, hour, weekday, is_weekend, rssi, current_density, zone_hist[, prev_day_density])}
+        Rows are grouped per location model and scored with one predict call per model.
+        Returns {zone_id: predicted_density}.
+        """
+        # Read the active bundle once so the whole tick uses one consistent model set
+        snapshot = self.model_registry.current()
+        if snapshot is None:
+            return {zid: self.formula_prediction(args[0]) for zid, args in zone_inputs.items()}
+
+        models = snapshot.models
+        model_indices = self.registry.model_indices(snapshot.label_encoder)
+        rows = []
+        for zone_id, args in zone_inputs.items():
+            model_idx = int(model_indices[self.registry.index[zone_id]])
+            if model_idx >= 0:
+                rows.append((zone_id, model_idx, build_feature_row(*args)))
+
+        try:
+            raw = predict_grouped(models, rows, self.prediction_cache, snapshot.version)
+        except Exception as e:
+            print(f"   ⚠️ Batched prediction error: {e}")
+            return {zid: self.formula_prediction(args[0], 0.9, 1.15) for zid, args in zone_inputs.items()}
+
+        results = {}
+        for zone_id, args in zone_inputs.items():
+            config, current_density = args[0], args[5]
+            if zone_id in raw:
+                results[zone_id] = self.blend_prediction(raw[zone_id], config, current_density)
+            else:
+                results[zone_id] = self.formula_prediction(config)
+        return results
+
+    def predict_with_model(self, zone_id, config, hour, weekday, is_weekend, rssi, current_density, zone_hist, prev_day_density=None):
+        """
+        Use the XGBoost per-location model to predict density.
+        Features: ['hour', 'weekday', 'rssi', 'value', 'prev_density',
+                   'prev2_density', 'rolling_mean_6', 'prev_day_density', 'is_weekend']
+        """
+        return self.predict_zones_batch({
+            zone_id: (config, hour, weekday, is_weekend, rssi, current_density, zone_hist, prev_day_density)
+        })[zone_id]
+
+    # ─────────────────────────────────────────────
+    # Tick Stages
+    # One tick flows: advance -> inference -> scoring, called in order by
+    # the caller (the API tick, a shard worker or the replay loop).
+    # ─────────────────────────────────────────────
+    def advance_stage(self, now):
+        """Stage 1: advances every zone's simulated count for this tick."""
+        hour = now.hour
+        minute = now.minute
+        weekday = now.weekday() # 0-6
+
+        # 1. Global Time Factor
+        global_factor = self.behavior.time_factor(hour, minute, weekday)
+
+        # 2-6. Zone modifiers, targets, inertia, noise/surges and clamping
+        # for every zone in one vectorized step
+        zone_mod = self.engine.zone_modifiers(self.behavior.zone_modifier, hour, minute)
+        targets, device_counts = self.engine.step(global_factor, zone_mod)
+        # Mock RSSI for API compatibility
+        rssi_values = self.engine.mock_rssi(device_counts)
+
+        zones = {}
+        for i, zone_id in enumerate(self.engine.zone_ids):
+            zones[zone_id] = {
+                "target": float(targets[i]),
+                "device_count": int(device_counts[i]),
+                "rssi": int(rssi_values[i])
+            }
+        return {"now": now, "hour": hour, "weekday": weekday, "zones": zones, "device_counts": device_counts}
+
+    def inference_stage(self, tick):
+        """
+        Stage 2: builds feature rows, scores all zones in one batch and updates
+        the per-zone history. History is only touched here, so features and
+        surge statistics always see exactly the previous ticks.
+        """
+        now, hour, weekday = tick["now"], tick["hour"], tick["weekday"]
+
+        zone_inputs = {}
+        for zone_id, z in tick["zones"].items():
+            zone_inputs[zone_id] = (
+                self.zones[zone_id], hour, weekday, (1 if weekday>=5 else 0),
+                z["rssi"], z["device_count"], self.history[zone_id],
+                self.day_lag.lookup(zone_id, now)
+            )
+
+        # ── 7. ML Pipeline Integration (Batched) ──
+        # We still run the ML model to get "Predicted" values for comparison
+        # and to compute CRI as requested. All zones are scored in one
+        # predict call per location model instead of one call per zone.
+        try:
+            # We pass the SIMULATED count as "current" to the ML model features
+            predictions = self.predict_zones_batch(zone_inputs)
+        except Exception as e:
+            print(f"   ⚠️ Batched prediction failed: {e}")
+            predictions = {}
+
+        for zone_id, z in tick["zones"].items():
+            # Fallback to our sim target
+            z["pred_density"] = predictions.get(zone_id, int(z["target"]))
+
+            # ── 5. Update history & Stats ──
+            self.history[zone_id].append(z["device_count"])
+            self.day_lag.record(zone_id, now, z["device_count"])
+            z["surge_flag"], z["growth_rate"] = detect_surge(self.history[zone_id])
+        return tick
+
+    def scoring_stage(self, tick):
+        """Stage 3: CRI, risk, flows and alerts; publishes live_data as soon as it is done."""
+        now, hour = tick["now"], tick["hour"]
+        registry = self.registry
+
+        new_state = {}
+        temp_alerts = []
+        people = np.zeros(len(registry))
+        for zone_id, z in tick["zones"].items():
+            config = self.zones[zone_id]
+            device_count, pred_density = z["device_count"], z["pred_density"]
+            surge_flag, growth_rate = z["surge_flag"], z["growth_rate"]
+
+            # ── 8. Estimated People (Natural Scaling) ──
+            # Multiply by a factor (e.g. 1.3 devices per person? or 1 device = 1.3 people?)
+            # Usually 1 device < 1 person if not everyone connects.
+            # But let's keep existing logic: 1.25-1.35 multiplier
+            est_people = int(device_count * random.uniform(1.25, 1.35))
+            # WE USE PREDICTED DENSITY FOR CRI
+            cri = calculate_cri(device_count, config["capacity"], pred_density, growth_rate, hour)
+            people[registry.index[zone_id]] = est_people
+
+            risk_level = get_risk_level(cri)
+            flows = generate_flow_vector(zone_id, device_count, hour)
+
+            # ── 5. Status colors (UI signals) ──
+            if cri >= 70:
+                status_color = "text-red-500"
+            elif cri >= 50:
+                status_color = "text-amber-500"
+            else:
+                status_color = "text-green-500"
+
+            # ── Store Result ──
+            new_state[zone_id] = {
+                "id": zone_id,
+                "name": config["name"],
+                "current": device_count,
+                "capacity": config["capacity"],
+                "est_people": est_people,
+                "predicted": int(pred_density), # Use the ML prediction here
+                "cri": cri,
+                "risk_level": risk_level,
+                "surge": surge_flag,
+                "growth_rate": round(growth_rate * 100, 1),
+                "flows": flows,
+                "status": risk_level,
+                "statusColor": status_color,
+                "last_updated": now.strftime("%H:%M:%S"),
+                # Occupancy comes from the notification sink (at most one tick old)
+                "active_event": self.zone_occupancy.get(zone_id)
+            }
+
+            # ── 8. Alert Generation (Global Feed) ──
+            if cri >= 70:
+                temp_alerts.append(self._alert(zone_id, cri, device_count, now))
+
+        # ── 8. Calculate Smart Crowd Flows ──
+        counts = np.zeros(len(registry))
+        counts[[registry.index[zone_id] for zone_id in tick["zones"]]] = tick["device_counts"]
+        tick_flows = self.flow_engine.calculate_zone_flows(
+            registry.ids, registry.names, counts, registry.capacity, people, hour
+        )
+        return self._publish(tick, new_state, temp_alerts, tick_flows)
+
+    def score_columns(self, now, columns):
+        """
+        Stage 3 of a sharded run: the shard workers already computed CRI and
+        est_people, so columns ({field: array}, registry order, as copied from
+        the shared snapshot) are scored with array operations. Risk levels,
+        status colors and the alert mask come from searchsorted / comparisons;
+        the only per-zone Python work left is building the JSON-facing records.
+        """
+        registry = self.registry
+        hour = now.hour
+        cri = columns["cri"].astype(np.int64)
+        current = columns["current"].astype(np.int64)
+        risk = RISK_LEVELS[np.searchsorted(RISK_THRESHOLDS, cri, side="right")]
+        colors = STATUS_COLORS[np.searchsorted(STATUS_THRESHOLDS, cri, side="right")]
+        growth = columns["growth_rate"]
+
+        # Directed flows only exist for a few named zones
+        directed = {
+            zone_id: generate_flow_vector(zone_id, int(current[registry.index[zone_id]]), hour)
+            for zone_id in DIRECTED_FLOW_ZONES if zone_id in registry
+        }
+
+        last_updated = now.strftime("%H:%M:%S")
+        occupancy = self.zone_occupancy
+        new_state = {}
+        zones = {}
+        for zone_id, name, count, capacity, people, pred, score, level, color, surge, rate, pct, target in zip(
+            registry.ids, registry.names, current.tolist(), registry.capacity.astype(np.int64).tolist(),
+            columns["est_people"].astype(np.int64).tolist(), columns["predicted"].astype(np.int64).tolist(),
+            cri.tolist(), risk.tolist(), colors.tolist(), (columns["surge"] != 0).tolist(),
+            growth.tolist(), np.round(growth * 100, 1).tolist(), columns["target"].tolist()
+        ):
+            new_state[zone_id] = {
+                "id": zone_id, "name": name, "current": count, "capacity": capacity,
+                "est_people": people, "predicted": pred, "cri": score, "risk_level": level,
+                "surge": surge, "growth_rate": pct, "flows": directed.get(zone_id, []),
+                "status": level, "statusColor": color, "last_updated": last_updated,
+                "active_event": occupancy.get(zone_id)
+            }
+            # Same per-zone inputs the sinks get from inference_stage on an unsharded tick
+            zones[zone_id] = {"target": target, "device_count": count, "pred_density": pred,
+                              "surge_flag": surge, "growth_rate": rate}
+
+        temp_alerts = [
+            self._alert(registry.ids[i], int(cri[i]), int(current[i]), now)
+            for i in np.nonzero(cri >= 70)[0].tolist()
+        ]
+        tick_flows = self.flow_engine.calculate_zone_flows(
+            registry.ids, registry.names, columns["current"], registry.capacity, columns["est_people"], hour
+        )
+        tick = {"now": now, "hour": hour, "weekday": now.weekday(), "zones": zones, "device_counts": current}
+        return self._publish(tick, new_state, temp_alerts, tick_flows)
+
+    def _alert(self, zone_id, cri, device_count, now):
+        """Global-feed alert for a zone at CRI >= 70 (CRITICAL from 85)."""
+        config = self.zones[zone_id]
+        if cri >= 85:
+            # Find safest alternative zone
+            other_zones = [z for z in self.zones if z != zone_id]
+            alt_zone = random.choice(other_zones) if other_zones else None
+            return {
+                "level": "CRITICAL",
+                "zone": config["name"],
+                "zone_id": zone_id,
+                "cri": cri,
+                "message": f"🔴 CRITICAL: {config['name']} at CRI {cri} — {device_count}/{config['capacity']} devices. Consider redirecting to {self.zones[alt_zone]['name']}." if alt_zone else f"🔴 CRITICAL: {config['name']} at CRI {cri}.",
+                "timestamp": now.strftime("%H:%M:%S")
+            }
+        return {
+            "level": "WARNING",
+            "zone": config["name"],
+            "zone_id": zone_id,
+            "cri": cri,
+            "message": f"🟠 WARNING: {config['name']} at CRI {cri} — approaching capacity.",
+            "timestamp": now.strftime("%H:%M:%S")
+        }
+
+    def _publish(self, tick, new_state, temp_alerts, tick_flows):
+        """Swaps in the scored state and records the minute's trend snapshot."""
+        now = tick["now"]
+        self.live_data = new_state
+        self.alerts = temp_alerts
+        self.current_flows = tick_flows
+
+        # ── 10. Record trend snapshot (Every Minute, in memory) ──
+        trend_snapshot = None
+        last_record = self.trend_data[-1] if self.trend_data else None
+        needs_record = False
+
+        if not last_record:
+            needs_record = True
+        else:
+            last_time = datetime.datetime.strptime(last_record["timestamp"], "%H:%M:%S")
+            # Handle day rollover by checking minute difference
+            if now.minute != last_time.minute:
+                needs_record = True
+
+        if needs_record:
+            zones_snap = {}
+            for zid, zdata in new_state.items():
+                zones_snap[zid] = {
+                    "actual": zdata["current"],
+                    "predicted": zdata["predicted"],
+                    "cri": zdata["cri"]
+                }
+
+            trend_snapshot = {
+                "timestamp": now.strftime("%H:%M:%S"),
+                "hour": now.strftime("%H:%M"),
+                "total_actual": sum(z["current"] for z in new_state.values()),
+                "total_predicted": sum(z["predicted"] for z in new_state.values()),
+                "avg_cri": round(sum(z["cri"] for z in new_state.values()) / len(new_state), 1),
+                "zones": zones_snap,
+                "created_at": now # For easier sorting/indexing
+            }
+
+            self.trend_data.append(trend_snapshot)
+
+            # Keep last 240 snapshots in memory for quick access
+            if len(self.trend_data) > 240:
+                self.trend_data = self.trend_data[-240:]
+
+        # Print summary
+        if self.log_ticks:
+            summary = " | ".join([f"{z}: {d['current']}/{d['capacity']} CRI={d['cri']} P={d['predicted']}" for z, d in new_state.items()])
+            print(f"[{now.strftime('%H:%M:%S')}] {summary}")
+
+        tick["state"] = new_state
+        tick["alerts"] = temp_alerts
+        tick["flows"] = tick_flows
+        tick["trend_snapshot"] = trend_snapshot
+        return tick
+
+    def run_tick(self, now=None):
+        """advance -> inference -> scoring for one tick at `now` (the simulator clock by default)."""
+        now = self.clock.now() if now is None else now
+        return self.scoring_stage(self.inference_stage(self.advance_stage(now)))
@@ -0,0 +1,353 @@
+"""
+CrowdSense Bucketed Telemetry Store
+Replaces the one-document-per-tick raw_logs layout with compact per-zone
+documents:
+
+    zone_buckets      one document per zone-hour; parallel numeric arrays
+                      (t = seconds into the hour, current, predicted,
+                      est_people, cri, surge) grow by $push
+    zone_rollup_1m    one document per zone-minute     ┐ count, sums, min,
+    zone_rollup_15m   one document per zone-15-minutes ├ max of current /
+    zone_rollup_1h    one document per zone-hour       ┘ predicted / cri, surges
+
+Ticks are aggregated in memory and upserted every flush_seconds with one
+unordered bulk_write per collection. Bucket pushes and rollup $inc / $min /
+$max are additive, so partial periods merge across flushes and restarts.
+Because they are additive, a failed flush only requeues what was not
+applied: the ops a BulkWriteError reports, or the whole collection when its
+bulk_write raised anything else (including encoding errors); the other
+collections are not retried.
+Periods and _ids are cut in UTC, so the repeated local hour when clocks fall
+back does not reuse a document. Every document carries expires_at (start +
+its tier's retention) for the TTL indexes declared in db_schema.py.
+
+history() reads the tier that fits the requested range, so a query returns
+at most a few thousand points however far back it reaches.
+"""
+
+import datetime
+import threading
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+BUCKET_COLLECTION = "zone_buckets"
+BUCKET_FIELDS = ("current", "predicted", "est_people", "cri", "surge")
+ROLLUP_FIELDS = ("current", "predicted", "cri")
+TIERS = (("1m", 60), ("15m", 900), ("1h", 3600))
+
+# Finest tier used for a range of at most this long
+TIER_SPANS = (
+    ("raw", datetime.timedelta(hours=6)),
+    ("1m", datetime.timedelta(days=2)),
+    ("15m", datetime.timedelta(days=14)),
+    ("1h", None),
+)
+
+
+def rollup_collection(tier):
+    return f"zone_rollup_{tier}"
+
+
+def to_utc(ts):
+    """Aware UTC time for ts; naive values are taken as local time (what the simulator clock returns)."""
+    return ts.astimezone(datetime.timezone.utc)
+
+
+def _stored_utc(ts):
+    """Mongo hands back naive UTC datetimes (unless the client is tz_aware)."""
+    return ts.replace(tzinfo=datetime.timezone.utc)
+
+
+def period_start(ts, seconds):
+    """Start of the period of `seconds` (a divisor of one hour) containing ts."""
+    into_hour = ts.minute * 60 + ts.second
+    return ts - datetime.timedelta(seconds=into_hour % seconds, microseconds=ts.microsecond)
+
+
+def pick_tier(start, end):
+    span = end - start
+    for tier, max_span in TIER_SPANS:
+        if max_span is None or span <= max_span:
+            return tier
+
+
+class _Bucket:
+    def __init__(self):
+        self.t = []
+        self.values = {f: [] for f in BUCKET_FIELDS}
+        self.capacity = None
+
+
+class _Rollup:
+    def __init__(self):
+        self.count = 0
+        self.surges = 0
+        self.sums = dict.fromkeys(ROLLUP_FIELDS, 0)
+        self.mins = {}
+        self.maxs = {}
+
+    def add(self, values, surge):
+        self.count += 1
+        self.surges += int(bool(surge))
+        for f in ROLLUP_FIELDS:
+            v = values[f]
+            self.sums[f] += v
+            self.mins[f] = v if f not in self.mins else min(self.mins[f], v)
+            self.maxs[f] = v if f not in self.maxs else max(self.maxs[f], v)
+
+    def merge(self, other):
+        self.count += other.count
+        self.surges += other.surges
+        for f in ROLLUP_FIELDS:
+            self.sums[f] += other.sums[f]
+            if f in other.mins:
+                self.mins[f] = other.mins[f] if f not in self.mins else min(self.mins[f], other.mins[f])
+                self.maxs[f] = other.maxs[f] if f not in self.maxs else max(self.maxs[f], other.maxs[f])
+
+
+class TelemetryStore:
+    def __init__(self, db, retention_days, flush_seconds=30, max_pending_points=500_000):
+        """retention_days: {"raw": days, "1m": days, "15m": days, "1h": days}."""
+        self.db = db
+        self.retention = {tier: datetime.timedelta(days=days) for tier, days in retention_days.items()}
+        self.flush_seconds = flush_seconds
+        self.max_pending_points = max_pending_points
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buckets = {}          # (zone_id, hour_start) -> _Bucket
+        self._rollups = {}          # (tier, zone_id, start) -> _Rollup
+        self._pending_points = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.points = 0
+        self.flushes = 0
+        self.dropped_points = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    # ── Tick path ──
+    def record(self, now, state):
+        """Adds one tick of zone state (the live_data dicts) to the pending buckets / rollups."""
+        # Periods are cut in UTC so _ids stay unique when local clocks fall back an hour
+        now = to_utc(now)
+        hour_start = period_start(now, 3600)
+        offset = int((now - hour_start).total_seconds())
+        period_starts = [(tier, period_start(now, seconds)) for tier, seconds in TIERS]
+        with self._lock:
+            for zone_id, zone in state.items():
+                values = {
+                    "current": int(zone["current"]),
+                    "predicted": int(zone["predicted"]),
+                    "est_people": int(zone["est_people"]),
+                    "cri": int(zone["cri"]),
+                    "surge": int(bool(zone["surge"]))
+                }
+                bucket = self._buckets.get((zone_id, hour_start))
+                if bucket is None:
+                    bucket = self._buckets[(zone_id, hour_start)] = _Bucket()
+                bucket.t.append(offset)
+                for f in BUCKET_FIELDS:
+                    bucket.values[f].append(values[f])
+                bucket.capacity = int(zone["capacity"])
+
+                for tier, start in period_starts:
+                    rollup = self._rollups.get((tier, zone_id, start))
+                    if rollup is None:
+                        rollup = self._rollups[(tier, zone_id, start)] = _Rollup()
+                    rollup.add(values, values["surge"])
+            self._pending_points += len(state)
+            self.points += len(state)
+            if self._pending_points > self.max_pending_points:
+                self._shed_locked()
+
+    def _shed_locked(self):
+        """Mongo has been unreachable for a long time: drop the oldest bucket points (rollups are kept)."""
+        for key in sorted(self._buckets, key=lambda k: k[1]):
+            if self._pending_points <= self.max_pending_points:
+                break
+            n = len(self._buckets.pop(key).t)
+            self._pending_points -= n
+            self.dropped_points += n
+
+    # ── Flushing ──
+    def flush(self):
+        """Upserts everything pending. Ops that were not applied are merged back for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                buckets, self._buckets = self._buckets, {}
+                rollups, self._rollups = self._rollups, {}
+                self._pending_points = 0
+            if not buckets and not rollups:
+                return True
+
+            start = time.perf_counter()
+            try:
+                batches = self._ops(buckets, rollups)
+            except Exception as e:
+                # Nothing was written yet: keep all of it for the next flush
+                self.last_error = str(e)
+                print(f"⚠️ Telemetry flush failed building upserts: {e}")
+                self._merge_back(buckets, rollups)
+                return False
+            failed_buckets, failed_rollups = {}, {}
+            for name, keyed_ops in batches:
+                for key in self._bulk_write(name, keyed_ops):
+                    if name == BUCKET_COLLECTION:
+                        failed_buckets[key] = buckets[key]
+                    else:
+                        failed_rollups[key] = rollups[key]
+            if failed_buckets or failed_rollups:
+                self._merge_back(failed_buckets, failed_rollups)
+                return False
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_error = None
+            return True
+
+    def _ops(self, buckets, rollups):
+        """[(collection name, [(pending key, UpdateOne), ...])], one entry per collection."""
+        batches = []
+        if buckets:
+            keyed_ops = []
+            for (zone_id, hour_start), bucket in buckets.items():
+                push = {"t": {"$each": bucket.t}}
+                push.update({f: {"$each": vals} for f, vals in bucket.values.items()})
+                keyed_ops.append(((zone_id, hour_start), UpdateOne(
+                    {"_id": f"{zone_id}:{hour_start:%Y%m%d%H}"},
+                    {
+                        "$push": push,
+                        "$inc": {"n": len(bucket.t)},
+                        "$set": {"capacity": bucket.capacity},
+                        "$setOnInsert": {"zone_id": zone_id, "start": hour_start,
+                                         "expires_at": hour_start + self.retention["raw"]}
+                    },
+                    upsert=True
+                )))
+            batches.append((BUCKET_COLLECTION, keyed_ops))
+
+        by_tier = {}
+        for (tier, zone_id, start), rollup in rollups.items():
+            inc = {"count": rollup.count, "surges": rollup.surges}
+            inc.update({f"sum.{f}": v for f, v in rollup.sums.items()})
+            by_tier.setdefault(tier, []).append(((tier, zone_id, start), UpdateOne(
+                {"_id": f"{zone_id}:{start:%Y%m%d%H%M}"},
+                {
+                    "$inc": inc,
+                    "$min": {f"min.{f}": v for f, v in rollup.mins.items()},
+                    "$max": {f"max.{f}": v for f, v in rollup.maxs.items()},
+                    "$setOnInsert": {"zone_id": zone_id, "start": start,
+                                     "expires_at": start + self.retention[tier]}
+                },
+                upsert=True
+            )))
+        batches.extend((rollup_collection(tier), keyed_ops) for tier, keyed_ops in by_tier.items())
+        return batches
+
+    def _bulk_write(self, name, keyed_ops):
+        """One unordered bulk_write; returns the pending keys whose op was not applied."""
+        try:
+            self.db[name].bulk_write([op for _, op in keyed_ops], ordered=False)
+            return []
+        except BulkWriteError as e:
+            # Unordered: every op except the reported write errors was applied
+            failed = [keyed_ops[err["index"]][0] for err in e.details.get("writeErrors", [])]
+            self.last_error = str(e)
+            print(f"⚠️ Telemetry flush: {len(failed)} {name} upserts failed")
+            return failed
+        except Exception as e:
+            # Connection errors, but also InvalidDocument / OverflowError while encoding
+            self.last_error = str(e)
+            print(f"⚠️ Telemetry flush of {name} failed: {e}")
+            return [key for key, _ in keyed_ops]
+
+    def _merge_back(self, buckets, rollups):
+        """Puts unapplied buckets / rollups in front of what was recorded since the flush started."""
+        with self._lock:
+            for key, bucket in buckets.items():
+                current = self._buckets.get(key)
+                if current is not None:
+                    bucket.t.extend(current.t)
+                    for f in BUCKET_FIELDS:
+                        bucket.values[f].extend(current.values[f])
+                    bucket.capacity = current.capacity
+                self._buckets[key] = bucket
+            for key, rollup in rollups.items():
+                current = self._rollups.get(key)
+                if current is not None:
+                    rollup.merge(current)
+                self._rollups[key] = rollup
+            self._pending_points += sum(len(bucket.t) for bucket in buckets.values())
+            if self._pending_points > self.max_pending_points:
+                self._shed_locked()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telemetry-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                # flush() requeues its own failures; never let the flusher thread die
+                self.last_error = str(e)
+                print(f"⚠️ Telemetry flusher error: {e}")
+
+    def close(self):
+        """Stops the flusher and writes what is pending (registered atexit)."""
+        self._stop.set()
+        self.flush()
+
+    # ── Reads ──
+    def history(self, zone_id, start, end, tier=None):
+        """Points for zone_id in [start, end) from the tier that fits the range (or the given tier)."""
+        tier = tier or pick_tier(start, end)
+        start, end = to_utc(start), to_utc(end)
+        if tier == "raw":
+            points = []
+            cursor = self.db[BUCKET_COLLECTION].find(
+                {"zone_id": zone_id, "start": {"$gte": period_start(start, 3600), "$lt": end}}
+            ).sort("start", 1)
+            for doc in cursor:
+                for i, offset in enumerate(doc.get("t", [])):
+                    ts = _stored_utc(doc["start"]) + datetime.timedelta(seconds=offset)
+                    if start <= ts < end:
+                        point = {"t": ts.isoformat()}
+                        point.update({f: doc[f][i] for f in BUCKET_FIELDS if f in doc})
+                        points.append(point)
+            return tier, points
+
+        points = []
+        cursor = self.db[rollup_collection(tier)].find(
+            {"zone_id": zone_id, "start": {"$gte": start, "$lt": end}}
+        ).sort("start", 1)
+        for doc in cursor:
+            count = max(doc.get("count", 0), 1)
+            point = {"t": _stored_utc(doc["start"]).isoformat(), "count": doc.get("count", 0), "surges": doc.get("surges", 0)}
+            for f in ROLLUP_FIELDS:
+                point[f] = {
+                    "mean": round(doc.get("sum", {}).get(f, 0) / count, 2),
+                    "min": doc.get("min", {}).get(f),
+                    "max": doc.get("max", {}).get(f)
+                }
+            points.append(point)
+        return tier, points
+
+    def stats(self):
+        with self._lock:
+            return {
+                "points_recorded": self.points,
+                "pending_points": self._pending_points,
+                "pending_buckets": len(self._buckets),
+                "pending_rollups": len(self._rollups),
+                "dropped_points": self.dropped_points,
+                "flushes": self.flushes,
+                "flush_seconds": self.flush_seconds,
+                "last_flush_ms": self.last_flush_ms,
+                "last_error": self.last_error,
+                "retention_days": {tier: r.days for tier, r in self.retention.items()}
+            }
@@ -0,0 +1,36 @@
+import numpy as np
+
+from behavior_tables import BehaviorTables
+from zone_registry import ZoneRegistry
+
+
+def time_factor(hour, minute, weekday):
+    return 0.5 if weekday >= 5 else hour / 24
+
+
+def zone_modifier(zone_type, hour, minute):
+    return {"study": 2.0, "social": 0.5}.get(zone_type, 1.0)
+
+
+def test_lookups_match_the_functions():
+    tables = BehaviorTables(time_factor, zone_modifier, ["study", "social"])
+    assert tables.time_factor(12, 30, 1) == time_factor(12, 30, 1)
+    assert tables.activity("study", 6, 0, 6) == 0.5 * 2.0
+    assert tables.zone_modifier("unknown", 6, 0) == 1.0
+    type_ids = tables.type_ids(["social", "study"])
+    assert np.allclose(tables.activities(type_ids, 1, 12, 0), [0.25, 1.0])
+
+
+def test_rebuild_on_zone_change_swaps_tables():
+    registry = ZoneRegistry([
+        {"id": "lib", "name": "Library", "capacity": 100, "base_density": 50, "type": "study"},
+    ])
+    tables = BehaviorTables(time_factor, zone_modifier, registry.types)
+    registry.add_listener(lambda zone_id: tables.rebuild(registry.types))
+    registry.set_capacity("lib", 200)
+    assert tables.version == 2
+    assert registry.zones["lib"]["capacity"] == 200
+
+    tables.rebuild(zone_modifier_fn=lambda zone_type, hour, minute: 3.0)
+    assert tables.version == 3
+    assert tables.activity("study", 12, 0, 1) == time_factor(12, 0, 1) * 3.0
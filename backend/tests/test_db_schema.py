@@ -0,0 +1,50 @@
+import pytest
+
+from db_schema import assert_no_collscan, check_query_plans
+
+
+class FakeCursor:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def sort(self, sort):
+        return self
+
+    def explain(self):
+        return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": self.stage}}}}
+
+
+class FakeCollection:
+    def __init__(self, count, stage="IXSCAN"):
+        self.count = count
+        self.stage = stage
+
+    def estimated_document_count(self):
+        return self.count
+
+    def find(self, query):
+        return FakeCursor(self.stage)
+
+
+class FakeDB(dict):
+    def list_collection_names(self):
+        return list(self)
+
+
+def test_missing_collection_is_not_counted_as_checked():
+    db = FakeDB(users=FakeCollection(5))
+    scans, unverified = check_query_plans(db, ["users", "trends"])
+    assert scans == []
+    assert unverified == {"trends": "missing"}
+    with pytest.raises(RuntimeError, match="missing collections: trends"):
+        assert_no_collscan(db, ["users", "trends"])
+    assert_no_collscan(db, ["users", "trends"], allow_missing=True)
+
+
+def test_collscan_and_empty_collections_are_reported():
+    db = FakeDB(users=FakeCollection(0), trends=FakeCollection(10, stage="COLLSCAN"))
+    scans, unverified = check_query_plans(db, ["users", "trends"])
+    assert [s[0] for s in scans] == ["trends"]
+    assert unverified == {"users": "empty"}
+    with pytest.raises(RuntimeError, match="COLLSCAN"):
+        assert_no_collscan(db, ["users", "trends"])
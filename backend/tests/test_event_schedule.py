@@ -0,0 +1,80 @@
+import datetime
+import random
+
+import pytest
+
+from event_schedule import EventSchedule, event_windows, parse_hhmm
+
+
+def reg(name, start, end):
+    return {"event_name": name, "start_time": start, "end_time": end}
+
+
+def names(events):
+    return [e["event_name"] for e in events]
+
+
+def at(hhmm):
+    return datetime.datetime(2026, 3, 2, *map(int, hhmm.split(":")))
+
+
+def test_parse_and_windows():
+    assert parse_hhmm("9:05") == 545
+    assert parse_hhmm("24:00") is None and parse_hhmm("noon") is None
+    assert event_windows("10:00", "11:30") == [(600, 691)]
+    assert event_windows("22:00", "01:30") == [(1320, 1440), (0, 91)]
+    assert event_windows(None, None) == [(0, 1440)]
+    assert event_windows("10:00", "later") is None
+
+
+@pytest.mark.parametrize("hhmm, expected", [
+    ("21:59", []),
+    ("22:00", ["late"]),
+    ("23:59", ["late"]),
+    ("00:00", ["late"]),
+    ("01:30", ["late"]),      # End minute is inclusive
+    ("01:31", []),
+    ("12:00", []),
+])
+def test_window_crossing_midnight(hhmm, expected):
+    schedule = EventSchedule({"lib": [reg("late", "22:00", "01:30")]})
+    assert names(schedule.active("lib", at(hhmm))) == expected
+
+
+def test_overlapping_windows_keep_registration_order():
+    schedule = EventSchedule({"lib": [
+        reg("night", "23:00", "02:00"),
+        reg("all day", None, None),
+        reg("early", "00:30", "01:00"),
+        reg("broken", "xx", "01:00"),
+    ]})
+    assert names(schedule.active("lib", at("00:45"))) == ["night", "all day", "early"]
+    assert names(schedule.active("lib", at("23:30"))) == ["night", "all day"]
+    assert names(schedule.active("lib", at("12:00"))) == ["all day"]
+    assert schedule.active("other", at("12:00")) == ()
+    assert schedule.stats()["invalid_windows"] == 1
+
+
+def test_matches_brute_force():
+    rng = random.Random(3)
+    regs = []
+    for i in range(40):
+        start, end = rng.randrange(1440), rng.randrange(1440)
+        regs.append(reg(f"e{i}", f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"))
+    schedule = EventSchedule({"lib": regs})
+
+    def covers(r, minute):
+        start, end = parse_hhmm(r["start_time"]), parse_hhmm(r["end_time"])
+        return start <= minute <= end if start <= end else (minute >= start or minute <= end)
+
+    for minute in range(1440):
+        expected = [r["event_name"] for r in regs if covers(r, minute)]
+        assert names(schedule.active("lib", minute)) == expected
+
+
+def test_unparseable_times_compare_as_strings():
+    # "0900" <= "09:30" <= "1000" as strings, which is what the per-tick loop used to check
+    schedule = EventSchedule({"lib": [reg("text", "0900", "1000"), reg("clock", "09:00", "10:00")]})
+    assert names(schedule.active("lib", at("09:30"))) == ["text", "clock"]
+    assert names(schedule.active("lib", at("10:30"))) == []
+    assert schedule.stats()["invalid_windows"] == 1
@@ -0,0 +1,98 @@
+import datetime
+import random
+
+import numpy as np
+import pytest
+
+from feature_store import DayLagStore, ZoneHistory
+
+
+# ── ZoneHistory vs the plain list it replaces ──
+def push(history, reference, value, capacity):
+    history.append(value)
+    reference.append(value)
+    if len(reference) > capacity:
+        reference.pop(0)
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 100])
+def test_zone_history_matches_list(capacity):
+    rng = random.Random(capacity)
+    history, reference = ZoneHistory(capacity), []
+    assert not history
+    assert history.mean() == 0.0 and history.std() == 0.0
+
+    for _ in range(3 * capacity + 7):
+        push(history, reference, rng.randint(0, 500), capacity)
+
+        assert len(history) == len(reference)
+        assert history.tolist() == reference
+        assert history[0] == reference[0] and history[-1] == reference[-1]
+        assert history.last(1) == reference[-1]
+        assert history.last(capacity + 1, default="none") == "none"
+        assert history.mean() == pytest.approx(np.mean(reference))
+        assert history.std() == pytest.approx(np.std(reference))
+        for k in (1, 3, 6):
+            assert history.mean_last(k) == pytest.approx(np.mean(reference[-k:]))
+        assert history.window_mean(-6, -1, default=None) == (
+            pytest.approx(np.mean(reference[-6:-1])) if reference[-6:-1] else None
+        )
+
+
+def test_zone_history_index_errors_and_zscore():
+    history = ZoneHistory(3)
+    with pytest.raises(IndexError):
+        history[0]
+    for value in (10, 10, 10):
+        history.append(value)
+    assert history.zscore() == 0.0
+    history.append(40)                       # window is now [10, 10, 40]
+    assert history.zscore() == pytest.approx((40 - 20) / np.std([10, 10, 40]))
+    with pytest.raises(IndexError):
+        history[3]
+
+
+# ── DayLagStore ──
+T0 = datetime.datetime(2026, 3, 2, 9, 30)
+
+
+def test_day_lag_lookup_same_time_yesterday():
+    store = DayLagStore(["lib", "pg"])
+    store.record("lib", T0, 120)
+    store.record("pg", T0, 30)
+    tomorrow = T0 + datetime.timedelta(days=1)
+    assert store.lookup("lib", tomorrow) == 120
+    assert store.lookup("pg", tomorrow) == 30
+    assert store.lookup("unknown", tomorrow, default=-1) == -1
+
+
+def test_day_lag_lookup_tolerance_and_stale_buckets():
+    store = DayLagStore(["lib"], days=2)
+    store.record("lib", T0, 120)
+    # Two minutes off still finds it, three does not
+    assert store.lookup("lib", T0 + datetime.timedelta(days=1, minutes=2)) == 120
+    assert store.lookup("lib", T0 + datetime.timedelta(days=1, minutes=3), default=None) is None
+    # Same bucket two days later: the stamp no longer matches
+    assert store.lookup("lib", T0 + datetime.timedelta(days=3), default=None) is None
+    # Lags at or past the store's span are never answered
+    assert store.lookup("lib", T0 + datetime.timedelta(days=2), lag_minutes=2 * 1440, default=None) is None
+
+
+def test_day_lag_save_load_reslots_buckets(tmp_path):
+    path = str(tmp_path / "day_lag.npz")
+    store = DayLagStore(["lib", "pg"], days=2, path=path)
+    minutes = range(0, 3 * 1440, 7)
+    for minute in minutes:
+        store.record("lib", T0 + datetime.timedelta(minutes=minute), minute)
+    store.save()
+
+    same = DayLagStore.load(path, ["pg", "lib", "new"], days=2)
+    assert same.lookup("lib", T0 + datetime.timedelta(minutes=3 * 1440 - 2)) == store.lookup(
+        "lib", T0 + datetime.timedelta(minutes=3 * 1440 - 2))
+    assert same.lookup("new", T0, default=None) is None
+
+    # Fewer buckets: every minute still held is re-slotted, later minutes win
+    smaller = DayLagStore.load(path, ["lib"], days=1.5)
+    for minute in (m for m in minutes if m > minutes[-1] - 1.5 * 1440):
+        ts = T0 + datetime.timedelta(minutes=minute + 60)
+        assert smaller.lookup("lib", ts, lag_minutes=60, tolerance=0) == minute
@@ -0,0 +1,89 @@
+import numpy as np
+
+from inference import predict_grouped
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    """Predicts the row sum and counts the rows it was asked to score."""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.rows_scored = 0
+
+    def predict(self, X):
+        self.rows_scored += len(X)
+        return np.asarray(X, dtype=np.float64).sum(axis=1) + self.offset
+
+
+def row(value):
+    return [12, 2, -60, 200, value, value, value, value, 0]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0          # a is now the most recent
+    cache.put("c", 3.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.get("c") == 3.0
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_invalidate_and_version_change_drop_entries():
+    cache = PredictionCache()
+    cache.bind("v1")
+    cache.put(("v1", 0, (1,)), 5.0)
+    cache.bind("v1")
+    assert cache.get(("v1", 0, (1,))) == 5.0
+    cache.bind("v2")
+    assert cache.stats()["entries"] == 0
+    cache.put(("v2", 0, (1,)), 6.0)
+    cache.invalidate("v3")
+    assert cache.stats()["entries"] == 0
+    assert cache.version == "v3"
+
+
+def test_quantize_snaps_to_steps():
+    cache = PredictionCache(steps=(1, 1, 5, 10, 1, 1, 1, 1, 1))
+    assert cache.quantize(row(7.4))[2:5] == (-60, 200, 7)
+    assert cache.quantize([3, 1, -62, 204, 0, 0, 0, 0, 0])[2:4] == (-60, 200)
+
+
+def test_predict_grouped_serves_repeats_from_cache():
+    model = CountingModel()
+    cache = PredictionCache()
+    rows = [("lib", 0, row(10)), ("pg", 0, row(20))]
+    first = predict_grouped({0: model}, rows, cache, version="v1")
+    second = predict_grouped({0: model}, rows, cache, version="v1")
+    assert first == second
+    assert model.rows_scored == 2
+
+
+def test_results_of_an_old_bundle_are_not_served_after_reload():
+    new = CountingModel(1000.0)
+    cache = PredictionCache()
+    rows = [("lib", 0, row(10))]
+    predict_grouped({0: new}, rows, cache, version="new")
+    # A tick still running on the old snapshot finishes after the swap
+    cache.put(("old", 0, cache.quantize(row(10))), -1.0)
+    result = predict_grouped({0: new}, rows, cache, version="new")
+    assert result["lib"] >= 1000.0
+
+
+def test_miss_scores_the_exact_row():
+    model = CountingModel()
+    cache = PredictionCache()
+    exact = predict_grouped({0: model}, [("lib", 0, row(7.4))], None)
+    cached = predict_grouped({0: model}, [("lib", 0, row(7.4))], PredictionCache(), version="v1")
+    assert cached == exact
+    # A later row in the same grid cell is served the first row's prediction
+    predict_grouped({0: model}, [("lib", 0, row(7.4))], cache, version="v1")
+    hit = predict_grouped({0: model}, [("lib", 0, row(7.2))], cache, version="v1")
+    assert abs(hit["lib"] - exact["lib"]) < 1e-4
+    assert model.rows_scored == 3
@@ -0,0 +1,87 @@
+import pytest
+
+import scheduler
+from scheduler import TickScheduler
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the scheduler sleeps or a tick 'works'."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.begins = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, "sleep", clock.sleep)
+    return clock
+
+
+def run(clock, policy, work, max_catch_up=3, fail_on=()):
+    """Runs len(work) ticks; tick i takes work[i] seconds (and raises if i in fail_on)."""
+    ticks = iter(range(len(work)))
+
+    def callback():
+        i = next(ticks)
+        clock.begins.append(clock.now)
+        clock.now += work[i]
+        if i in fail_on:
+            raise RuntimeError(f"tick {i} failed")
+
+    sched = TickScheduler(1.0, policy, max_catch_up, clock=clock)
+    sched.run(callback, max_ticks=len(work))
+    return sched
+
+
+def test_on_time_ticks_do_not_drift(clock):
+    sched = run(clock, "skip", [0.3] * 5)
+    assert clock.begins == pytest.approx([0, 1, 2, 3, 4])
+    stats = sched.stats()
+    assert (stats["overruns"], stats["skipped"], stats["caught_up"]) == (0, 0, 0)
+    assert stats["lag_ms"]["max"] == pytest.approx(0)
+
+
+def test_skip_resumes_on_next_future_boundary(clock):
+    sched = run(clock, "skip", [0.2, 2.5, 0.2, 0.2])
+    # Tick 1 runs 1.0 -> 3.5, so slots 2 and 3 are dropped
+    assert clock.begins == pytest.approx([0, 1, 4, 5])
+    stats = sched.stats()
+    assert (stats["overruns"], stats["skipped"], stats["caught_up"]) == (1, 2, 0)
+
+
+def test_catch_up_runs_missed_ticks_back_to_back(clock):
+    sched = run(clock, "catch_up", [0.2, 2.5, 0.2, 0.2, 0.2])
+    assert clock.begins == pytest.approx([0, 1, 3.5, 3.7, 4])
+    stats = sched.stats()
+    assert (stats["overruns"], stats["skipped"], stats["caught_up"]) == (2, 0, 2)
+    assert stats["lag_ms"]["max"] == pytest.approx(1500)
+
+
+def test_catch_up_is_bounded(clock):
+    sched = run(clock, "catch_up", [0.2, 4.5, 0.2, 0.2], max_catch_up=1)
+    # Slot 2 is caught up at 5.5; slots 3-5 are then skipped
+    assert clock.begins == pytest.approx([0, 1, 5.5, 6])
+    stats = sched.stats()
+    assert (stats["caught_up"], stats["skipped"]) == (1, 3)
+
+
+def test_callback_errors_are_counted_and_scheduling_continues(clock):
+    sched = run(clock, "skip", [0.1, 0.1, 0.1], fail_on={1})
+    assert clock.begins == pytest.approx([0, 1, 2])
+    stats = sched.stats()
+    assert stats["ticks"] == 3
+    assert stats["errors"] == 1
+    assert stats["last_error"] == "tick 1 failed"
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        TickScheduler(1.0, "burst")
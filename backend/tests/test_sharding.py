@@ -0,0 +1,35 @@
+import numpy as np
+
+from sharding import HashRing, ShardSupervisor, SharedSnapshot
+
+ZONE_IDS = [f"z{i}" for i in range(20)]
+
+
+def test_read_copies_a_consistent_snapshot():
+    snapshot = SharedSnapshot.create(3, 2)
+    try:
+        snapshot.write(1, np.asarray([0, 2]), {"current": np.asarray([5.0, 7.0])})
+        seq, columns = snapshot.read()
+        assert seq.tolist() == [0, 2]
+        assert columns["current"].tolist() == [5.0, 0.0, 7.0]
+        # A copy: later writes do not show through
+        snapshot.write(1, np.asarray([0]), {"current": np.asarray([9.0])})
+        assert columns["current"][0] == 5.0
+    finally:
+        snapshot.close()
+
+
+def test_fresh_rows_are_those_of_shards_that_wrote():
+    supervisor = ShardSupervisor(ZONE_IDS, np.full(len(ZONE_IDS), 100.0), 2)
+    try:
+        ring = HashRing(2)
+        rows = np.asarray([i for i, zone_id in enumerate(ZONE_IDS) if ring.shard_for(zone_id) == 0])
+        supervisor.snapshot.write(0, rows, {"current": np.ones(len(rows))})
+
+        seq, _ = supervisor.snapshot.read()
+        assert supervisor.fresh_rows(seq).tolist() == rows.tolist()
+        # Nothing new written: no row is fresh again
+        seq, _ = supervisor.snapshot.read()
+        assert len(supervisor.fresh_rows(seq)) == 0
+    finally:
+        supervisor.snapshot.close()
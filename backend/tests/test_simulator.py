@@ -0,0 +1,81 @@
+import datetime
+import random
+import sys
+
+import numpy as np
+
+from simulation_engine import VirtualClock
+from simulator import Simulator
+from zone_registry import ZoneRegistry
+
+ZONES = [
+    {"id": "lib", "name": "Library", "capacity": 500, "base_density": 250, "type": "study"},
+    {"id": "canteen", "name": "Canteen", "capacity": 200, "base_density": 100, "type": "social"},
+    {"id": "dblock", "name": "D Block", "capacity": 300, "base_density": 150, "type": "academic"},
+]
+
+
+class NoModels:
+    """A model registry with nothing loaded: every zone gets the formula prediction."""
+
+    def current(self):
+        return None
+
+
+def run(seed, ticks=60):
+    random.seed(seed)
+    clock = VirtualClock()
+    sim = Simulator(ZoneRegistry(ZONES), NoModels(), seed=seed, clock=clock, log_ticks=False)
+    start = datetime.datetime(2026, 3, 2, 12, 0)
+    states = []
+    for i in range(ticks):
+        now = start + datetime.timedelta(seconds=5 * i)
+        clock.set(now)
+        tick = sim.run_tick(now)
+        states.append({zone_id: (z["current"], z["predicted"], z["cri"]) for zone_id, z in tick["state"].items()})
+    return sim, states
+
+
+def test_seeded_runs_are_identical_and_need_no_app():
+    sim, first = run(11)
+    _, second = run(11)
+    assert first == second
+    assert "app" not in sys.modules
+    assert len(sim.history["lib"]) == 60
+    assert sim.live_data.keys() == {"lib", "canteen", "dblock"}
+    assert len(sim.trend_data) == 5          # One snapshot per simulated minute
+
+
+def test_shard_subset_only_advances_its_zones():
+    registry = ZoneRegistry(ZONES)
+    sim = Simulator(registry, NoModels(), zone_ids=["canteen"], seed=1, log_ticks=False)
+    tick = sim.inference_stage(sim.advance_stage(datetime.datetime(2026, 3, 2, 13, 0)))
+    assert list(tick["zones"]) == ["canteen"]
+
+    # Capacity changes reach the shard's own engine through the registry hook
+    registry.set_capacity("canteen", 50)
+    assert sim.engine.capacity[0] == 50
+
+
+def test_score_columns_matches_the_per_zone_rules():
+    sim = Simulator(ZoneRegistry(ZONES), NoModels(), log_ticks=False)
+    columns = {
+        "current": np.asarray([100.0, 190.0, 280.0]),
+        "predicted": np.asarray([110.0, 180.0, 250.0]),
+        "est_people": np.asarray([130.0, 250.0, 360.0]),
+        "cri": np.asarray([49.0, 70.0, 85.0]),
+        "growth_rate": np.asarray([0.1234, 0.0, -0.5]),
+        "surge": np.asarray([0.0, 1.0, 0.0]),
+        "target": np.asarray([100.0, 180.0, 270.0]),
+    }
+    tick = sim.score_columns(datetime.datetime(2026, 3, 2, 9, 0), columns)
+
+    assert [(z["risk_level"], z["statusColor"]) for z in tick["state"].values()] == [
+        ("LOW", "text-green-500"), ("HIGH", "text-red-500"), ("CRITICAL", "text-red-500")
+    ]
+    assert tick["state"]["lib"]["growth_rate"] == 12.3
+    assert [(a["zone_id"], a["level"]) for a in tick["alerts"]] == [("canteen", "WARNING"), ("dblock", "CRITICAL")]
+    # The sinks get the raw growth fraction, as on an unsharded tick
+    assert tick["zones"]["lib"]["growth_rate"] == 0.1234
+    assert tick["zones"]["canteen"]["surge_flag"] is True
+    assert sim.live_data is tick["state"]
@@ -0,0 +1,65 @@
+import datetime
+
+from bson.errors import InvalidDocument
+
+from telemetry_store import BUCKET_COLLECTION, TelemetryStore
+
+
+class FakeCollection:
+    def __init__(self):
+        self.error = None             # Raised by the next bulk_write
+        self.ops = []
+
+    def bulk_write(self, ops, ordered=True):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.ops.extend(ops)
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        return collection
+
+
+RETENTION = {"raw": 7, "1m": 2, "15m": 14, "1h": 90}
+
+
+def zone_state(current=10):
+    return {"Z1": {"current": current, "predicted": 12, "est_people": 20, "cri": 30,
+                   "surge": False, "capacity": 100}}
+
+
+def test_encoding_error_requeues_bucket_points():
+    db = FakeDB()
+    store = TelemetryStore(db, RETENTION)
+    now = datetime.datetime(2026, 3, 2, 10, 15)
+    store.record(now, zone_state())
+    db[BUCKET_COLLECTION].error = InvalidDocument("cannot encode object")
+
+    assert store.flush() is False
+    assert "cannot encode" in store.last_error
+    assert store.stats()["pending_points"] == 1
+
+    # The rollup tiers were written; only the bucket push is retried
+    assert len(db["zone_rollup_1m"].ops) == 1
+    assert store.flush() is True
+    assert len(db[BUCKET_COLLECTION].ops) == 1
+    assert store.stats()["pending_points"] == 0
+
+
+def test_repeated_local_hour_gets_its_own_bucket():
+    # 01:30 on the night clocks fall back, once in summer time and once in standard time
+    edt = datetime.timezone(datetime.timedelta(hours=-4))
+    est = datetime.timezone(datetime.timedelta(hours=-5))
+    db = FakeDB()
+    store = TelemetryStore(db, RETENTION)
+    store.record(datetime.datetime(2026, 11, 1, 1, 30, tzinfo=edt), zone_state(10))
+    store.record(datetime.datetime(2026, 11, 1, 1, 30, tzinfo=est), zone_state(20))
+    assert store.flush() is True
+
+    ids = [op._filter["_id"] for op in db[BUCKET_COLLECTION].ops]
+    assert ids == ["Z1:2026110105", "Z1:2026110106"]
+    expires = [op._doc["$setOnInsert"]["expires_at"] for op in db[BUCKET_COLLECTION].ops]
+    assert all(e.tzinfo is not None for e in expires)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from xgboost import XGBRegressor
+
+from tree_evaluator import NativeForest, check_parity, parity_sample, to_native_models
+
+
+@pytest.fixture(scope="module")
+def models():
+    """Two small per-location models trained on the simulator's feature ranges."""
+    rng = np.random.default_rng(0)
+    X = parity_sample(n_rows=2000, seed=1)
+    fitted = {}
+    for idx in (0, 1):
+        y = X[:, 4] * (0.5 + idx) + X[:, 0] * 3 + rng.normal(0, 5, len(X))
+        model = XGBRegressor(n_estimators=40, max_depth=5, tree_method="hist", random_state=42)
+        model.fit(X, y)
+        fitted[idx] = model
+    return fitted
+
+
+def test_native_forest_matches_xgboost(models):
+    ok, diffs = check_parity(models, to_native_models(models), parity_sample(n_rows=1024))
+    assert ok, diffs
+
+
+def test_missing_values_follow_default_direction(models):
+    X = parity_sample(n_rows=128)
+    X[::2, 4] = np.nan
+    X[1::3, 0] = np.nan
+    ok, diffs = check_parity(models, to_native_models(models), X)
+    assert ok, diffs
+
+
+def test_single_row_and_tree_count(models):
+    forest = NativeForest.from_booster(models[0])
+    row = parity_sample(n_rows=1)[0]
+    assert forest.n_trees == 40
+    assert forest.predict(row).shape == (1,)
+    assert forest.predict(row)[0] == pytest.approx(models[0].predict(row.reshape(1, -1))[0], abs=1e-2)
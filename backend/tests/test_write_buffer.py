@@ -0,0 +1,179 @@
+import os
+import time
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from write_buffer import WriteBehindBuffer
+
+
+class FakeCollection:
+    def __init__(self, name="raw_logs"):
+        self.name = name
+        self.down = False
+        self.reject = 0               # Documents the next insert_many rejects (BulkWriteError)
+        self.on_insert = None         # Called with each batch before it is written
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        if self.on_insert is not None:
+            self.on_insert(docs)
+        if self.down:
+            raise AutoReconnect("connection refused")
+        if self.reject:
+            accepted = docs[self.reject:]
+            self.docs.extend(accepted)
+            self.reject = 0
+            raise BulkWriteError({"nInserted": len(accepted), "writeErrors": [{"index": 0, "code": 11000}]})
+        self.docs.extend(docs)
+
+
+def make_buffer(**kwargs):
+    # Long max_age so only explicit flush() calls write
+    options = {"max_batch": 100, "max_age": 3600, "max_buffered": 1000}
+    options.update(kwargs)
+    return WriteBehindBuffer(**options)
+
+
+def test_flush_writes_in_order():
+    collection = FakeCollection()
+    buffer = make_buffer(max_batch=2)
+    for i in range(5):
+        buffer.add(collection, {"i": i})
+    assert buffer.flush() == 5
+    assert [d["i"] for d in collection.docs] == list(range(5))
+    stats = buffer.stats()
+    assert stats["buffered"] == 0
+    assert stats["collections"]["raw_logs"]["batches"] == 3
+
+
+def test_drop_oldest_overflow_keeps_newest():
+    collection = FakeCollection()
+    buffer = make_buffer(max_buffered=3)
+    for i in range(5):
+        buffer.add(collection, {"i": i})
+    assert buffer.stats()["collections"]["raw_logs"]["dropped"] == 2
+    buffer.flush()
+    assert [d["i"] for d in collection.docs] == [2, 3, 4]
+
+
+def test_failed_insert_is_requeued_then_written():
+    collection = FakeCollection()
+    collection.down = True
+    buffer = make_buffer()
+    for i in range(3):
+        buffer.add(collection, {"i": i})
+    assert buffer.flush() == 0
+    stats = buffer.stats()
+    assert stats["buffered"] == 3
+    assert stats["collections"]["raw_logs"]["retries"] == 1
+    assert stats["collections"]["raw_logs"]["last_error"]
+
+    collection.down = False
+    assert buffer.flush() == 3
+    assert [d["i"] for d in collection.docs] == [0, 1, 2]
+
+
+def test_rejected_documents_are_not_retried():
+    collection = FakeCollection()
+    collection.reject = 1
+    buffer = make_buffer()
+    for i in range(3):
+        buffer.add(collection, {"i": i})
+    assert buffer.flush() == 2
+    assert buffer.stats()["collections"]["raw_logs"]["failed"] == 1
+    assert buffer.flush() == 0
+
+
+def test_spill_overflow_and_replay(tmp_path):
+    spill_dir = str(tmp_path / "spill")
+    collection = FakeCollection()
+    collection.down = True
+    buffer = make_buffer(max_buffered=2, overflow="spill", spill_dir=spill_dir)
+    for i in range(5):
+        buffer.add(collection, {"i": i})
+
+    spill_file = os.path.join(spill_dir, "raw_logs.jsonl")
+    with open(spill_file, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    assert buffer.stats()["collections"]["raw_logs"]["spilled"] == 3
+
+    # Mongo still down: nothing is replayed and the spill file stays
+    buffer.flush()
+    assert os.path.exists(spill_file)
+
+    collection.down = False
+    assert buffer.flush() == 5
+    assert sorted(d["i"] for d in collection.docs) == list(range(5))
+    assert not os.path.exists(spill_file)
+
+
+def test_spill_during_replay_is_not_lost(tmp_path):
+    spill_dir = str(tmp_path / "spill")
+    collection = FakeCollection()
+    collection.down = True
+    buffer = make_buffer(max_batch=2, max_buffered=2, overflow="spill", spill_dir=spill_dir)
+    for i in range(7):
+        buffer.add(collection, {"i": i})
+
+    # While the spilled documents are being replayed a producer overflows again,
+    # and the second replay batch fails so its rest is requeued to the spill file
+    state = {"calls": 0}
+
+    def on_insert(docs):
+        if docs[0]["i"] == 0 and state["calls"] == 0:
+            state["calls"] += 1
+            for i in range(7, 11):
+                buffer.add(collection, {"i": i})
+        elif state["calls"] == 1 and docs[0]["i"] == 2:
+            state["calls"] += 1
+            raise AutoReconnect("connection reset")
+
+    collection.down = False
+    collection.on_insert = on_insert
+    buffer.flush()
+    assert state["calls"] == 2
+    buffer.flush()
+    assert sorted(d["i"] for d in collection.docs) == list(range(11))
+    assert not os.path.exists(os.path.join(spill_dir, "raw_logs.jsonl"))
+    assert buffer.stats()["buffered"] == 0
+
+
+def test_spill_from_earlier_run_is_due(tmp_path):
+    spill_dir = str(tmp_path / "spill")
+    collection = FakeCollection()
+    collection.down = True
+    first = make_buffer(overflow="spill", spill_dir=spill_dir)
+    first.add(collection, {"i": 0})
+    first.close(timeout=0.5)
+
+    # A later run: the background flusher replays it without waiting for the new document to age
+    collection.down = False
+    second = make_buffer(overflow="spill", spill_dir=spill_dir)
+    second.add(collection, {"i": 1})
+    deadline = time.monotonic() + 2
+    while len(collection.docs) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(d["i"] for d in collection.docs) == [0, 1]
+    assert not os.path.exists(os.path.join(spill_dir, "raw_logs.jsonl"))
+    second.close(timeout=0.5)
+
+
+def test_close_spills_what_cannot_be_written(tmp_path):
+    spill_dir = str(tmp_path / "spill")
+    collection = FakeCollection()
+    collection.down = True
+    buffer = make_buffer(overflow="spill", spill_dir=spill_dir)
+    buffer.add(collection, {"i": 0})
+    buffer.close(timeout=0.5)
+    with open(os.path.join(spill_dir, "raw_logs.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+    with pytest.raises(RuntimeError):
+        buffer.add(collection, {"i": 1})
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        WriteBehindBuffer(overflow="block")
+    with pytest.raises(ValueError):
+        WriteBehindBuffer(overflow="spill")
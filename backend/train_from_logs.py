@@ -0,0 +1,395 @@
+"""
+Out-of-Core Training on raw_logs Telemetry
+Streams the simulator's raw_logs snapshots (MongoDB, the zone-hour buckets of
+telemetry_store.py, or an exported JSONL file)
+in fixed-size chunks, derives the lag / rolling features on the fly, spools
+them per location to .npy chunks and trains each location's model through
+XGBoost's external-memory iterator. Memory use is bounded by the chunk size,
+not by how many months of telemetry are replayed.
+
+Usage:
+    python train_from_logs.py --source mongo --since 2026-01-01
+    python train_from_logs.py --source buckets --since 2026-01-01
+    python train_from_logs.py --source file --input raw_logs.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from train_model import FEATURE_COLS, MODEL_PARAMS, EARLY_STOPPING_ROUNDS, save_bundle
+from zone_registry import ZoneRegistry
+from config import Config
+
+# Frontend zone id -> label-encoder location name (from zones.json)
+ZONE_LE_NAMES = {zone_id: le_name for le_name, zone_id in ZoneRegistry.load(Config.ZONES_PATH).le_to_id.items()}
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# ─────────────────────────────────────────────
+# 1. Sources
+# ─────────────────────────────────────────────
+def _parse_created_at(value):
+    """Accepts datetimes, ISO strings and mongoexport's {"$date": ...} forms."""
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, dict) and "$date" in value:
+        value = value["$date"]
+        if isinstance(value, dict) and "$numberLong" in value:
+            value = int(value["$numberLong"])
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value / 1000.0, datetime.timezone.utc).replace(tzinfo=None)
+    return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def iter_mongo_logs(chunk_size, since=None):
+    """Yields raw_logs documents in time order, fetched chunk_size at a time."""
+    from database import db
+    query = {"created_at": {"$gte": since}} if since else {}
+    cursor = db["raw_logs"].find(query, {"created_at": 1, "zones": 1, "_id": 0}).sort("created_at", 1).batch_size(chunk_size)
+    for doc in cursor:
+        yield doc
+
+
+def iter_bucket_logs(since=None):
+    """
+    Rebuilds raw_logs-shaped snapshots from the zone_buckets collection, one
+    zone-hour document set at a time, merging the zones by timestamp.
+    """
+    from database import db
+    from telemetry_store import BUCKET_COLLECTION, period_start
+    query = {"start": {"$gte": period_start(since, 3600)}} if since else {}
+    cursor = db[BUCKET_COLLECTION].find(query, {"_id": 0, "zone_id": 1, "start": 1, "t": 1, "current": 1, "capacity": 1}).sort("start", 1)
+
+    def snapshots(hour_docs):
+        by_time = {}
+        for doc in hour_docs:
+            zone = doc["zone_id"]
+            for offset, current in zip(doc.get("t", []), doc.get("current", [])):
+                by_time.setdefault(offset, {})[zone] = {"current": current, "capacity": doc.get("capacity")}
+        for offset in sorted(by_time):
+            created_at = hour_docs[0]["start"] + datetime.timedelta(seconds=offset)
+            if since and created_at < since:
+                continue
+            yield {"created_at": created_at, "zones": by_time[offset]}
+
+    hour_docs = []
+    for doc in cursor:
+        if hour_docs and doc["start"] != hour_docs[0]["start"]:
+            yield from snapshots(hour_docs)
+            hour_docs = []
+        hour_docs.append(doc)
+    if hour_docs:
+        yield from snapshots(hour_docs)
+
+
+def iter_file_logs(path, since=None):
+    """Yields raw_logs documents from a JSONL export (one document per line, time ordered)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            doc = json.loads(line)
+            doc["created_at"] = _parse_created_at(doc["created_at"])
+            if since and doc["created_at"] < since:
+                continue
+            yield doc
+
+
+# ─────────────────────────────────────────────
+# 2. On-the-fly Feature Derivation
+# ─────────────────────────────────────────────
+class ZoneFeatureState:
+    """Per-zone running state: last readings, 6-reading window and a 24h minute index."""
+
+    def __init__(self):
+        self.recent = deque(maxlen=6)
+        self.by_minute = {}                 # epoch minute -> last reading in that minute
+        self.minute_order = deque()
+
+    def prev_day(self, epoch_minute, fallback):
+        return self.by_minute.get(epoch_minute - MINUTES_PER_DAY, fallback)
+
+    def push(self, epoch_minute, density):
+        if epoch_minute not in self.by_minute:
+            self.minute_order.append(epoch_minute)
+        self.by_minute[epoch_minute] = density
+        self.recent.append(density)
+        # Keep just over one day of minute buckets
+        while self.minute_order and self.minute_order[0] < epoch_minute - MINUTES_PER_DAY:
+            self.by_minute.pop(self.minute_order.popleft(), None)
+
+
+class FeatureBuilder:
+    """Turns raw_logs snapshots into (location, feature_row, target) samples, in stream order."""
+
+    def __init__(self):
+        self.state = {}
+
+    def rows(self, doc):
+        created_at = _parse_created_at(doc["created_at"])
+        epoch_minute = int(created_at.timestamp() // 60)
+        hour, weekday = created_at.hour, created_at.weekday()
+        is_weekend = 1 if weekday >= 5 else 0
+
+        for zone_id, zone in (doc.get("zones") or {}).items():
+            le_name = ZONE_LE_NAMES.get(zone_id)
+            if le_name is None or "current" not in zone:
+                continue
+            density = int(zone["current"])
+            capacity = int(zone.get("capacity") or 1)
+            state = self.state.setdefault(zone_id, ZoneFeatureState())
+
+            prev_density = state.recent[-1] if len(state.recent) >= 1 else density
+            prev2_density = state.recent[-2] if len(state.recent) >= 2 else prev_density
+            rolling_mean_6 = float(np.mean(state.recent)) if state.recent else float(density)
+            # Same mock RSSI the simulator reports for this occupancy
+            rssi = max(-90, min(-30, int(-80 + (density / capacity) * 30)))
+
+            row = [hour, weekday, rssi, capacity, prev_density, prev2_density,
+                   rolling_mean_6, state.prev_day(epoch_minute, density), is_weekend]
+            state.push(epoch_minute, density)
+            yield le_name, row, density
+
+
+# ─────────────────────────────────────────────
+# 3. Chunk Spool + External-Memory Iterator
+# ─────────────────────────────────────────────
+class ChunkSpool:
+    """Buffers rows per location and flushes them to .npy chunks of chunk_rows rows."""
+
+    def __init__(self, spool_dir, chunk_rows, valid_every=10):
+        self.spool_dir = spool_dir
+        self.chunk_rows = chunk_rows
+        self.valid_every = valid_every
+        self.buffers = {}
+        self.chunks = {}        # le_name -> {"train": [paths], "valid": [paths]}
+        self.rows = {}
+
+    def add(self, le_name, row, target):
+        X, y = self.buffers.setdefault(le_name, ([], []))
+        X.append(row)
+        y.append(target)
+        if len(X) >= self.chunk_rows:
+            self._flush(le_name)
+
+    def close(self):
+        for le_name in list(self.buffers):
+            self._flush(le_name)
+
+    def _flush(self, le_name):
+        X, y = self.buffers.pop(le_name, ([], []))
+        if not X:
+            return
+        chunks = self.chunks.setdefault(le_name, {"train": [], "valid": []})
+        n_chunk = len(chunks["train"]) + len(chunks["valid"])
+        # Every valid_every-th chunk is held out for early stopping / metrics
+        split = "valid" if self.valid_every and n_chunk % self.valid_every == self.valid_every - 1 else "train"
+        base = os.path.join(self.spool_dir, f"{le_name.replace(' ', '_')}_{n_chunk:05d}")
+        np.save(base + "_X.npy", np.asarray(X, dtype=np.float32))
+        np.save(base + "_y.npy", np.asarray(y, dtype=np.float32))
+        chunks[split].append(base)
+        self.rows[le_name] = self.rows.get(le_name, 0) + len(X)
+
+
+class SpoolIter(xgb.DataIter):
+    """Feeds spooled chunks to XGBoost one at a time (memory-mapped from disk)."""
+
+    def __init__(self, chunk_paths, cache_prefix):
+        self.chunk_paths = chunk_paths
+        self._idx = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._idx >= len(self.chunk_paths):
+            return False
+        base = self.chunk_paths[self._idx]
+        input_data(data=np.load(base + "_X.npy", mmap_mode="r"), label=np.load(base + "_y.npy", mmap_mode="r"))
+        self._idx += 1
+        return True
+
+    def reset(self):
+        self._idx = 0
+
+
+# ─────────────────────────────────────────────
+# 4. Training
+# ─────────────────────────────────────────────
+def _booster_params():
+    return {
+        "objective": "reg:squarederror",
+        "eval_metric": "mae",
+        "tree_method": "hist",
+        "max_depth": MODEL_PARAMS["max_depth"],
+        "eta": MODEL_PARAMS["learning_rate"],
+        "subsample": MODEL_PARAMS["subsample"],
+        "colsample_bytree": MODEL_PARAMS["colsample_bytree"],
+        "min_child_weight": MODEL_PARAMS["min_child_weight"],
+        "alpha": MODEL_PARAMS["reg_alpha"],
+        "lambda": MODEL_PARAMS["reg_lambda"],
+        "seed": MODEL_PARAMS["random_state"],
+        "verbosity": 0,
+    }
+
+
+def _streamed_metrics(booster, chunk_paths):
+    """MAE / R² over the validation chunks without loading them all at once."""
+    n, abs_err, sq_err, y_sum, y_sq = 0, 0.0, 0.0, 0.0, 0.0
+    for base in chunk_paths:
+        X = np.load(base + "_X.npy", mmap_mode="r")
+        y = np.load(base + "_y.npy", mmap_mode="r").astype(np.float64)
+        pred = booster.inplace_predict(np.asarray(X), validate_features=False).astype(np.float64)
+        n += len(y)
+        abs_err += np.abs(y - pred).sum()
+        sq_err += ((y - pred) ** 2).sum()
+        y_sum += y.sum()
+        y_sq += (y ** 2).sum()
+    if n == 0:
+        return None, None
+    ss_tot = y_sq - (y_sum ** 2) / n
+    return abs_err / n, (1 - sq_err / ss_tot) if ss_tot > 0 else 0.0
+
+
+def train_location_external(le_name, chunks, spool_dir, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """Trains one location from its spooled chunks via ExtMemQuantileDMatrix."""
+    start = time.perf_counter()
+    cache_prefix = os.path.join(spool_dir, f"cache_{le_name.replace(' ', '_')}")
+
+    dtrain = xgb.ExtMemQuantileDMatrix(SpoolIter(chunks["train"], cache_prefix + "_train"))
+    evals = []
+    if chunks["valid"]:
+        dvalid = xgb.ExtMemQuantileDMatrix(SpoolIter(chunks["valid"], cache_prefix + "_valid"), ref=dtrain)
+        evals = [(dvalid, "valid")]
+
+    booster = xgb.train(
+        _booster_params(), dtrain,
+        num_boost_round=MODEL_PARAMS["n_estimators"],
+        evals=evals,
+        early_stopping_rounds=early_stopping_rounds if evals else None,
+        verbose_eval=False
+    )
+    n_trees = booster.best_iteration + 1 if evals else booster.num_boosted_rounds()
+    booster = booster[:n_trees]
+    booster.feature_names = FEATURE_COLS
+
+    model = XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+
+    mae, r2 = _streamed_metrics(booster, chunks["valid"])
+    return model, {
+        "location": le_name,
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "mae": round(float(mae), 3) if mae is not None else None,
+        "r2": round(float(r2), 5) if r2 is not None else None,
+        "n_trees": int(n_trees),
+        "n_train_chunks": len(chunks["train"]),
+        "n_valid_chunks": len(chunks["valid"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train per-location models from raw_logs telemetry (out-of-core)")
+    parser.add_argument("--source", choices=["mongo", "buckets", "file"], default="mongo",
+                        help="mongo = raw_logs snapshots, buckets = zone_buckets (TELEMETRY_LAYOUT=bucket)")
+    parser.add_argument("--input", help="JSONL export of raw_logs (for --source file)")
+    parser.add_argument("--since", help="Only use snapshots at or after this ISO date")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Rows per spooled chunk / iterator batch")
+    parser.add_argument("--stride", type=int, default=1, help="Use every Nth snapshot (1 = all)")
+    parser.add_argument("--valid-every", type=int, default=10, help="Hold out every Nth chunk for validation")
+    parser.add_argument("--spool-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--summary", default="training_summary_logs.json")
+    parser.add_argument("--early-stopping-rounds", type=int, default=EARLY_STOPPING_ROUNDS)
+    args = parser.parse_args()
+
+    since = datetime.datetime.fromisoformat(args.since) if args.since else None
+    if args.source == "file":
+        if not args.input:
+            parser.error("--input is required with --source file")
+        docs = iter_file_logs(args.input, since)
+    elif args.source == "buckets":
+        docs = iter_bucket_logs(since)
+    else:
+        docs = iter_mongo_logs(args.chunk_rows, since)
+
+    spool_dir = args.spool_dir or tempfile.mkdtemp(prefix="crowdsense_spool_")
+    os.makedirs(spool_dir, exist_ok=True)
+
+    try:
+        # ── Pass 1: stream snapshots -> features -> per-location chunks ──
+        print(f"Streaming raw_logs ({args.source}) into {spool_dir} ...")
+        start = time.perf_counter()
+        builder = FeatureBuilder()
+        spool = ChunkSpool(spool_dir, args.chunk_rows, args.valid_every)
+        n_docs = 0
+        for i, doc in enumerate(docs):
+            if i % args.stride:
+                continue
+            for le_name, row, target in builder.rows(doc):
+                spool.add(le_name, row, target)
+            n_docs += 1
+        spool.close()
+        print(f"  {n_docs:,} snapshots -> {sum(spool.rows.values()):,} rows in {time.perf_counter() - start:.1f}s")
+
+        if not spool.chunks:
+            print("No usable raw_logs found. Nothing to train.")
+            return
+
+        # ── Pass 2: external-memory training per location ──
+        le = LabelEncoder()
+        le.fit(sorted(spool.chunks))
+        print(f"Label Encoder classes: {list(le.classes_)}")
+        print()
+        print("=" * 60)
+        print("Training per-location XGBRegressor models (external memory)...")
+        print("=" * 60)
+
+        models = {}
+        results = []
+        for le_name in le.classes_:
+            chunks = spool.chunks[le_name]
+            if not chunks["train"]:
+                # Too little data to hold anything out: train on everything
+                chunks = {"train": chunks["valid"], "valid": []}
+            model, metrics = train_location_external(le_name, chunks, spool_dir, args.early_stopping_rounds)
+            metrics["model_index"] = int(le.transform([le_name])[0])
+            metrics["n_rows"] = spool.rows[le_name]
+            models[le.transform([le_name])[0]] = model
+            results.append(metrics)
+            mae = f"{metrics['mae']:6.1f}" if metrics["mae"] is not None else "   n/a"
+            r2 = f"{metrics['r2']:.4f}" if metrics["r2"] is not None else "n/a"
+            print(f"  {le_name:12s} | MAE={mae} | R2={r2} | trees={metrics['n_trees']:3d} | {metrics['wall_time_s']:5.1f}s")
+
+        summary = {
+            "created_at": datetime.datetime.now().isoformat(),
+            "source": args.source,
+            "since": args.since,
+            "n_snapshots": n_docs,
+            "chunk_rows": args.chunk_rows,
+            "total_wall_time_s": round(time.perf_counter() - start, 3),
+            "locations": results
+        }
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Training summary written to: {args.summary}")
+
+        save_bundle(models, le)
+        print("\nDone!")
+    finally:
+        if not args.spool_dir:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
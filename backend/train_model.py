@@ -12,11 +12,19 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import random
+import argparse
+import datetime
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from model_artifact import artifact_path_for, save_artifact
+from dataset_cache import open_device_dataset, location_series
 import warnings
 warnings.filterwarnings('ignore')
 
-random.seed(42)
-np.random.seed(42)
+SEED = 42
 
 # ─────────────────────────────────────────────
 # 1. Location Profiles
@@ -88,208 +96,398 @@ LOCATIONS = {
 # ─────────────────────────────────────────────
 # 2. Generate Realistic Data
 # ─────────────────────────────────────────────
-def generate_data(n_days=90):
-    """Generate 90 days of 5-minute interval data for all locations."""
-    records = []
-
-    for day in range(n_days):
-        weekday = day % 7  # 0=Mon, 6=Sun
-        is_weekend = 1 if weekday >= 5 else 0
-
-        for loc_name, profile in LOCATIONS.items():
-            prev_density = None
-            prev2_density = None
-            densities_today = []
-
-            for hour in range(24):
-                for minute in [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55]:
-                    # Base density for this hour
-                    base = profile["hourly_base"][hour]
-
-                    # Weekend adjustment
-                    if is_weekend:
-                        base = base * profile["weekend_factor"]
-
-                    # Add day-of-week variation (Mon different from Fri)
-                    dow_factor = 1.0
-                    if weekday == 0:  # Monday: slightly lower (people arriving late)
-                        dow_factor = 0.90
-                    elif weekday == 4:  # Friday: slightly lower (people leave early)
-                        dow_factor = 0.92
-                    elif weekday == 2:  # Wednesday: peak day
-                        dow_factor = 1.08
-                    base *= dow_factor
-
-                    # Smooth transition between hours (interpolate)
-                    next_hour = (hour + 1) % 24
-                    next_base = profile["hourly_base"][next_hour]
-                    if is_weekend:
-                        next_base *= profile["weekend_factor"]
-                    next_base *= dow_factor
-                    frac = minute / 60.0
-                    interpolated = base * (1 - frac) + next_base * frac
-
-                    # Add realistic noise (±10-15%)
-                    noise = np.random.normal(1.0, 0.10)
-                    density = int(interpolated * noise)
-
-                    # Special events (random spikes on ~5% of days)
-                    if random.random() < 0.03 and 10 <= hour <= 16:
-                        density = int(density * random.uniform(1.3, 1.6))
-
-                    # Clamp
-                    density = max(0, min(density, int(profile["capacity"] * 1.25)))
-
-                    # RSSI correlated with density
-                    density_ratio = density / max(profile["capacity"], 1)
-                    rssi = int(-82 + density_ratio * 35 + np.random.normal(0, 4))
-                    rssi = max(-95, min(-25, rssi))
-
-                    # Build features
-                    rolling_vals = densities_today[-6:] if len(densities_today) >= 6 else densities_today if densities_today else [density]
-                    rolling_mean_6 = np.mean(rolling_vals)
-
-                    # prev_day_density: use same hour from previous day (approximate)
-                    # In real data this would be exact; here we use a reasonable proxy
-                    prev_day_density = density * random.uniform(0.85, 1.15)
-
-                    record = {
-                        "location": loc_name,
-                        "hour": hour,
-                        "weekday": weekday,
-                        "is_weekend": is_weekend,
-                        "rssi": rssi,
-                        "value": profile["capacity"],
-                        "prev_density": prev_density if prev_density is not None else density,
-                        "prev2_density": prev2_density if prev2_density is not None else density,
-                        "rolling_mean_6": rolling_mean_6,
-                        "prev_day_density": prev_day_density,
-                        "density": density  # TARGET
-                    }
-                    records.append(record)
-
-                    # Update history
-                    prev2_density = prev_density
-                    prev_density = density
-                    densities_today.append(density)
-
-    return pd.DataFrame(records)
+SLOTS_PER_HOUR = 12          # 5-minute intervals
+SLOTS_PER_DAY = 24 * SLOTS_PER_HOUR
+
+# Day-of-week variation (Mon different from Fri)
+DOW_FACTORS = {
+    0: 0.90,  # Monday: slightly lower (people arriving late)
+    2: 1.08,  # Wednesday: peak day
+    4: 0.92,  # Friday: slightly lower (people leave early)
+}
+
 
+def generate_data(n_days=90, locations=LOCATIONS):
+    """
+    Generate n_days of 5-minute interval data for all locations.
+    Every quantity is computed on whole (day, location, slot) arrays at once;
+    rows come out in (day, location, hour, minute) order.
+    """
+    loc_names = list(locations)
+    n_locs = len(loc_names)
+    shape = (n_days, n_locs, SLOTS_PER_DAY)
+
+    # ── Calendar ──
+    weekday = np.arange(n_days) % 7  # 0=Mon, 6=Sun
+    is_weekend = (weekday >= 5).astype(int)
+    dow_factor = np.array([DOW_FACTORS.get(wd, 1.0) for wd in weekday])
+
+    slot = np.arange(SLOTS_PER_DAY)
+    hour = slot // SLOTS_PER_HOUR
+    minute = (slot % SLOTS_PER_HOUR) * 5
+
+    # ── Location profiles as arrays ──
+    hourly_base = np.array([[locations[l]["hourly_base"][h] for h in range(24)] for l in loc_names], dtype=float)
+    weekend_factor = np.array([locations[l]["weekend_factor"] for l in loc_names])
+    capacity = np.array([locations[l]["capacity"] for l in loc_names])
+
+    # Smooth transition between hours (interpolate), then weekend + day-of-week scaling
+    frac = minute / 60.0
+    slot_base = hourly_base[:, hour] * (1 - frac) + hourly_base[:, (hour + 1) % 24] * frac      # (L, S)
+    day_scale = np.where(is_weekend[:, None] == 1, weekend_factor[None, :], 1.0) * dow_factor[:, None]  # (D, L)
+    interpolated = day_scale[:, :, None] * slot_base[None, :, :]                                # (D, L, S)
+
+    # Add realistic noise (±10-15%)
+    noise = np.random.normal(1.0, 0.10, shape)
+    density = (interpolated * noise).astype(np.int64)
+
+    # Special events (random spikes on ~5% of days)
+    spike = (np.random.random(shape) < 0.03) & ((hour >= 10) & (hour <= 16))[None, None, :]
+    spike_factor = np.random.uniform(1.3, 1.6, shape)
+    density = np.where(spike, (density * spike_factor).astype(np.int64), density)
+
+    # Clamp
+    max_density = (capacity * 1.25).astype(np.int64)[None, :, None]
+    density = np.clip(density, 0, max_density)
+
+    # RSSI correlated with density
+    density_ratio = density / np.maximum(capacity, 1)[None, :, None]
+    rssi = np.trunc(-82 + density_ratio * 35 + np.random.normal(0, 4, shape)).astype(np.int64)
+    rssi = np.clip(rssi, -95, -25)
+
+    # ── Lag features (history resets at the start of every day) ──
+    prev_density = np.concatenate([density[..., :1], density[..., :-1]], axis=-1)
+    prev2_density = np.concatenate([density[..., :2], density[..., :-2]], axis=-1)
+
+    # Mean of up to 6 previous readings today; first slot of the day uses itself
+    csum = np.concatenate([np.zeros(shape[:2] + (1,)), np.cumsum(density, axis=-1)], axis=-1)
+    window = np.minimum(slot, 6)
+    rolling_sum = csum[..., slot] - csum[..., slot - window]
+    rolling_mean_6 = np.where(window > 0, rolling_sum / np.maximum(window, 1), density)
+
+    # prev_day_density: use same hour from previous day (approximate)
+    # In real data this would be exact; here we use a reasonable proxy
+    prev_day_density = density * np.random.uniform(0.85, 1.15, shape)
+
+    def expand(values):
+        return np.broadcast_to(values, shape).ravel()
+
+    return pd.DataFrame({
+        "location": expand(np.array(loc_names, dtype=object)[None, :, None]),
+        "hour": expand(hour[None, None, :]),
+        "weekday": expand(weekday[:, None, None]),
+        "is_weekend": expand(is_weekend[:, None, None]),
+        "rssi": rssi.ravel(),
+        "value": expand(capacity[None, :, None]),
+        "prev_density": prev_density.ravel(),
+        "prev2_density": prev2_density.ravel(),
+        "rolling_mean_6": rolling_mean_6.ravel(),
+        "prev_day_density": prev_day_density.ravel(),
+        "density": density.ravel()  # TARGET
+    })
 
 # ─────────────────────────────────────────────
 # 3. Train Per-Location Models
 # ─────────────────────────────────────────────
-print("Generating training data (90 days x 5 locations x 288 intervals/day)...")
-df = generate_data(n_days=90)
-print(f"Total records: {len(df):,}")
-print(f"Locations: {df['location'].unique().tolist()}")
-print()
-
-# Encode locations
-le = LabelEncoder()
-df['location_encoded'] = le.fit_transform(df['location'])
-print(f"Label Encoder classes: {list(le.classes_)}")
-
 FEATURE_COLS = ['hour', 'weekday', 'rssi', 'value', 'prev_density',
                 'prev2_density', 'rolling_mean_6', 'prev_day_density', 'is_weekend']
 
-models = {}
-print()
-print("=" * 60)
-print("Training per-location XGBRegressor models...")
-print("=" * 60)
+MODEL_PARAMS = {
+    "n_estimators": 300,          # Upper bound; early stopping picks the actual count
+    "max_depth": 6,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "min_child_weight": 5,
+    "reg_alpha": 0.1,
+    "reg_lambda": 1.0,
+    "tree_method": "hist",        # Histogram split finding instead of exact greedy
+    "random_state": 42,
+    "verbosity": 0,
+}
+EARLY_STOPPING_ROUNDS = 30
+VALID_FRACTION = 0.125            # Of the training split (10% of all rows)
+SUMMARY_PATH = "training_summary.json"
+MODEL_PATH = "smart_crowd_per_location_model.pkl"
 
-for loc_name in le.classes_:
-    loc_id = le.transform([loc_name])[0]
-    loc_data = df[df['location'] == loc_name]
 
-    X = loc_data[FEATURE_COLS]
-    y = loc_data['density']
+def train_location(loc_name, loc_id, X, y, n_jobs=1, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """
+    Fits one location's model with early stopping on a validation split.
+    Runs inside a worker process; returns (loc_id, model, metrics).
+    """
+    start = time.perf_counter()
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=VALID_FRACTION, random_state=42)
 
     model = XGBRegressor(
-        n_estimators=300,         # Reduced from 1200 to prevent overfitting
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        min_child_weight=5,
-        reg_alpha=0.1,
-        reg_lambda=1.0,
-        random_state=42,
-        verbosity=0
+        **MODEL_PARAMS,
+        n_jobs=n_jobs,
+        early_stopping_rounds=early_stopping_rounds,
+        eval_metric="mae"
     )
+    model.fit(X_fit, y_fit, eval_set=[(X_valid, y_valid)], verbose=False)
 
-    model.fit(X_train, y_train)
+    # Keep only the trees up to the best iteration so every backend
+    # (XGBRegressor, raw Booster, native evaluator) scores the same ensemble
+    n_trees = model.best_iteration + 1
+    final = XGBRegressor()
+    final.load_model(bytearray(model.get_booster()[:n_trees].save_raw("ubj")))
 
     # Evaluate
-    y_pred = model.predict(X_test)
+    y_pred = final.predict(X_test)
     mae = mean_absolute_error(y_test, y_pred)
     r2 = r2_score(y_test, y_pred)
 
     # Feature importances
     imp = model.feature_importances_
     top3 = sorted(zip(FEATURE_COLS, imp), key=lambda x: -x[1])[:3]
-    top3_str = ", ".join([f"{f}={v:.3f}" for f, v in top3])
 
-    print(f"  {loc_name:12s} | MAE={mae:6.1f} | R2={r2:.4f} | Top: {top3_str}")
+    return loc_id, final, {
+        "location": loc_name,
+        "model_index": int(loc_id),
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "mae": round(float(mae), 3),
+        "r2": round(float(r2), 5),
+        "n_trees": int(n_trees),
+        "n_train": len(X_fit),
+        "n_valid": len(X_valid),
+        "n_test": len(X_test),
+        "top_features": {f: round(float(v), 4) for f, v in top3}
+    }
+
+
+def train_all_locations(df, le, workers=None, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """
+    Trains every location in a process pool. Each worker gets an equal share
+    of the CPU cores as XGBoost threads. Returns (models, per-location metrics).
+    """
+    workers = workers or min(len(le.classes_), os.cpu_count() or 1)
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+
+    models = {}
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for loc_name in le.classes_:
+            loc_id = le.transform([loc_name])[0]
+            loc_data = df[df['location'] == loc_name]
+            futures.append(pool.submit(
+                train_location, loc_name, loc_id,
+                loc_data[FEATURE_COLS], loc_data['density'],
+                n_jobs, early_stopping_rounds
+            ))
+
+        for future in as_completed(futures):
+            loc_id, model, metrics = future.result()
+            top3_str = ", ".join([f"{f}={v:.3f}" for f, v in metrics["top_features"].items()])
+            print(f"  {metrics['location']:12s} | MAE={metrics['mae']:6.1f} | R2={metrics['r2']:.4f} | "
+                  f"trees={metrics['n_trees']:3d} | {metrics['wall_time_s']:5.1f}s | Top: {top3_str}")
+            models[loc_id] = model
+            results.append(metrics)
+
+    results.sort(key=lambda m: m["model_index"])
+    return models, results
 
-    models[loc_id] = model
 
 # ─────────────────────────────────────────────
-# 4. Save Model
+# 4. Save & Validate New Model
 # ─────────────────────────────────────────────
-bundle = {
-    "models": models,
-    "label_encoder": le
-}
-
-# Backup old model
-import shutil, os
-old_path = "smart_crowd_per_location_model.pkl"
-backup_path = "smart_crowd_per_location_model_OLD.pkl"
-if os.path.exists(old_path):
-    shutil.copy2(old_path, backup_path)
-    print(f"\nOld model backed up to: {backup_path}")
+def save_bundle(models, le, model_path=MODEL_PATH):
+    """Writes the joblib bundle and the .csm artifact, keeping *_OLD backups of both."""
+    bundle = {
+        "models": models,
+        "label_encoder": le
+    }
+
+    # Backup old model
+    root, ext = os.path.splitext(model_path)
+    backup_path = f"{root}_OLD{ext}"
+    if os.path.exists(model_path):
+        shutil.copy2(model_path, backup_path)
+        print(f"\nOld model backed up to: {backup_path}")
+
+    joblib.dump(bundle, model_path)
+    print(f"New model saved to: {model_path}")
+
+    # Compact artifact: native booster binaries + JSON zone index, loadable without sklearn
+    artifact_path = artifact_path_for(model_path)
+    if os.path.exists(artifact_path):
+        shutil.copy2(artifact_path, artifact_path_for(backup_path))
+    header = save_artifact(artifact_path, models, le.classes_)
+    print(f"Artifact saved to: {artifact_path} (format v{header['format_version']}, {os.path.getsize(artifact_path) / 1e6:.1f} MB)")
+
+
+def validate_models(models, le):
+    print()
+    print("=" * 60)
+    print("VALIDATION: Testing new model patterns")
+    print("=" * 60)
+
+    def test_predict(location, hour, weekday=2, rssi=-60, value=200, prev=100,
+                     prev2=100, rolling=100, prev_day=100, is_weekend=0):
+        loc_id = le.transform([location])[0]
+        m = models[loc_id]
+        feat = pd.DataFrame([{'hour':hour,'weekday':weekday,'rssi':rssi,'value':value,
+            'prev_density':prev,'prev2_density':prev2,
+            'rolling_mean_6':rolling,'prev_day_density':prev_day,'is_weekend':is_weekend}])
+        return int(m.predict(feat)[0])
+
+    # Test hourly pattern for Canteen
+    print("\nCanteen hourly pattern:")
+    for h in [7, 9, 11, 12, 13, 15, 17, 20]:
+        base_prev = LOCATIONS["Canteen"]["hourly_base"].get(h-1, 50)
+        p = test_predict("Canteen", hour=h, prev=base_prev, prev2=base_prev, rolling=base_prev, rssi=-65)
+        print(f"  {h:02d}:00 -> {p:4d}")
+
+    # Weekend vs Weekday
+    print("\nWeekend vs Weekday (Library 12PM):")
+    wd = test_predict("Library", hour=12, weekday=2, is_weekend=0, prev=250, prev2=250, rolling=250, rssi=-55, value=500)
+    we = test_predict("Library", hour=12, weekday=5, is_weekend=1, prev=125, prev2=125, rolling=125, rssi=-70, value=500)
+    print(f"  Weekday={wd}, Weekend={we}, Diff={wd-we}")
+
+    # prev_density effect
+    print("\nprev_density effect (Canteen 12PM):")
+    for prev in [30, 80, 130, 180]:
+        p = test_predict("Canteen", hour=12, prev=prev, prev2=prev, rolling=prev, rssi=-60)
+        print(f"  prev={prev:4d} -> predicted={p:4d}")
+
+
+def device_features(series):
+    """
+    Feature matrix (FEATURE_COLS order) and density target for one location's
+    interval series from the device-level dataset (see dataset_cache.location_series).
+    Lags follow generate_data: history resets each day, the first intervals
+    use themselves, and prev_day_density falls back to the current density
+    when the previous day was not recorded.
+    """
+    ts = series["timestamp"]
+    density = series["density"]
+    day = ts.astype("datetime64[D]")
+    hour = (ts - day).astype("timedelta64[h]").astype(np.int64)
+    weekday = (day.astype(np.int64) + 3) % 7        # 1970-01-01 was a Thursday
+    new_day = np.concatenate([[True], day[1:] != day[:-1]])
+
+    prev = np.where(new_day, density, np.concatenate([density[:1], density[:-1]]))
+    prev2 = np.where(new_day | np.concatenate([[True], new_day[:-1]]),
+                     prev, np.concatenate([density[:2], density[:-2]]))
+    rolling = np.empty_like(density)
+    for i in range(len(density)):
+        start = max(i - 6, 0)
+        while day[start] != day[i]:
+            start += 1
+        rolling[i] = density[start:i].mean() if i > start else density[i]
+
+    j = np.searchsorted(ts, ts - np.timedelta64(1, "D"))
+    found = (j < len(ts)) & (ts[np.minimum(j, len(ts) - 1)] == ts - np.timedelta64(1, "D"))
+    prev_day = np.where(found, density[np.minimum(j, len(ts) - 1)], density)
+
+    X = pd.DataFrame({
+        "hour": hour, "weekday": weekday, "rssi": series["rssi"], "value": series["value"],
+        "prev_density": prev, "prev2_density": prev2, "rolling_mean_6": rolling,
+        "prev_day_density": prev_day, "is_weekend": (weekday >= 5).astype(int)
+    })[FEATURE_COLS]
+    return X, density
+
+
+def evaluate_on_device_data(models, le):
+    """
+    Scores the trained models against the real device-level dataset, read
+    through the memory-mapped columnar cache (the xlsx is parsed only once).
+    Returns per-location metrics for the locations both sides know.
+    """
+    print()
+    print("=" * 60)
+    print("EVALUATION: Device-level dataset")
+    print("=" * 60)
+    start = time.perf_counter()
+    dataset = open_device_dataset()
+    results = []
+    for loc_name in dataset.categories("location"):
+        if loc_name not in le.classes_:
+            print(f"  {loc_name:12s} | no model, skipped")
+            continue
+        X, y = device_features(location_series(dataset, loc_name))
+        y_pred = models[le.transform([loc_name])[0]].predict(X)
+        metrics = {
+            "location": loc_name,
+            "n_intervals": int(len(y)),
+            "mae": round(float(mean_absolute_error(y, y_pred)), 3),
+            "r2": round(float(r2_score(y, y_pred)), 5) if len(y) > 1 else None
+        }
+        print(f"  {loc_name:12s} | MAE={metrics['mae']:6.1f} | R2={metrics['r2']} | intervals={len(y)}")
+        results.append(metrics)
+    print(f"Evaluated {len(dataset):,} device rows in {time.perf_counter() - start:.2f}s")
+    return results
 
-joblib.dump(bundle, old_path)
-print(f"New model saved to: {old_path}")
 
 # ─────────────────────────────────────────────
-# 5. Validate New Model
+# 5. Entry Point
 # ─────────────────────────────────────────────
-print()
-print("=" * 60)
-print("VALIDATION: Testing new model patterns")
-print("=" * 60)
-
-def test_predict(location, hour, weekday=2, rssi=-60, value=200, prev=100,
-                 prev2=100, rolling=100, prev_day=100, is_weekend=0):
-    loc_id = le.transform([location])[0]
-    m = models[loc_id]
-    feat = pd.DataFrame([{'hour':hour,'weekday':weekday,'rssi':rssi,'value':value,
-        'prev_density':prev,'prev2_density':prev2,
-        'rolling_mean_6':rolling,'prev_day_density':prev_day,'is_weekend':is_weekend}])
-    return int(m.predict(feat)[0])
-
-# Test hourly pattern for Canteen
-print("\nCanteen hourly pattern:")
-for h in [7, 9, 11, 12, 13, 15, 17, 20]:
-    base_prev = LOCATIONS["Canteen"]["hourly_base"].get(h-1, 50)
-    p = test_predict("Canteen", hour=h, prev=base_prev, prev2=base_prev, rolling=base_prev, rssi=-65)
-    print(f"  {h:02d}:00 -> {p:4d}")
-
-# Weekend vs Weekday
-print("\nWeekend vs Weekday (Library 12PM):")
-wd = test_predict("Library", hour=12, weekday=2, is_weekend=0, prev=250, prev2=250, rolling=250, rssi=-55, value=500)
-we = test_predict("Library", hour=12, weekday=5, is_weekend=1, prev=125, prev2=125, rolling=125, rssi=-70, value=500)
-print(f"  Weekday={wd}, Weekend={we}, Diff={wd-we}")
-
-# prev_density effect
-print("\nprev_density effect (Canteen 12PM):")
-for prev in [30, 80, 130, 180]:
-    p = test_predict("Canteen", hour=12, prev=prev, prev2=prev, rolling=prev, rssi=-60)
-    print(f"  prev={prev:4d} -> predicted={p:4d}")
-
-print("\nDone!")
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the CrowdSense per-location models")
+    parser.add_argument("--days", type=int, default=90, help="Days of synthetic data to generate")
+    parser.add_argument("--workers", type=int, default=None, help="Training processes (default: one per location, capped at CPU count)")
+    parser.add_argument("--early-stopping-rounds", type=int, default=EARLY_STOPPING_ROUNDS)
+    parser.add_argument("--summary", default=SUMMARY_PATH, help="Where to write the JSON training summary")
+    parser.add_argument("--evaluate-device-data", action="store_true",
+                        help="Also score the new models on the device-level dataset (via the columnar cache)")
+    parser.add_argument("--evaluate-only", action="store_true",
+                        help="Skip training; score the saved model bundle on the device-level dataset")
+    args = parser.parse_args()
+
+    # Seeded here rather than on import, so importing the helpers leaves the global RNGs alone
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+    if args.evaluate_only:
+        bundle = joblib.load(MODEL_PATH)
+        evaluate_on_device_data(bundle["models"], bundle["label_encoder"])
+        return
+
+    print(f"Generating training data ({args.days} days x {len(LOCATIONS)} locations x {SLOTS_PER_DAY} intervals/day)...")
+    df = generate_data(n_days=args.days)
+    print(f"Total records: {len(df):,}")
+    print(f"Locations: {df['location'].unique().tolist()}")
+    print()
+
+    # Encode locations
+    le = LabelEncoder()
+    df['location_encoded'] = le.fit_transform(df['location'])
+    print(f"Label Encoder classes: {list(le.classes_)}")
+
+    print()
+    print("=" * 60)
+    print("Training per-location XGBRegressor models...")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    models, results = train_all_locations(df, le, args.workers, args.early_stopping_rounds)
+    total_time = time.perf_counter() - start
+    print(f"\nTrained {len(models)} locations in {total_time:.1f}s")
+
+    # Machine-readable summary for CI / dashboards
+    summary = {
+        "created_at": datetime.datetime.now().isoformat(),
+        "n_days": args.days,
+        "n_records": len(df),
+        "workers": args.workers or min(len(le.classes_), os.cpu_count() or 1),
+        "total_wall_time_s": round(total_time, 3),
+        "params": {**MODEL_PARAMS, "early_stopping_rounds": args.early_stopping_rounds},
+        "locations": results
+    }
+    if args.evaluate_device_data:
+        summary["device_data_eval"] = evaluate_on_device_data(models, le)
+    with open(args.summary, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Training summary written to: {args.summary}")
+
+    save_bundle(models, le)
+
+    validate_models(models, le)
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
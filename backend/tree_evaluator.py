@@ -0,0 +1,159 @@
+"""
+CrowdSense Native Tree Evaluator
+Evaluates XGBoost regression boosters from flat NumPy arrays so that
+prediction needs neither pandas nor xgboost at serving time.
+"""
+
+import json
+import numpy as np
+
+
+def _parse_base_score(raw):
+    # XGBoost >= 2 writes vector base scores as "[5.129707E1]"
+    return float(str(raw).strip("[]").split(",")[0])
+
+
+class NativeForest:
+    """
+    All trees of one booster packed into flat node arrays.
+    Leaves point at themselves so every row can be walked for a fixed
+    number of steps (the deepest tree) without per-node branching.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, max_depth, base_score):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_score = base_score
+
+    @classmethod
+    def from_json(cls, model_json):
+        """Builds the flat arrays from an XGBoost JSON model (dict, str or bytes)."""
+        if not isinstance(model_json, dict):
+            model_json = json.loads(model_json)
+
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        if not objective.startswith("reg:squarederror"):
+            raise ValueError(f"Unsupported objective for native evaluation: {objective}")
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        base_score = _parse_base_score(learner["learner_model_param"]["base_score"])
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            lc = np.asarray(tree["left_children"], dtype=np.int32)
+            rc = np.asarray(tree["right_children"], dtype=np.int32)
+            n_nodes = len(lc)
+            node_ids = np.arange(n_nodes, dtype=np.int32)
+            is_leaf = lc == -1
+
+            feature.append(np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int32)))
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            left.append(np.where(is_leaf, node_ids, lc) + offset)
+            right.append(np.where(is_leaf, node_ids, rc) + offset)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            # For leaves, split_conditions holds the (learning-rate scaled) leaf weight
+            value.append(np.where(is_leaf, threshold[-1], 0.0).astype(np.float32))
+            roots.append(offset)
+
+            max_depth = max(max_depth, cls._tree_depth(lc, rc))
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            base_score=base_score,
+        )
+
+    @classmethod
+    def from_booster(cls, model):
+        """Builds the flat arrays from an XGBRegressor or xgboost.Booster."""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        return cls.from_json(bytes(booster.save_raw("json")))
+
+    @staticmethod
+    def _tree_depth(lc, rc):
+        depth = 0
+        frontier = [0]
+        while frontier:
+            frontier = [c for n in frontier for c in (lc[n], rc[n]) if c != -1]
+            if frontier:
+                depth += 1
+        return depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def predict(self, X):
+        """Scores a (n_rows, n_features) matrix; mirrors XGBRegressor.predict."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        has_missing = bool(np.isnan(flat_x).any())
+
+        # One cursor per (row, tree), walked level by level
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, self.n_trees)
+        node = np.tile(self.roots, n_rows)
+
+        for _ in range(self.max_depth):
+            x = flat_x[row_offset + self.feature[node]]
+            go_left = x < self.threshold[node]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_sum = self.value[node].reshape(n_rows, self.n_trees).sum(axis=1, dtype=np.float64)
+        return (leaf_sum + self.base_score).astype(np.float32)
+
+
+def to_native_models(models):
+    """Converts a {location_id: XGBRegressor} dict into NativeForest evaluators."""
+    return {idx: NativeForest.from_booster(model) for idx, model in models.items()}
+
+
+def parity_sample(n_rows=512, seed=7):
+    """Random feature rows spanning the ranges the simulator produces."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 24, n_rows),            # hour
+        rng.integers(0, 7, n_rows),             # weekday
+        rng.integers(-95, -25, n_rows),         # rssi
+        rng.choice([150, 200, 300, 400, 500], n_rows),  # value (capacity)
+        rng.uniform(0, 600, n_rows),            # prev_density
+        rng.uniform(0, 600, n_rows),            # prev2_density
+        rng.uniform(0, 600, n_rows),            # rolling_mean_6
+        rng.uniform(0, 600, n_rows),            # prev_day_density
+        rng.integers(0, 2, n_rows),             # is_weekend
+    ]).astype(np.float32)
+
+
+def check_parity(reference_models, native_models, X=None, tolerance=1e-2):
+    """
+    Compares native predictions against the reference XGBoost models.
+    Returns (ok, {location_id: max_abs_diff}).
+    """
+    if X is None:
+        X = parity_sample()
+    diffs = {}
+    for idx, model in reference_models.items():
+        expected = np.asarray(model.predict(X), dtype=np.float64)
+        actual = native_models[idx].predict(X).astype(np.float64)
+        diffs[idx] = float(np.max(np.abs(expected - actual)))
+    return all(d <= tolerance for d in diffs.values()), diffs
@@ -0,0 +1,314 @@
+"""
+CrowdSense Write-Behind Buffer
+Collects MongoDB documents per collection and writes them with one unordered
+insert_many per batch from a background thread, so the tick path never waits
+on a round trip. A batch is flushed when it reaches max_batch documents or
+when its oldest document is max_age seconds old.
+
+Memory is capped at max_buffered documents across all collections. When Mongo
+is slow or down and the cap is hit, the overflow policy decides what happens:
+    "drop_oldest"  discard the oldest pending documents (counted as dropped)
+    "spill"        append them to <spill_dir>/<collection>.jsonl; spilled
+                   documents are written back once inserts succeed again
+
+All reads and writes of one collection's spill file happen under that
+collection's spill lock. The flusher replays a spill file as soon as Mongo
+takes inserts again, even if nothing new is pending for the collection.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+OVERFLOW_POLICIES = ("drop_oldest", "spill")
+
+
+class _Pending:
+    """Pending documents and counters of one collection."""
+
+    def __init__(self, collection, window):
+        self.collection = collection
+        self.docs = deque()
+        self.oldest = None
+        self.retry_at = 0.0                     # Back-off after a failed insert
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self.retries = 0
+        self.latency = deque(maxlen=window)     # insert_many latency per batch (s)
+        self.last_error = None
+        self.spill_lock = threading.Lock()      # Serializes all I/O on this collection's spill file
+        self.has_spill = False                  # A spill file is waiting to be replayed
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_batch=500, max_age=2.0, max_buffered=20000, overflow="drop_oldest",
+                 spill_dir=None, window=200):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}' (expected one of {OVERFLOW_POLICIES})")
+        if overflow == "spill" and not spill_dir:
+            raise ValueError("The spill policy needs a spill_dir")
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.max_buffered = max_buffered
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self.window = window
+        self._pending = {}
+        self._buffered = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    # ── Producer side ──
+    def add(self, collection, doc):
+        """Queues one document for collection. Never blocks on MongoDB."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write buffer is closed")
+            pending = self._pending.get(collection.name)
+            if pending is None:
+                pending = self._pending[collection.name] = _Pending(collection, self.window)
+                # A spill file left by an earlier run is replayed once inserts succeed
+                pending.has_spill = bool(self.spill_dir) and os.path.exists(self._spill_path(pending))
+            if not pending.docs:
+                pending.oldest = time.monotonic()
+            pending.docs.append(doc)
+            self._buffered += 1
+            overflow = self._shed_locked() if self._buffered > self.max_buffered else []
+            if len(pending.docs) >= self.max_batch:
+                self._cond.notify()
+        self._spill(overflow)
+        self._ensure_thread()
+
+    def _shed_locked(self):
+        """Removes the oldest documents of the largest backlogs until under the cap."""
+        shed = []
+        while self._buffered > self.max_buffered:
+            pending = max(self._pending.values(), key=lambda p: len(p.docs))
+            doc = pending.docs.popleft()
+            self._buffered -= 1
+            if self.overflow == "spill":
+                shed.append((pending, doc))
+            else:
+                pending.dropped += 1
+        return shed
+
+    def _spill_path(self, pending):
+        return os.path.join(self.spill_dir, f"{pending.collection.name}.jsonl")
+
+    def _spill(self, shed):
+        if not shed:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        by_collection = {}
+        for pending, doc in shed:
+            by_collection.setdefault(pending, []).append(doc)
+        for pending, docs in by_collection.items():
+            try:
+                with pending.spill_lock:
+                    with open(self._spill_path(pending), "a", encoding="utf-8") as f:
+                        for doc in docs:
+                            f.write(json_util.dumps(doc) + "\n")
+                    pending.has_spill = True
+                with self._cond:
+                    pending.spilled += len(docs)
+            except OSError as e:
+                print(f"⚠️ Write buffer spill failed for {pending.collection.name}: {e}")
+                with self._cond:
+                    pending.dropped += len(docs)
+
+    # ── Flushing ──
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                    self._thread.start()
+
+    def _due(self, now):
+        return [
+            name for name, p in self._pending.items()
+            if now >= p.retry_at and (
+                (p.docs and (len(p.docs) >= self.max_batch or now - p.oldest >= self.max_age)) or p.has_spill
+            )
+        ]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._due(now):
+                        break
+                    waits = [max(p.oldest + self.max_age, p.retry_at) - now for p in self._pending.values() if p.docs]
+                    waits += [p.retry_at - now for p in self._pending.values() if p.has_spill]
+                    self._cond.wait(timeout=max(min(waits), 0.01) if waits else self.max_age)
+                if self._closed:
+                    return
+            self.flush(only_due=True)
+
+    def flush(self, only_due=False):
+        """Writes pending batches now (every collection unless only_due). Returns documents written."""
+        written = 0
+        with self._flush_lock:
+            with self._cond:
+                names = (self._due(time.monotonic()) if only_due
+                         else [n for n, p in self._pending.items() if p.docs or p.has_spill])
+            for name in names:
+                pending = self._pending[name]
+                reachable = True
+                while True:
+                    with self._cond:
+                        batch = [pending.docs.popleft() for _ in range(min(self.max_batch, len(pending.docs)))]
+                        self._buffered -= len(batch)
+                        pending.oldest = time.monotonic() if pending.docs else None
+                    if not batch:
+                        break
+                    reachable, n = self._insert(pending, batch)
+                    written += n
+                    if not reachable:
+                        break
+                    if only_due and len(pending.docs) < self.max_batch:
+                        break
+                if self.spill_dir and reachable and pending.has_spill:
+                    written += self._replay_spill(pending)
+        return written
+
+    def _insert(self, pending, batch):
+        """One insert_many; returns (mongo_reachable, documents_written)."""
+        start = time.perf_counter()
+        try:
+            pending.collection.insert_many(batch, ordered=False)
+            n, ok = len(batch), True
+        except BulkWriteError as e:
+            # Unordered: everything except the reported write errors went in
+            n = e.details.get("nInserted", 0)
+            failed = len(batch) - n
+            ok = True
+            with self._cond:
+                pending.failed += failed
+            print(f"⚠️ Write buffer: {failed} {pending.collection.name} documents rejected")
+        except Exception as e:
+            # Mongo unreachable or slow: put the batch back in front (subject to the cap)
+            with self._cond:
+                pending.retries += 1
+                pending.last_error = str(e)
+                pending.docs.extendleft(reversed(batch))
+                pending.oldest = time.monotonic()
+                pending.retry_at = pending.oldest + self.max_age
+                self._buffered += len(batch)
+                overflow = self._shed_locked() if self._buffered > self.max_buffered else []
+            self._spill(overflow)
+            print(f"⚠️ Write buffer flush to {pending.collection.name} failed: {e}")
+            return False, 0
+        with self._cond:
+            pending.latency.append(time.perf_counter() - start)
+            pending.flushed += n
+            pending.batches += 1
+            pending.last_error = None
+        return ok, n
+
+    def _replay_spill(self, pending):
+        """Writes spilled documents back after Mongo recovered."""
+        path = self._spill_path(pending)
+        replay_path = path + ".replay"
+        with pending.spill_lock:
+            if not os.path.exists(path):
+                pending.has_spill = False
+                return 0
+            # Producers keep appending to a fresh spill file while this one is replayed
+            os.replace(path, replay_path)
+            pending.has_spill = False
+            with open(replay_path, "r", encoding="utf-8") as f:
+                docs = [json_util.loads(line) for line in f if line.strip()]
+
+        written = 0
+        rest = []
+        for i in range(0, len(docs), self.max_batch):
+            ok, n = self._insert(pending, docs[i:i + self.max_batch])
+            written += n
+            if not ok:
+                # The failed batch was requeued; the rest goes back to the spill file
+                rest = docs[i + self.max_batch:]
+                break
+
+        with pending.spill_lock:
+            if rest:
+                # Older than anything spilled during the replay, so they go first
+                with open(replay_path, "w", encoding="utf-8") as f:
+                    for doc in rest:
+                        f.write(json_util.dumps(doc) + "\n")
+                    if os.path.exists(path):
+                        with open(path, "r", encoding="utf-8") as newer:
+                            f.writelines(newer)
+                os.replace(replay_path, path)
+            else:
+                os.remove(replay_path)
+            pending.has_spill = os.path.exists(path)
+        if written:
+            print(f"✅ Write buffer: replayed {written} spilled {pending.collection.name} documents")
+        return written
+
+    def close(self, timeout=10.0):
+        """Stops the background thread and flushes whatever is left (registered atexit)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # Also replays spill files when nothing is buffered
+            if not self.flush() or not self._buffered:
+                break
+        if self._buffered:
+            if self.overflow == "spill":
+                with self._cond:
+                    shed = [(p, doc) for p in self._pending.values() for doc in p.docs]
+                    for p in self._pending.values():
+                        p.docs.clear()
+                    self._buffered = 0
+                self._spill(shed)
+                print(f"⚠️ Write buffer: spilled {len(shed)} unwritten documents on shutdown")
+            else:
+                print(f"⚠️ Write buffer: {self._buffered} documents could not be written on shutdown")
+
+    def stats(self):
+        with self._cond:
+            collections = {}
+            for name, p in self._pending.items():
+                latency = np.asarray(p.latency) * 1000
+                collections[name] = {
+                    "pending": len(p.docs),
+                    "flushed": p.flushed,
+                    "batches": p.batches,
+                    "dropped": p.dropped,
+                    "spilled": p.spilled,
+                    "failed": p.failed,
+                    "retries": p.retries,
+                    "flush_ms": {
+                        "mean": round(float(latency.mean()), 2) if len(latency) else None,
+                        "p95": round(float(np.percentile(latency, 95)), 2) if len(latency) else None,
+                        "max": round(float(latency.max()), 2) if len(latency) else None
+                    },
+                    "last_error": p.last_error
+                }
+            return {
+                "buffered": self._buffered,
+                "max_buffered": self.max_buffered,
+                "max_batch": self.max_batch,
+                "max_age_s": self.max_age,
+                "overflow": self.overflow,
+                "collections": collections
+            }
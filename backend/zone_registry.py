@@ -0,0 +1,89 @@
+"""
+CrowdSense Zone Registry
+Loads the campus zones from zones.json once at startup. Per-zone numeric
+attributes live in arrays indexed by an integer zone index, and the
+id <-> index <-> label-encoder name <-> model index mappings are precomputed,
+so hot paths index arrays instead of walking dicts and comparing strings.
+
+`zones` keeps the familiar {zone_id: {name, capacity, ...}} dict for request
+handlers and JSON responses; it is built from the same data.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from inference import model_index_map
+
+DEFAULT_ZONES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zones.json")
+REQUIRED_FIELDS = ("id", "name", "capacity", "base_density")
+
+
+class ZoneRegistry:
+    def __init__(self, zone_list):
+        for zone in zone_list:
+            missing = [f for f in REQUIRED_FIELDS if f not in zone]
+            if missing:
+                raise ValueError(f"Zone {zone.get('id', '?')} is missing {missing}")
+
+        self.ids = [str(z["id"]) for z in zone_list]
+        if len(set(self.ids)) != len(self.ids):
+            raise ValueError("Duplicate zone ids in zone registry")
+        self.index = {zone_id: i for i, zone_id in enumerate(self.ids)}
+        self.names = [z["name"] for z in zone_list]
+        self.le_names = [z.get("le_name") for z in zone_list]
+        self.types = [z.get("type") for z in zone_list]
+
+        # Numeric attributes (float64 so they can be shared with the simulator)
+        self.capacity = np.asarray([z["capacity"] for z in zone_list], dtype=np.float64)
+        self.base_density = np.asarray([z["base_density"] for z in zone_list], dtype=np.float64)
+
+        self.type_names = sorted({t for t in self.types if t is not None})
+        type_lookup = {name: i for i, name in enumerate(self.type_names)}
+        self.type_index = np.asarray([type_lookup.get(t, -1) for t in self.types], dtype=np.int64)
+
+        # Label-encoder location name -> zone id (was the hand-kept ZONE_NAME_TO_ID)
+        self.le_to_id = {le: zone_id for zone_id, le in zip(self.ids, self.le_names) if le}
+
+        self.zones = {zone_id: {k: v for k, v in z.items() if k != "id"} for zone_id, z in zip(self.ids, zone_list)}
+        self._model_index_cache = (None, None)
+        self._listeners = []
+
+    @classmethod
+    def load(cls, path=DEFAULT_ZONES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        zone_list = data["zones"] if isinstance(data, dict) else data
+        registry = cls(zone_list)
+        print(f"🗺️ Zone registry: {len(registry)} zones from {os.path.basename(path)}")
+        return registry
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, zone_id):
+        return zone_id in self.index
+
+    def add_listener(self, callback):
+        """callback(zone_id) runs after a zone's parameters change."""
+        self._listeners.append(callback)
+
+    def set_capacity(self, zone_id, capacity):
+        """Updates the array (shared with the simulator) and the config dict together."""
+        self.capacity[self.index[zone_id]] = capacity
+        self.zones[zone_id]["capacity"] = int(capacity)
+        for callback in self._listeners:
+            callback(zone_id)
+
+    def model_indices(self, label_encoder):
+        """
+        Array of model index per zone (-1 when the bundle has no model for it).
+        Cached per label encoder, so it is rebuilt only after a model swap.
+        """
+        cached_for, indices = self._model_index_cache
+        if cached_for is not label_encoder:
+            index_map = model_index_map(label_encoder)
+            indices = np.asarray([index_map.get(le, -1) for le in self.le_names], dtype=np.int64)
+            self._model_index_cache = (label_encoder, indices)
+        return indices